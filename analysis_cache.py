@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Analysis Cache - content-addressed on-disk cache for Gemini analysis results
+
+Entries are keyed by a SHA-256 of (symbol, as_of, lookback, model, prompt template
+version, prompt encoding), so re-running the same analysis on the same trading day
+returns the stored result without calling the model. Eviction is LRU (file mtime is
+refreshed on every hit) bounded by entry count and total size.
+
+Usage:
+    python analysis_cache.py get AAPL.US --as-of 2026-01-02 --lookback 60 --model models/gemini-2.5-flash
+    python analysis_cache.py put AAPL.US --as-of 2026-01-02 --lookback 60 --model models/gemini-2.5-flash --analysis '{"signal": "HOLD"}'
+    python analysis_cache.py put AAPL.US --as-of 2026-01-02 --analysis-file data/payloads/1234-analysis.json
+    python analysis_cache.py stats
+    python analysis_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import unquote
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = BASE_DIR / "data" / "cache" / "analysis"
+STATS_NAME = "_stats.json"
+
+# Bump when the "Build prompt" template changes so stale interpretations are not reused
+PROMPT_TEMPLATE_VERSION = "2"
+MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "2000"))
+MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+def cache_key(symbol, as_of, lookback, model, prompt_version=PROMPT_TEMPLATE_VERSION, prompt_mode="", prompt_budget=""):
+    fields = {
+        "symbol": (symbol or "").strip().upper(),
+        "as_of": (as_of or "").strip()[:10],
+        "lookback": int(lookback),
+        "model": (model or "").strip(),
+        "prompt_version": str(prompt_version),
+        "prompt_mode": str(prompt_mode or ""),
+        "prompt_budget": str(prompt_budget or ""),
+    }
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+    return digest, fields
+
+
+def _entry_path(key, cache_dir=CACHE_DIR):
+    return Path(cache_dir) / key[:2] / f"{key}.json"
+
+
+def _atomic_write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One temp file per writer (process and thread), so concurrent writes never share it
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def read_stats(cache_dir=CACHE_DIR):
+    try:
+        return json.loads((Path(cache_dir) / STATS_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {"hits": 0, "misses": 0}
+
+
+def _count(field, cache_dir=CACHE_DIR):
+    stats = read_stats(cache_dir)
+    stats[field] = stats.get(field, 0) + 1
+    _atomic_write(Path(cache_dir) / STATS_NAME, json.dumps(stats))
+    return stats
+
+
+def get(key, cache_dir=CACHE_DIR, bypass=False):
+    """Return (analysis or None, stats). A bypassed lookup counts as a miss."""
+    path = _entry_path(key, cache_dir)
+    if not bypass and path.exists():
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            entry = None
+        if entry is not None:
+            os.utime(path)
+            return entry.get("analysis"), _count("hits", cache_dir)
+    return None, _count("misses", cache_dir)
+
+
+def put(key, fields, analysis, cache_dir=CACHE_DIR):
+    entry = {"key": key, "fields": fields, "stored_at": time.time(), "analysis": analysis}
+    _atomic_write(_entry_path(key, cache_dir), json.dumps(entry, ensure_ascii=False))
+    return evict(cache_dir)
+
+
+def _entries(cache_dir=CACHE_DIR):
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return []
+    return [p for p in cache_dir.glob("*/*.json")]
+
+
+def evict(cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+    """Drop least recently used entries until both limits hold. Returns the number removed."""
+    entries = []
+    for path in _entries(cache_dir):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    while entries and (len(entries) > max_entries or total > max_bytes):
+        _, size, path = entries.pop(0)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def _add_key_arguments(parser):
+    parser.add_argument("symbol")
+    parser.add_argument("--as-of", required=True, help="Latest bar date of the analysed window")
+    parser.add_argument("--lookback", type=int, default=60)
+    parser.add_argument("--model", default="models/gemini-2.5-flash")
+    parser.add_argument("--prompt-version", default=PROMPT_TEMPLATE_VERSION)
+    parser.add_argument("--prompt-mode", default="")
+    parser.add_argument("--prompt-budget", default="")
+
+
+def _key_from_args(args):
+    return cache_key(
+        unquote(args.symbol),
+        unquote(args.as_of),
+        args.lookback,
+        unquote(args.model),
+        prompt_version=unquote(args.prompt_version),
+        prompt_mode=unquote(args.prompt_mode),
+        prompt_budget=unquote(args.prompt_budget),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Content-addressed cache for Gemini analysis results",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    get_parser = sub.add_parser("get", help="Look up a cached analysis and print JSON")
+    _add_key_arguments(get_parser)
+    get_parser.add_argument("--bypass", default="false", help="true to skip the lookup (--no-cache)")
+
+    put_parser = sub.add_parser("put", help="Store an analysis")
+    _add_key_arguments(put_parser)
+    analysis_group = put_parser.add_mutually_exclusive_group(required=True)
+    analysis_group.add_argument("--analysis", help="Analysis JSON (may be URL-encoded)")
+    analysis_group.add_argument("--analysis-file", help="File holding the analysis JSON (removed once read)")
+
+    sub.add_parser("stats", help="Show hit/miss counters and size")
+    sub.add_parser("clear", help="Remove every cached entry and reset counters")
+
+    args = parser.parse_args()
+
+    if args.command == "get":
+        key, fields = _key_from_args(args)
+        # Without a bar date the window is unknown, so never serve it from the cache
+        bypass = unquote(args.bypass).strip().lower() in ("true", "1", "yes") or not fields["as_of"]
+        analysis, stats = get(key, bypass=bypass)
+        status = "bypass" if bypass else ("hit" if analysis is not None else "miss")
+        print(json.dumps({"key": key, "cache": status, "analysis": analysis, **stats}, ensure_ascii=False))
+    elif args.command == "put":
+        key, fields = _key_from_args(args)
+        try:
+            if args.analysis_file:
+                path = Path(unquote(args.analysis_file))
+                text = path.read_text(encoding="utf-8")
+                path.unlink(missing_ok=True)
+            else:
+                text = unquote(args.analysis)
+            analysis = json.loads(text)
+        except (OSError, ValueError) as exc:
+            print(json.dumps({"key": key, "error": f"Invalid analysis: {exc}"}))
+            sys.exit(1)
+        if not fields["as_of"]:
+            print(json.dumps({"key": key, "stored": False}))
+            return
+        evicted = put(key, fields, analysis)
+        print(json.dumps({"key": key, "stored": True, "evicted": evicted}))
+    elif args.command == "stats":
+        entries = _entries()
+        stats = read_stats()
+        print(f"[info] Cache: {CACHE_DIR}")
+        print(f"    Entries: {len(entries)} / {MAX_ENTRIES}")
+        print(f"    Size: {sum(p.stat().st_size for p in entries) / 1024:.1f} KiB / {MAX_BYTES / 1024 / 1024:.0f} MiB")
+        print(f"    Hits: {stats.get('hits', 0)}  Misses: {stats.get('misses', 0)}")
+    elif args.command == "clear":
+        for path in _entries():
+            path.unlink()
+        stats_path = CACHE_DIR / STATS_NAME
+        if stats_path.exists():
+            stats_path.unlink()
+        print(f"[ok] Cleared {CACHE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
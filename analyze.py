@@ -7,82 +7,182 @@ Usage:
     python analyze.py AAPL.US --lookback 30
     python analyze.py MSFT.US --model models/gemini-2.0-flash-exp
     python analyze.py "Apple" --market US
+    python analyze.py AAPL.US MSFT.US 005930.KS --concurrency 4
+    python analyze.py --file watchlist.txt
+    cat watchlist.txt | python analyze.py -
+    python analyze.py AAPL.US --lookback 250 --prompt-budget 800
+    python analyze.py AAPL.US --no-cache
+    python analyze.py AAPL.US --timeout 900
+    python analyze.py AAPL.US MSFT.US --timings --timings-jsonl data/timings.jsonl --timings-prom data/analyze_timings.prom
 """
 
 import argparse
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 from dotenv import load_dotenv
 
+import http_client
+import symbol_cache
+import timings
+
 load_dotenv()
 
 # Configuration
 N8N_BASE_URL = os.getenv("N8N_BASE_URL", "http://localhost:5678")
 WEBHOOK_PATH = "webhook/analyze"
+STATUS_PATH = "webhook/analyze-status"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 600
+# Seconds the status webhook may hold each poll open (server caps it at 25)
+POLL_WAIT = 20
+
+
+def make_session(pool_size=DEFAULT_CONCURRENCY):
+    """One keep-alive session shared by every lookup and webhook call in a run"""
+    return http_client.make_session(max(pool_size, 1))
 
 
-def lookup_symbol_by_name(name, *, count=5):
+def lookup_symbol_by_name(name, *, count=5, session=None):
     """
     Resolve a company name to a ticker using Yahoo Finance's public search API.
     Returns the raw symbol from the API (no market suffix added).
     """
-    url = "https://query1.finance.yahoo.com/v1/finance/search"
-    params = {"q": name, "quotesCount": count, "newsCount": 0}
-    resp = requests.get(
-        url,
-        params=params,
-        headers={"User-Agent": "Mozilla/5.0"},
-        timeout=10,
-    )
-    resp.raise_for_status()
-    data = resp.json() or {}
-    quotes = data.get("quotes") or []
-    candidate = next(
-        (q for q in quotes if (q.get("quoteType") or "").lower() == "equity" and q.get("symbol")),
-        None,
-    )
-    if not candidate and quotes:
-        candidate = quotes[0]
-    return (candidate.get("symbol") or "").strip().upper() if candidate else ""
-
-
-def resolve_symbol(query, default_market_suffix="US"):
+    symbol, _exchange = symbol_cache.search_yahoo(name, count=count, session=session)
+    return symbol
+
+
+def resolve_symbol(query, default_market_suffix="US", session=None):
     """
     Accepts either a ticker or a company name and returns a Stooq-friendly ticker.
     - If the input already looks like a ticker with a market suffix (e.g. AAPL.US), it is returned in uppercase.
-    - Otherwise we try to resolve the name via Yahoo search and append the provided market suffix when missing.
+    - Otherwise the shared symbol cache (seed table, on-disk cache, then Yahoo search) resolves the name
+      and the exchange's market suffix (or the provided default) is appended when missing.
     """
-    value = (query or "").strip()
-    if not value:
-        raise ValueError("A symbol or company name is required.")
-
-    if "." in value:
-        return value.upper()
-
-    symbol = ""
-    try:
-        symbol = lookup_symbol_by_name(value)
-    except Exception as exc:  # noqa: BLE001
-        # Fall back to user input if lookup fails
-        print(f"[warn] Symbol lookup failed for '{value}': {exc}")
-
-    final_symbol = (symbol or value).upper()
-    if "." not in final_symbol and default_market_suffix:
-        final_symbol = f"{final_symbol}.{default_market_suffix.upper()}"
-    return final_symbol
+    return symbol_cache.resolve(query, default_market_suffix=default_market_suffix, session=session)["symbol"]
 
 
-def trigger_analysis(symbol, lookback=60, model="models/gemini-2.5-flash"):
-    """Trigger the n8n Analyzer workflow via webhook"""
-
+def wait_for_job(job_id, session=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Long-poll the status webhook until the job is done or failed.
+    Returns the job dict; its status is still "running" when the timeout expires.
+    """
+    status_url = f"{N8N_BASE_URL}/{STATUS_PATH}"
+    deadline = time.monotonic() + timeout
+    job = {"job_id": job_id, "status": "running"}
+    while time.monotonic() < deadline:
+        wait = max(min(POLL_WAIT, deadline - time.monotonic()), 0)
+        response = (session or http_client.get_session()).get(
+            status_url,
+            params={"job_id": job_id, "wait": int(wait)},
+            timeout=wait + 15,
+        )
+        response.raise_for_status()
+        job = response.json()
+        if job.get("status") in ("done", "failed"):
+            break
+        if job.get("status") == "unknown":
+            # The job file is written before the 202 is sent, so this is only a slow disk
+            time.sleep(1)
+    return job
+
+
+def request_analysis(
+    symbol,
+    lookback=60,
+    model="models/gemini-2.5-flash",
+    session=None,
+    timeout=DEFAULT_TIMEOUT,
+    extra_payload=None,
+):
+    """
+    Submit one analysis job to the webhook, wait for it and return an outcome dict (never raises):
+    symbol, ok, status, job_id, result, error, error_kind (timeout|connection|http|job|unexpected), elapsed,
+    timings (client-side submit_ms, wait_ms, elapsed_ms; the workflow's stages are in result["timings"]).
+    extra_payload adds optional webhook fields (e.g. prompt_mode, prompt_budget, no_cache).
+    """
     webhook_url = f"{N8N_BASE_URL}/{WEBHOOK_PATH}"
-
     payload = {
         "symbol": symbol,
         "lookback": lookback,
         "model": model,
     }
+    payload.update(extra_payload or {})
+    outcome = {
+        "symbol": symbol,
+        "ok": False,
+        "status": None,
+        "job_id": None,
+        "result": None,
+        "error": "",
+        "error_kind": "",
+        "timings": {},
+    }
+    started = time.perf_counter()
+    try:
+        response = (session or http_client.get_session()).post(webhook_url, json=payload, timeout=30)
+        outcome["timings"]["submit_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        outcome["status"] = response.status_code
+        if response.status_code not in (200, 202):
+            outcome["error_kind"] = "http"
+            outcome["error"] = f"HTTP {response.status_code}: {response.text[:200]}"
+            outcome["text"] = response.text
+        else:
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text[:500]
+            if isinstance(body, dict) and body.get("job_id") and "value" not in body:
+                outcome["job_id"] = str(body["job_id"])
+                waited = time.perf_counter()
+                job = wait_for_job(outcome["job_id"], session=session, timeout=timeout)
+                outcome["timings"]["wait_ms"] = round((time.perf_counter() - waited) * 1000, 1)
+                if job.get("status") == "done":
+                    outcome["ok"] = True
+                    outcome["result"] = job.get("result")
+                elif job.get("status") == "failed":
+                    outcome["error_kind"] = "job"
+                    outcome["error"] = f"Job {outcome['job_id']} failed: {job.get('error') or 'unknown error'}"
+                else:
+                    outcome["error_kind"] = "timeout"
+                    outcome["error"] = f"Job {outcome['job_id']} still running after {timeout}s"
+            else:
+                # Workflows deployed before the job API answer with the result directly
+                outcome["ok"] = True
+                outcome["result"] = body
+    except requests.exceptions.Timeout:
+        outcome["error_kind"] = "timeout"
+        outcome["error"] = "Request timeout while submitting or polling the job"
+    except requests.exceptions.ConnectionError:
+        outcome["error_kind"] = "connection"
+        outcome["error"] = f"Connection error: Could not reach n8n at {N8N_BASE_URL}"
+    except Exception as exc:  # noqa: BLE001
+        outcome["error_kind"] = "unexpected"
+        outcome["error"] = f"Unexpected error: {exc}"
+    outcome["elapsed"] = time.perf_counter() - started
+    outcome["timings"]["elapsed_ms"] = round(outcome["elapsed"] * 1000, 1)
+    return outcome
+
+
+def trigger_analysis(
+    symbol,
+    lookback=60,
+    model="models/gemini-2.5-flash",
+    session=None,
+    extra_payload=None,
+    timeout=DEFAULT_TIMEOUT,
+    show_timings=False,
+    resolve_ms=None,
+    outcomes=None,
+):
+    """
+    Trigger the n8n Analyzer workflow via webhook.
+    Pass a list as `outcomes` to collect the outcome (timings export).
+    """
+
+    webhook_url = f"{N8N_BASE_URL}/{WEBHOOK_PATH}"
 
     print(f"[>] Analyzing {symbol}...")
     print(f"    Lookback: {lookback} days")
@@ -90,54 +190,184 @@ def trigger_analysis(symbol, lookback=60, model="models/gemini-2.5-flash"):
     print(f"    Webhook: {webhook_url}")
     print()
 
-    try:
-        response = requests.post(webhook_url, json=payload, timeout=120)
-
-        if response.status_code == 200:
-            print("[ok] Analysis complete!")
-            print()
-
-            # Try to parse response
-            try:
-                result = response.json()
-                if isinstance(result, dict):
-                    print("[info] Results:")
-                    print(f"    Symbol: {result.get('symbol', 'N/A')}")
-                    print(f"    Date: {result.get('date', 'N/A')}")
-                    print(f"    Signal: {result.get('value', 'N/A')}")
-                    print(f"    Confidence: {result.get('threshold', 'N/A')}")
-                    print(f"    Message: {result.get('message', 'N/A')}")
-                else:
-                    print(f"Response: {result}")
-            except Exception:
-                print(f"Response (raw): {response.text[:500]}")
-
-            print()
-            print("[info] Results saved to: data/signals.xlsx")
-            return True
-
-        print(f"[err] HTTP {response.status_code}")
-        print(f"    {response.text}")
-        return False
-
-    except requests.exceptions.Timeout:
-        print("[warn] Request timeout (analysis may still be running in background)")
-        print("       Check n8n execution logs or signals.xlsx for results")
-        return False
-
-    except requests.exceptions.ConnectionError:
+    outcome = request_analysis(
+        symbol,
+        lookback=lookback,
+        model=model,
+        session=session,
+        timeout=timeout,
+        extra_payload=extra_payload,
+    )
+    if resolve_ms is not None:
+        outcome["timings"]["resolve_ms"] = resolve_ms
+    if outcomes is not None:
+        outcomes.append(outcome)
+    if outcome["job_id"]:
+        print(f"[info] Job: {outcome['job_id']}")
+
+    if outcome["ok"]:
+        print("[ok] Analysis complete!")
+        print()
+
+        result = outcome["result"]
+        if isinstance(result, dict):
+            print("[info] Results:")
+            print(f"    Symbol: {result.get('symbol', 'N/A')}")
+            print(f"    Date: {result.get('date', 'N/A')}")
+            print(f"    Signal: {result.get('value', 'N/A')}")
+            print(f"    Confidence: {result.get('threshold', 'N/A')}")
+            print(f"    Message: {result.get('message', 'N/A')}")
+            if result.get("cache"):
+                print(
+                    f"    Cache: {result['cache']} "
+                    f"(hits {result.get('cache_hits', 0)}, misses {result.get('cache_misses', 0)})"
+                )
+        else:
+            print(f"Response: {result}")
+        if show_timings:
+            print("[info] Timings:")
+            for line in timings.format_timings(timings.record(outcome)):
+                print(line)
+
+        print()
+        print("[info] Results saved to: data/signals.xlsx")
+        return True
+
+    if outcome["error_kind"] == "http":
+        print(f"[err] HTTP {outcome['status']}")
+        print(f"    {outcome['text']}")
+    elif outcome["error_kind"] == "timeout":
+        print(f"[warn] {outcome['error']}")
+        if outcome["job_id"]:
+            print(f"       Check later with: python jobs.py status {outcome['job_id']}")
+    elif outcome["error_kind"] == "job":
+        print(f"[err] {outcome['error']}")
+    elif outcome["error_kind"] == "connection":
         print("[err] Connection error: Could not reach n8n")
         print(f"      Make sure n8n is running at {N8N_BASE_URL}")
-        return False
-
-    except Exception as exc:  # noqa: BLE001
-        print(f"[err] Unexpected error: {exc}")
-        return False
+    else:
+        print(f"[err] {outcome['error']}")
+    return False
+
+
+def analyze_many(
+    queries,
+    lookback=60,
+    model="models/gemini-2.5-flash",
+    market="US",
+    concurrency=DEFAULT_CONCURRENCY,
+    extra_payload=None,
+    timeout=DEFAULT_TIMEOUT,
+):
+    """
+    Resolve and analyze many queries concurrently over one pooled session.
+    Yields outcome dicts in completion order.
+    """
+    session = make_session(concurrency)
+
+    def failed(query, error, kind, started):
+        elapsed = time.perf_counter() - started
+        return {"query": query, "symbol": query, "ok": False, "error": error, "error_kind": kind, "elapsed": elapsed, "timings": {}}
+
+    def run(query):
+        started = time.perf_counter()
+        try:
+            symbol = resolve_symbol(query, default_market_suffix=market, session=session)
+        except ValueError as exc:
+            return failed(query, str(exc), "input", started)
+        except Exception as exc:  # noqa: BLE001
+            # One bad symbol must not abort the whole batch (future.result() would re-raise it)
+            return failed(query, f"Unexpected error: {exc}", "unexpected", started)
+        resolve_ms = round((time.perf_counter() - started) * 1000, 1)
+        outcome = request_analysis(
+            symbol,
+            lookback=lookback,
+            model=model,
+            session=session,
+            timeout=timeout,
+            extra_payload=extra_payload,
+        )
+        outcome["query"] = query
+        outcome["timings"]["resolve_ms"] = resolve_ms
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        futures = [pool.submit(run, query) for query in queries]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def print_outcome(outcome, show_timings=False):
+    """One line per finished symbol (batch mode), plus its stage timings with show_timings"""
+    label = outcome["symbol"]
+    if outcome.get("query") and outcome["query"].upper() != label:
+        label = f"{outcome['query']} -> {label}"
+    if outcome["ok"]:
+        result = outcome["result"] if isinstance(outcome["result"], dict) else {}
+        cached = " [cached]" if result.get("cache") == "hit" else ""
+        print(
+            f"[ok] {label}: {result.get('value', 'N/A')} "
+            f"(confidence {result.get('threshold', 'N/A')}, date {result.get('date', 'N/A')}) "
+            f"in {outcome['elapsed']:.1f}s{cached}"
+        )
+    else:
+        print(f"[err] {label}: {outcome['error']}")
+    if show_timings:
+        for line in timings.format_timings(timings.record(outcome)):
+            print(line)
+    sys.stdout.flush()
+
+
+def print_summary(outcomes, wall_seconds):
+    ok = sum(1 for o in outcomes if o["ok"])
+    cached = sum(1 for o in outcomes if o["ok"] and isinstance(o["result"], dict) and o["result"].get("cache") == "hit")
+    latencies = sorted(o["elapsed"] for o in outcomes if o.get("elapsed"))
+    mean = sum(latencies) / len(latencies) if latencies else 0.0
+    rate = len(outcomes) / wall_seconds * 60 if wall_seconds else 0.0
+    print()
+    print("[info] Summary:")
+    print(f"    Symbols: {len(outcomes)} ({ok} ok, {len(outcomes) - ok} failed)")
+    print(f"    Cache hits: {cached}")
+    print(f"    Wall time: {wall_seconds:.1f}s")
+    print(f"    Throughput: {rate:.1f} symbols/min")
+    if latencies:
+        print(f"    Latency: mean {mean:.1f}s, max {latencies[-1]:.1f}s")
+
+
+def export_timings(outcomes, jsonl_path="", prom_path=""):
+    """Append timing records to a JSON lines file and/or write them as Prometheus text."""
+    if not (jsonl_path or prom_path):
+        return
+    records = [timings.record(o) for o in outcomes]
+    if jsonl_path:
+        timings.append_jsonl(records, jsonl_path)
+        print(f"[info] Timings appended to: {jsonl_path}")
+    if prom_path:
+        with open(prom_path, "w", encoding="utf-8") as fh:
+            fh.write(timings.to_prometheus(records))
+        print(f"[info] Timings written to: {prom_path}")
+
+
+def read_queries(args):
+    """Collect queries from positional arguments, --file and stdin ("-")"""
+    lines = []
+    for item in args.queries:
+        lines.extend(sys.stdin.read().splitlines() if item == "-" else [item])
+    if args.file:
+        with open(args.file, encoding="utf-8") as fh:
+            lines.extend(fh.read().splitlines())
+
+    queries = []
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if line:
+            queries.append(line)
+    return queries
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Analyze a stock by ticker or company name using Gemini AI",
+        description="Analyze stocks by ticker or company name using Gemini AI",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
@@ -145,13 +375,29 @@ Examples:
   python analyze.py AAPL.US --lookback 30
   python analyze.py "Apple Inc" --market US
   python analyze.py "Tesla" --model models/gemini-2.0-flash-exp
+  python analyze.py AAPL.US MSFT.US "삼성전자" --concurrency 8
+  python analyze.py --file watchlist.txt
+  cat watchlist.txt | python analyze.py -
         """,
     )
 
     parser.add_argument(
-        "query",
+        "queries",
+        nargs="*",
+        help="Stock symbols or company names to analyze (e.g., AAPL.US or Apple); '-' reads stdin",
+    )
+
+    parser.add_argument(
+        "--file",
         type=str,
-        help="Stock symbol or company name to analyze (e.g., AAPL.US or Apple)",
+        help="Read symbols/company names from a file (one per line, '#' comments allowed)",
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum analyses in flight when several symbols are given (default: {DEFAULT_CONCURRENCY})",
     )
 
     parser.add_argument(
@@ -175,28 +421,116 @@ Examples:
         help="Market suffix to append when lookup returns a bare ticker (default: US -> .US)",
     )
 
+    parser.add_argument(
+        "--prompt-mode",
+        type=str,
+        default="auto",
+        choices=["auto", "csv", "rounded", "delta", "weekly", "summary"],
+        help="Price window encoding in the prompt (default: auto, picks the richest that fits --prompt-budget)",
+    )
+
+    parser.add_argument(
+        "--prompt-budget",
+        type=int,
+        default=1200,
+        help="Token budget for the price window when --prompt-mode is auto (default: 1200)",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the model instead of reusing a cached analysis for the same window",
+    )
+
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=DEFAULT_TIMEOUT,
+        help=f"Seconds to wait for each analysis job (default: {DEFAULT_TIMEOUT})",
+    )
+
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print per-stage timings (workflow stages and client-side lookup/submit/wait)",
+    )
+
+    parser.add_argument(
+        "--timings-jsonl",
+        type=str,
+        default="",
+        help="Append one timing record per symbol to this JSON lines file",
+    )
+
+    parser.add_argument(
+        "--timings-prom",
+        type=str,
+        default="",
+        help="Write this run's timings as Prometheus text to this file",
+    )
+
     args = parser.parse_args()
+    extra_payload = {"prompt_mode": args.prompt_mode, "prompt_budget": args.prompt_budget}
+    if args.no_cache:
+        extra_payload["no_cache"] = True
 
-    if not args.query or len(args.query.strip()) < 1:
+    queries = read_queries(args)
+    if not queries:
         print("[err] A symbol or company name is required.")
         sys.exit(1)
 
+    if len(queries) > 1:
+        print(f"[>] Analyzing {len(queries)} symbols (concurrency {args.concurrency})...")
+        print(f"    Lookback: {args.lookback} days")
+        print(f"    Model: {args.model}")
+        print(f"    Webhook: {N8N_BASE_URL}/{WEBHOOK_PATH}")
+        print()
+        started = time.perf_counter()
+        outcomes = []
+        for outcome in analyze_many(
+            queries,
+            lookback=args.lookback,
+            model=args.model,
+            market=args.market,
+            concurrency=args.concurrency,
+            extra_payload=extra_payload,
+            timeout=args.timeout,
+        ):
+            print_outcome(outcome, show_timings=args.timings)
+            outcomes.append(outcome)
+        print_summary(outcomes, time.perf_counter() - started)
+        export_timings(outcomes, args.timings_jsonl, args.timings_prom)
+        sys.exit(0 if all(o["ok"] for o in outcomes) else 1)
+
+    query = queries[0]
+    # The lookup, the submit and every status poll reuse one connection per host
+    session = http_client.get_session()
+    started = time.perf_counter()
     try:
-        symbol = resolve_symbol(args.query, default_market_suffix=args.market)
+        symbol = resolve_symbol(query, default_market_suffix=args.market, session=session)
     except ValueError as exc:
         print(f"[err] {exc}")
         sys.exit(1)
+    resolve_ms = round((time.perf_counter() - started) * 1000, 1)
 
-    if symbol != args.query.upper():
-        print(f"[info] Resolved '{args.query}' -> {symbol}")
+    if symbol != query.upper():
+        print(f"[info] Resolved '{query}' -> {symbol}")
     else:
         print(f"[info] Using symbol: {symbol}")
 
+    outcomes = []
     success = trigger_analysis(
         symbol=symbol,
         lookback=args.lookback,
         model=args.model,
+        session=session,
+        extra_payload=extra_payload,
+        timeout=args.timeout,
+        show_timings=args.timings,
+        resolve_ms=resolve_ms,
+        outcomes=outcomes,
     )
+    export_timings(outcomes, args.timings_jsonl, args.timings_prom)
 
     sys.exit(0 if success else 1)
 
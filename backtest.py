@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Backtest - vectorized evaluation of stored signals against the price store
+
+Joins the signal history (signal_history.py) with daily closes (price_store.py) as
+date x symbol matrices and computes, for every symbol at once:
+    - forward returns after each signal (--horizons, in bars)
+    - hit rate: BUY followed by a rise, SELL by a fall (HOLD is not scored)
+    - an equal-weight equity curve holding each symbol's latest signal
+      (BUY long, SELL short or flat with --long-only, HOLD flat) from the next bar on
+and the same for rule-based baselines computed from the closes (--baseline):
+    sma  long when SMA20 > SMA60, short (or flat) otherwise
+    rsi  long below RSI 30, short above RSI 70, flat in between
+
+Usage:
+    python backtest.py
+    python backtest.py --symbols AAPL.US MSFT.US --start 2024-01-01 --horizons 1 5 20
+    python backtest.py --baseline sma rsi --long-only --equity-csv data/backtest_equity.csv
+"""
+
+import argparse
+import json
+import math
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import price_store
+import signal_history
+
+DEFAULT_HORIZONS = [1, 5, 20]
+SIGNAL_POSITIONS = {"BUY": 1.0, "SELL": -1.0, "HOLD": 0.0}
+TRADING_DAYS = 252
+
+
+def load_closes(symbols=None, store_dir=price_store.STORE_DIR):
+    """Closing prices as a date x symbol frame (DatetimeIndex, NaN where a symbol has no bar)."""
+    series = {}
+    for symbol in symbols or price_store.list_symbols(store_dir):
+        frame = price_store.read_symbol(symbol, store_dir, columns=["date", "close"])
+        if frame.empty:
+            continue
+        series[price_store.normalize_symbol(symbol)] = frame.set_index("date")["close"].astype(float)
+    if not series:
+        return pd.DataFrame()
+    closes = pd.DataFrame(series)
+    closes.index = pd.to_datetime(closes.index)
+    return closes.sort_index()
+
+
+def signal_matrix(signals, index, columns):
+    """
+    Latest signal per (bar, symbol) as +1/-1/0, NaN where no signal was issued.
+    Signals dated on a non-trading day are attached to the last bar on or before that date.
+    """
+    values = np.full((len(index), len(columns)), np.nan)
+    if signals.empty or index.empty:
+        return pd.DataFrame(values, index=index, columns=columns)
+    frame = signals[signals["symbol"].str.upper().isin(columns)].copy()
+    frame["position"] = frame["value"].str.upper().map(SIGNAL_POSITIONS)
+    frame = frame.dropna(subset=["position"])
+    frame["bar"] = index.searchsorted(pd.to_datetime(frame["date"]), side="right") - 1
+    frame = frame[frame["bar"] >= 0].sort_values(["date", "created_at"])
+    frame = frame.drop_duplicates(subset=["bar", "symbol"], keep="last")
+    rows = frame["bar"].to_numpy()
+    cols = columns.get_indexer(frame["symbol"].str.upper())
+    values[rows, cols] = frame["position"].to_numpy()
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def forward_returns(closes, horizon):
+    return closes.shift(-horizon) / closes - 1
+
+
+def hit_rates(events, closes, horizons):
+    """Per horizon: scored signals, hit rate and mean signed forward return."""
+    scored = events.where(events != 0)
+    out = {}
+    for horizon in horizons:
+        fwd = forward_returns(closes, horizon)
+        valid = scored.notna() & fwd.notna()
+        signed = (scored * fwd)[valid]
+        count = int(valid.to_numpy().sum())
+        hits = int((signed > 0).to_numpy().sum())
+        out[str(horizon)] = {
+            "signals": count,
+            "hit_rate": round(hits / count, 4) if count else None,
+            "mean_return": _round(np.nanmean(signed.to_numpy()) if count else None),
+        }
+    return out
+
+
+def equity_curve(positions, closes, long_only=False):
+    """Equal-weight daily returns of holding `positions` (decided at a bar's close) from the next bar."""
+    held = positions.clip(lower=0) if long_only else positions
+    daily = closes.pct_change(fill_method=None)
+    pnl = held.shift(1) * daily
+    active = held.shift(1).notna() & daily.notna()
+    returns = pnl.where(active).sum(axis=1) / active.sum(axis=1).replace(0, np.nan)
+    returns = returns.fillna(0.0)
+    return returns, (1 + returns).cumprod()
+
+
+def _round(value, digits=4):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return round(float(value), digits)
+
+
+def performance(returns, equity):
+    if equity.empty:
+        return {"total_return": None, "cagr": None, "max_drawdown": None, "sharpe": None}
+    years = len(equity) / TRADING_DAYS
+    total = equity.iloc[-1] - 1
+    std = returns.std()
+    return {
+        "total_return": _round(total),
+        "cagr": _round(equity.iloc[-1] ** (1 / years) - 1 if years and equity.iloc[-1] > 0 else None),
+        "max_drawdown": _round((equity / equity.cummax() - 1).min()),
+        "sharpe": _round(returns.mean() / std * math.sqrt(TRADING_DAYS) if std else None),
+    }
+
+
+def baseline_events(closes, rule):
+    """Rule-based signals on every bar (+1/-1/0, NaN during warm-up)."""
+    if rule == "sma":
+        fast, slow = indicators.sma(closes, 20), indicators.sma(closes, 60)
+        return np.sign(fast - slow).where(slow.notna())
+    if rule == "rsi":
+        rsi = indicators.rsi(closes)
+        events = pd.DataFrame(np.select([rsi < 30, rsi > 70], [1.0, -1.0], 0.0), index=closes.index, columns=closes.columns)
+        return events.where(rsi.notna())
+    raise ValueError(f"Unknown baseline: {rule}")
+
+
+def evaluate(events, closes, horizons, long_only=False, carry=True):
+    """Score signal events and the equity curve of holding them (forward-filled when carry)."""
+    positions = events.ffill() if carry else events
+    returns, equity = equity_curve(positions, closes, long_only=long_only)
+    result = {"symbols": int(events.notna().any().sum()), "events": int(events.notna().to_numpy().sum())}
+    result["hit_rate"] = hit_rates(events, closes, horizons)
+    result.update(performance(returns, equity))
+    return result, equity
+
+
+def run(
+    symbols=None,
+    start=None,
+    end=None,
+    horizons=DEFAULT_HORIZONS,
+    baselines=(),
+    long_only=False,
+    store_dir=price_store.STORE_DIR,
+    history_dir=signal_history.HISTORY_DIR,
+):
+    """Backtest the stored signals (and baselines). Returns (report, equity curves frame)."""
+    full = load_closes(symbols, store_dir)
+    # Baselines warm up on the bars before --start
+    period = slice(start or None, end or None)
+    closes = full.loc[period] if not full.empty else full
+    if closes.empty:
+        return {"error": "No prices in the store for the requested symbols and period"}, pd.DataFrame()
+    signals = signal_history.read_all(list(closes.columns), start, end, history_dir)
+    report = {
+        "period": f"{closes.index[0]:%Y-%m-%d}..{closes.index[-1]:%Y-%m-%d}",
+        "bars": len(closes),
+        "symbols": len(closes.columns),
+        "strategies": {},
+    }
+    curves = {}
+    events = signal_matrix(signals, closes.index, closes.columns)
+    report["strategies"]["signals"], curves["signals"] = evaluate(events, closes, horizons, long_only)
+    for rule in baselines:
+        events = baseline_events(full, rule).loc[period]
+        report["strategies"][rule], curves[rule] = evaluate(events, closes, horizons, long_only)
+    return report, pd.DataFrame(curves)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Vectorized backtest of stored signals and rule-based baselines",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("--symbols", nargs="*", help="Symbols to test (default: every symbol in the price store)")
+    parser.add_argument("--start", default="", help="First bar date (YYYY-MM-DD)")
+    parser.add_argument("--end", default="", help="Last bar date (YYYY-MM-DD)")
+    parser.add_argument("--horizons", nargs="*", type=int, default=DEFAULT_HORIZONS, help="Forward return horizons in bars")
+    parser.add_argument("--baseline", nargs="*", default=["sma"], choices=["sma", "rsi"], help="Rule baselines (default: sma)")
+    parser.add_argument("--long-only", action="store_true", help="Treat SELL as flat instead of short")
+    parser.add_argument("--equity-csv", default="", help="Write the equity curves to this CSV")
+    args = parser.parse_args()
+
+    report, curves = run(
+        symbols=[unquote(s) for s in args.symbols] if args.symbols else None,
+        start=unquote(args.start) or None,
+        end=unquote(args.end) or None,
+        horizons=args.horizons,
+        baselines=args.baseline,
+        long_only=args.long_only,
+    )
+    if args.equity_csv and not curves.empty:
+        curves.to_csv(args.equity_csv, index_label="date", date_format="%Y-%m-%d")
+        report["equity_csv"] = args.equity_csv
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Batch Analyzer - analyze many symbols with one Gemini request per batch
+
+The Analyzer workflow sends one prompt per symbol, so on a large watchlist request
+overhead and rate limits dominate. This packs several symbols' compact windows
+(prompt_compact.py, with indicators) into one generateContent call up to a token budget,
+asks for a JSON array back, validates every element and splits it into per-symbol signal
+rows. Symbols missing from the reply or failing validation are retried one at a time.
+
+Results go where the Analyzer puts them: data/signals.db (plus signal history), the
+analysis cache (same keys, so cached symbols are not sent again) and optionally
+signals.xlsx. Calls the Gemini REST API directly (GEMINI_API_KEY, GEMINI_API_URL).
+
+Usage:
+    python batch_analyzer.py
+    python batch_analyzer.py --symbols AAPL.US MSFT.US 005930.KS --lookback 60
+    python batch_analyzer.py --batch-budget 12000 --max-batch 25 --workers 2
+    python batch_analyzer.py --dry-run
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import unquote
+
+import requests
+
+import analysis_cache
+import collect_batch
+import http_client
+import price_store
+import prompt_compact
+import rate_limit
+import signal_history
+import signal_store
+import write_queue
+
+GEMINI_API_URL = os.getenv("GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+DEFAULT_MODEL = "models/gemini-2.5-flash"
+# Tokens of packed symbol sections per request (the reply grows with the batch too)
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "12000"))
+MAX_BATCH_SYMBOLS = int(os.getenv("MAX_BATCH_SYMBOLS", "25"))
+DEFAULT_WORKERS = 2
+SIGNALS = ("BUY", "SELL", "HOLD")
+INDICATOR_FIELDS = ["close", "sma20", "sma60", "ema12", "ema26", "rsi14", "macd", "macd_signal", "macd_hist", "atr14", "trend"]
+
+BATCH_INSTRUCTIONS = [
+    "You are a trading assistant. For EACH symbol below, interpret the precomputed indicators and daily OHLCV history",
+    "and return ONLY a valid JSON array (no markdown, no extra text) with one object per symbol, in the order given.",
+    "Indicators are already computed exactly from the close prices; do not recompute them (null means not enough data).",
+    "Object fields: symbol (exactly as given), as_of, signal (BUY|SELL|HOLD), confidence (0..1), summary (Korean, 1-2 sentences).",
+]
+SINGLE_INSTRUCTIONS = [
+    "You are a trading assistant. Interpret the precomputed indicators and daily OHLCV history for one symbol and return ONLY valid JSON (no markdown, no extra text).",
+    "Indicators are already computed exactly from the close prices; do not recompute them (null means not enough data).",
+    "Return fields: symbol, as_of, signal (BUY|SELL|HOLD), confidence (0..1), summary (Korean, 1-2 sentences).",
+]
+
+
+def _indicator_value(value):
+    return "null" if value is None else value
+
+
+def symbol_section(prepared):
+    """The per-symbol part of the prompt (same lines as the Analyzer's Build prompt)."""
+    ind = prepared.get("indicators") or {}
+    window = prepared.get("window") or {}
+    return "\n".join([
+        f"symbol: {prepared['symbol']}",
+        f"as_of: {prepared['as_of']}",
+        "indicators: " + ", ".join(f"{k}: {_indicator_value(ind.get(k))}" for k in INDICATOR_FIELDS),
+        "",
+        f"data_header: {window.get('header', '')}",
+        "data (oldest first):",
+        window.get("text", ""),
+    ])
+
+
+def build_prompt(sections):
+    instructions = BATCH_INSTRUCTIONS if len(sections) > 1 else SINGLE_INSTRUCTIONS
+    return "\n".join(instructions) + "\n\n" + "\n\n".join(sections)
+
+
+def pack_batches(items, budget=BATCH_TOKEN_BUDGET, max_symbols=MAX_BATCH_SYMBOLS):
+    """Greedy packing of [(symbol, section)] into batches under the token budget."""
+    batches, current, used = [], [], 0
+    for item in items:
+        tokens = prompt_compact.estimate_tokens(item[1])
+        if current and (used + tokens > budget or len(current) >= max_symbols):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def call_gemini(prompt, model=DEFAULT_MODEL, api_key="", session=None, timeout=120):
+    """One generateContent call. Returns the reply text."""
+    model = model if model.startswith("models/") else f"models/{model}"
+    resp = rate_limit.request(
+        session,
+        "POST",
+        f"{GEMINI_API_URL}/{model}:generateContent",
+        params={"key": api_key} if api_key else None,
+        json={
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": 0.2, "responseMimeType": "application/json"},
+        },
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    candidates = (resp.json() or {}).get("candidates") or []
+    parts = ((candidates[0] if candidates else {}).get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+def validate_reply(text, expected):
+    """
+    Parse a model reply and check each element against the requested symbols.
+    Returns ({symbol: analysis}, {symbol: reason}) covering every expected symbol.
+    """
+    clean = re.sub(r"```(?:json)?", "", text or "").strip()
+    try:
+        data = json.loads(clean)
+    except ValueError as exc:
+        return {}, {symbol: f"invalid JSON: {exc}" for symbol in expected}
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return {}, {symbol: "reply is not a JSON array" for symbol in expected}
+
+    valid = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        symbol = price_store.normalize_symbol(str(item.get("symbol") or ""))
+        if symbol not in expected or symbol in valid:
+            continue
+        signal = str(item.get("signal") or "").strip().upper()
+        try:
+            confidence = float(item.get("confidence"))
+        except (TypeError, ValueError):
+            confidence = None
+        summary = item.get("summary")
+        if signal in SIGNALS and confidence is not None and 0 <= confidence <= 1 and isinstance(summary, str) and summary.strip():
+            valid[symbol] = {"signal": signal, "confidence": confidence, "summary": summary.strip()}
+    errors = {symbol: "missing or invalid element" for symbol in expected if symbol not in valid}
+    return valid, errors
+
+
+def make_analysis(prepared, reply):
+    """The analysis object the Analyzer caches (Parse analysis JSON)."""
+    ind = prepared.get("indicators") or {}
+    return {
+        "symbol": prepared["symbol"],
+        "as_of": prepared["as_of"],
+        "signal": reply["signal"],
+        "confidence": reply["confidence"],
+        "summary": reply["summary"],
+        "sma20": ind.get("sma20"),
+        "sma60": ind.get("sma60"),
+        "rsi14": ind.get("rsi14"),
+        "macd_hist": ind.get("macd_hist"),
+        "atr14": ind.get("atr14"),
+        "trend": ind.get("trend") or "",
+    }
+
+
+def signal_row(analysis, created_at):
+    """Set signal row (gemini) for one analysis."""
+    return {
+        "key": f"{analysis['symbol']}|gemini",
+        "symbol": analysis["symbol"],
+        "date": analysis.get("as_of") or created_at[:10],
+        "type": "gemini",
+        "value": analysis.get("signal") or "HOLD",
+        "threshold": analysis.get("confidence"),
+        "message": analysis.get("summary") or "",
+        "sma20": analysis.get("sma20"),
+        "sma60": analysis.get("sma60"),
+        "rsi14": analysis.get("rsi14"),
+        "macd_hist": analysis.get("macd_hist"),
+        "atr14": analysis.get("atr14"),
+        "trend": analysis.get("trend") or "",
+        "created_at": created_at,
+    }
+
+
+def analyze_batch(batch, prepared, model, api_key, session):
+    """One batched call plus individual retries. Returns (analyses, errors, requests, recovered)."""
+    expected = [symbol for symbol, _ in batch]
+    analyses, errors, calls = {}, {}, 0
+    try:
+        calls += 1
+        valid, errors = validate_reply(call_gemini(build_prompt([s for _, s in batch]), model, api_key, session), expected)
+    except requests.exceptions.RequestException as exc:
+        valid, errors = {}, {symbol: f"request failed: {exc}" for symbol in expected}
+    for symbol, reply in valid.items():
+        analyses[symbol] = make_analysis(prepared[symbol], reply)
+    if len(batch) == 1:
+        return analyses, errors, calls, 0
+
+    sections = dict(batch)
+    recovered = 0
+    for symbol in list(errors):
+        try:
+            calls += 1
+            valid, failed = validate_reply(call_gemini(build_prompt([sections[symbol]]), model, api_key, session), [symbol])
+        except requests.exceptions.RequestException as exc:
+            valid, failed = {}, {symbol: f"request failed: {exc}"}
+        if symbol in valid:
+            analyses[symbol] = make_analysis(prepared[symbol], valid[symbol])
+            errors.pop(symbol)
+            recovered += 1
+        else:
+            errors[symbol] = failed[symbol]
+    return analyses, errors, calls, recovered
+
+
+def run(symbols, lookback=60, model=DEFAULT_MODEL, prompt_mode="auto", prompt_budget=prompt_compact.DEFAULT_BUDGET,
+        batch_budget=BATCH_TOKEN_BUDGET, max_batch=MAX_BATCH_SYMBOLS, workers=DEFAULT_WORKERS, use_cache=True,
+        dry_run=False, export_xlsx=False, api_key=None):
+    """Analyze `symbols` in batches. Returns a JSON-serializable summary."""
+    started = time.perf_counter()
+    api_key = os.getenv("GEMINI_API_KEY", "") if api_key is None else api_key
+    created_at = datetime.now(timezone.utc).isoformat()
+
+    prepared, keys, cached, skipped = {}, {}, {}, []
+    for symbol in dict.fromkeys(price_store.normalize_symbol(s) for s in symbols if s):
+        result = prompt_compact.prepare(symbol, lookback, mode=prompt_mode, budget=prompt_budget, with_indicators=True)
+        if not result["as_of"]:
+            skipped.append(symbol)
+            continue
+        prepared[symbol] = result
+        keys[symbol] = analysis_cache.cache_key(
+            symbol, result["as_of"], lookback, model, prompt_mode=prompt_mode, prompt_budget=prompt_budget
+        )
+        if use_cache:
+            analysis, _ = analysis_cache.get(keys[symbol][0])
+            if analysis is not None:
+                cached[symbol] = analysis
+
+    pending = [(symbol, symbol_section(prepared[symbol])) for symbol in prepared if symbol not in cached]
+    batches = pack_batches(pending, batch_budget, max_batch)
+    summary = {
+        "symbols": len(prepared) + len(skipped),
+        "skipped_no_prices": skipped,
+        "cache_hits": len(cached),
+        "batches": [len(batch) for batch in batches],
+    }
+    if dry_run:
+        summary["est_tokens"] = [sum(prompt_compact.estimate_tokens(s) for _, s in batch) for batch in batches]
+        return summary
+
+    analyses, errors, requests_made, recovered = dict(cached), {}, 0, 0
+    session = http_client.make_session(max(workers, 1))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for done, failed, calls, retried in pool.map(lambda b: analyze_batch(b, prepared, model, api_key, session), batches):
+            requests_made += calls
+            recovered += retried
+            for symbol, analysis in done.items():
+                analyses[symbol] = analysis
+                analysis_cache.put(keys[symbol][0], keys[symbol][1], analysis)
+            errors.update(failed)
+
+    rows = [signal_row(analyses[symbol], created_at) for symbol in prepared if symbol in analyses]
+    written = signal_store.upsert(rows) if rows else 0
+    if rows:
+        try:
+            summary["history"] = signal_history.append(rows)
+        except Exception as exc:  # noqa: BLE001
+            print(f"[warn] History append failed: {exc}", file=sys.stderr)
+            summary["history"] = {"error": str(exc)}
+    if rows and export_xlsx:
+        write = write_queue.submit([("signals-xlsx", None)])
+        summary["export"] = write["mode"]
+        if write.get("error"):
+            summary["export_error"] = write["error"]
+    summary.update({
+        "requests": requests_made,
+        "recovered_individually": recovered,
+        "ok": len(rows),
+        "written": written,
+        "failed": len(errors),
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Analyze many symbols with one Gemini request per batch",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("--symbols", nargs="*", help="Analyze these symbols instead of config.xlsx")
+    parser.add_argument("--config", default=str(collect_batch.CONFIG_XLSX_PATH), help="Path to config.xlsx")
+    parser.add_argument("--lookback", type=int, default=60)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--prompt-mode", default="auto", choices=["auto"] + prompt_compact.MODES)
+    parser.add_argument("--prompt-budget", type=int, default=prompt_compact.DEFAULT_BUDGET, help="Token budget per symbol window")
+    parser.add_argument("--batch-budget", type=int, default=BATCH_TOKEN_BUDGET, help="Token budget per request")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SYMBOLS, help="Symbols per request")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent requests")
+    parser.add_argument("--no-cache", action="store_true", help="Skip cache lookups (results are still stored)")
+    parser.add_argument("--export-xlsx", action="store_true", help="Also refresh data/signals.xlsx")
+    parser.add_argument("--dry-run", action="store_true", help="Only show how the symbols would be batched")
+    args = parser.parse_args()
+
+    if args.symbols:
+        symbols = [unquote(s) for s in args.symbols]
+    else:
+        symbols = [entry["symbol"] for entry in collect_batch.read_config(unquote(args.config))]
+    if not symbols:
+        print(json.dumps({"symbols": 0, "error": "No active symbols in config.xlsx"}))
+        sys.exit(1)
+
+    summary = run(
+        symbols,
+        lookback=args.lookback,
+        model=unquote(args.model),
+        prompt_mode=args.prompt_mode,
+        prompt_budget=args.prompt_budget,
+        batch_budget=args.batch_budget,
+        max_batch=args.max_batch,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        dry_run=args.dry_run,
+        export_xlsx=args.export_xlsx,
+    )
+    print(json.dumps(summary, ensure_ascii=False))
+    sys.exit(1 if summary.get("failed") else 0)
+
+
+if __name__ == "__main__":
+    main()
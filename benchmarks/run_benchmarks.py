@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - collect, analyze and signal-write paths against local stand-ins
+
+The repo's modules are copied into a temporary sandbox (its own data/ directory) and
+driven against mock_services.py, so runs never touch data/ or the network:
+    collect   Collector throughput (rows/sec) for a full-history ingest of --collect-sizes
+              total rows (~2,500 bars per symbol), the no-new-bars incremental run, and the
+              prices.xlsx export/read round trip (up to --xlsx-max-rows)
+    analyze   per-stage p50/p99 latency of one Analyzer run for each --lookbacks value:
+              price window, prompt + indicators, cache lookup/store, model call (mock, --model-latency-ms),
+              signal upsert + history, job finish; plus the same window read as an Execute
+              Command process (interpreter start-up included), which is how n8n runs it
+    signals   single-row upsert p50/p99 for signals.db tables of --signal-sizes rows, and
+              the signals.xlsx export (up to --xlsx-max-rows)
+
+Results are written as JSON (benchmarks/results/<UTC time>.json or --output) with one
+entry per metric: {"value", "unit", "better": "lower"|"higher"}. With a stored baseline
+(benchmarks/baseline.json or --baseline) every metric is compared and a change worse than
+--tolerance is reported as a regression (exit code 1 with --fail-on-regression).
+
+Usage:
+    python benchmarks/run_benchmarks.py --quick
+    python benchmarks/run_benchmarks.py --only collect --collect-sizes 10000 100000 1000000
+    python benchmarks/run_benchmarks.py --only analyze --lookbacks 20 60 120 250 --model-latency-ms 800
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --fail-on-regression --tolerance 0.25
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+PYTHON_BIN = sys.executable
+ROWS_PER_SYMBOL = 2500
+COLLECT_SIZES = [10_000, 100_000, 1_000_000]
+LOOKBACKS = [20, 60, 120, 250]
+SIGNAL_SIZES = [1_000, 10_000, 100_000]
+QUICK = {"collect_sizes": [10_000], "lookbacks": [20, 60], "signal_sizes": [1_000, 10_000], "iterations": 20}
+ANALYZE_SYMBOLS = 8
+DEFAULT_ITERATIONS = 50
+CLI_ITERATIONS = 5
+XLSX_MAX_ROWS = 100_000
+MODEL = "models/gemini-2.5-flash"
+TOLERANCE = 0.2
+MODULES = [
+    "price_store",
+    "write_queue",
+    "stooq_fetch",
+    "collect_batch",
+    "indicators",
+    "prompt_compact",
+    "analysis_cache",
+    "signal_store",
+    "signal_history",
+    "jobs",
+    "http_client",
+]
+
+
+def make_sandbox():
+    """Copy the repo's top-level modules into a temp directory with an empty data/."""
+    sandbox = Path(tempfile.mkdtemp(prefix="n8n-bench-"))
+    for path in BASE_DIR.glob("*.py"):
+        shutil.copy2(path, sandbox / path.name)
+    (sandbox / "data").mkdir()
+    return sandbox
+
+
+def reset_data(sandbox):
+    shutil.rmtree(sandbox / "data", ignore_errors=True)
+    (sandbox / "data").mkdir()
+
+
+def start_mock(sandbox, model_latency_ms=0.0, history_rows=ROWS_PER_SYMBOL):
+    """Run mock_services.py in its own process (so it does not share the GIL). Returns (process, base_url)."""
+    cmd = [
+        PYTHON_BIN,
+        str(sandbox / "mock_services.py"),
+        "serve",
+        "--port",
+        "0",
+        "--history-rows",
+        str(history_rows),
+        "--override",
+        f"gemini.latency_ms={model_latency_ms}",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if "http://" not in line:
+        proc.kill()
+        raise RuntimeError(f"Mock services did not start: {line!r}")
+    return proc, line.split("on ", 1)[1].strip()
+
+
+def load_modules(sandbox, base_url):
+    """Import the sandbox copies with the stand-in URLs in the environment."""
+    os.environ.update(
+        {
+            "N8N_BASE_URL": base_url,
+            "STOOQ_BASE_URL": base_url,
+            "YAHOO_SEARCH_URL": f"{base_url}/v1/finance/search",
+            "YAHOO_CHART_URL": f"{base_url}/v8/finance/chart",
+        }
+    )
+    sys.path.insert(0, str(sandbox))
+    return {name: importlib.import_module(name) for name in MODULES}
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms, dtype=float)
+    return float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+
+
+def metric(value, unit, better="lower"):
+    return {"value": round(float(value), 4), "unit": unit, "better": better}
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def bench_collect(mods, sandbox, sizes, xlsx_max_rows, workers):
+    price_store, collect_batch = mods["price_store"], mods["collect_batch"]
+    metrics = {}
+    for size in sizes:
+        reset_data(sandbox)
+        count = max(size // ROWS_PER_SYMBOL, 1)
+        entries = [{"symbol": f"B{i:04d}.US", "interval": "d"} for i in range(count)]
+        prefix = f"collect.{_label(size)}"
+
+        summary, seconds = timed(collect_batch.collect_batch, entries, workers=workers)
+        rows = summary["appended"]
+        print(f"[info] collect {_label(size)}: {rows} rows from {count} symbols in {seconds:.2f}s")
+        metrics[f"{prefix}.initial_rows_per_sec"] = metric(rows / seconds, "rows/s", "higher")
+        metrics[f"{prefix}.initial_fetch_seconds"] = metric(summary["fetch_seconds"], "s")
+        metrics[f"{prefix}.initial_seconds"] = metric(seconds, "s")
+
+        _, seconds = timed(collect_batch.collect_batch, entries, workers=workers)
+        metrics[f"{prefix}.incremental_noop_seconds"] = metric(seconds, "s")
+
+        _, seconds = timed(lambda: [price_store.read_symbol(e["symbol"]) for e in entries])
+        metrics[f"{prefix}.store_read_rows_per_sec"] = metric(rows / seconds, "rows/s", "higher")
+
+        if rows <= xlsx_max_rows:
+            _, seconds = timed(price_store.export_xlsx)
+            metrics[f"{prefix}.prices_xlsx_export_seconds"] = metric(seconds, "s")
+            _, seconds = timed(pd.read_excel, price_store.PRICES_XLSX_PATH, sheet_name="prices")
+            metrics[f"{prefix}.prices_xlsx_read_seconds"] = metric(seconds, "s")
+        else:
+            print(f"[info] collect {_label(size)}: prices.xlsx round trip skipped (> {xlsx_max_rows} rows)")
+    return metrics
+
+
+def _prompt(prepared):
+    window = prepared["window"]
+    indicators = ", ".join(f"{k}: {v}" for k, v in (prepared.get("indicators") or {}).items())
+    return "\n".join(
+        [
+            "Return ONLY valid JSON with symbol, as_of, signal (BUY|SELL|HOLD), confidence, summary.",
+            f"symbol: {prepared['symbol']}",
+            f"as_of: {prepared['as_of']}",
+            f"indicators: {indicators}",
+            f"data_header: {window.get('header', '')}",
+            window.get("text", ""),
+        ]
+    )
+
+
+def analyze_once(mods, session, base_url, symbol, lookback, run_id):
+    """One Analyzer run's Python-side stages in workflow order. Returns {stage: ms}."""
+    stages = {}
+
+    def stage(name, func, *args, **kwargs):
+        result, seconds = timed(func, *args, **kwargs)
+        stages[name] = seconds * 1000
+        return result
+
+    stage("window", mods["price_store"].price_window, symbol, lookback)
+    prepared = stage("prompt", mods["prompt_compact"].prepare, symbol, lookback, with_indicators=True)
+    key, fields = mods["analysis_cache"].cache_key(symbol, prepared["as_of"], lookback, MODEL, prompt_mode="auto")
+    stage("cache_get", mods["analysis_cache"].get, key, bypass=True)
+
+    def call_model():
+        resp = session.post(
+            f"{base_url}/v1beta/{MODEL}:generateContent",
+            json={"contents": [{"role": "user", "parts": [{"text": _prompt(prepared)}]}]},
+            timeout=60,
+        )
+        resp.raise_for_status()
+        return json.loads(resp.json()["candidates"][0]["content"]["parts"][0]["text"])
+
+    analysis = stage("model", call_model)
+    stage("cache_put", mods["analysis_cache"].put, key, fields, analysis)
+    row = {
+        "key": f"{symbol}|gemini",
+        "symbol": symbol,
+        "date": prepared["as_of"],
+        "type": "gemini",
+        "value": analysis.get("signal"),
+        "threshold": analysis.get("confidence"),
+        "message": analysis.get("summary"),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    row.update({k: v for k, v in (prepared.get("indicators") or {}).items() if k in mods["signal_store"].SIGNAL_COLUMNS})
+    stage("upsert", lambda: (mods["signal_store"].upsert([row]), mods["signal_history"].append([row])))
+    stage("job", mods["jobs"].finish, f"bench-{run_id}", row)
+    stages["total"] = sum(stages.values())
+    return stages
+
+
+def bench_analyze(mods, sandbox, base_url, lookbacks, iterations, workers):
+    reset_data(sandbox)
+    symbols = [f"A{i:02d}.US" for i in range(ANALYZE_SYMBOLS)]
+    mods["collect_batch"].collect_batch([{"symbol": s, "interval": "d"} for s in symbols], workers=workers)
+    session = mods["http_client"].make_session()
+    metrics = {}
+    run_id = 0
+    for lookback in lookbacks:
+        samples = {}
+        for i in range(iterations):
+            run_id += 1
+            for name, ms in analyze_once(mods, session, base_url, symbols[i % len(symbols)], lookback, run_id).items():
+                samples.setdefault(name, []).append(ms)
+        for name, values in samples.items():
+            p50, p99 = percentiles(values)
+            metrics[f"analyze.lookback{lookback}.{name}_p50_ms"] = metric(p50, "ms")
+            metrics[f"analyze.lookback{lookback}.{name}_p99_ms"] = metric(p99, "ms")
+
+        cli = [
+            timed(
+                subprocess.run,
+                [PYTHON_BIN, str(sandbox / "price_store.py"), "window", symbols[0], "--rows", str(lookback)],
+                capture_output=True,
+                check=True,
+            )[1]
+            * 1000
+            for _ in range(CLI_ITERATIONS)
+        ]
+        metrics[f"analyze.lookback{lookback}.window_cli_p50_ms"] = metric(percentiles(cli)[0], "ms")
+        p50 = metrics[f"analyze.lookback{lookback}.total_p50_ms"]["value"]
+        model = metrics[f"analyze.lookback{lookback}.model_p50_ms"]["value"]
+        print(f"[info] analyze lookback {lookback}: total p50 {p50:.1f}ms (model {model:.1f}ms)")
+    return metrics
+
+
+def bench_signals(mods, sandbox, sizes, iterations, xlsx_max_rows):
+    signal_store = mods["signal_store"]
+    metrics = {}
+    for size in sizes:
+        reset_data(sandbox)
+        now = datetime.now(timezone.utc).isoformat()
+        seed = [
+            {"key": f"S{i:06d}.US|gemini", "symbol": f"S{i:06d}.US", "date": "2026-01-02", "type": "gemini",
+             "value": "HOLD", "threshold": 0.5, "message": "seed", "created_at": now}
+            for i in range(size)
+        ]
+        signal_store.upsert(seed)
+        samples = []
+        for i in range(iterations):
+            row = dict(seed[(i * 7919) % size], value="BUY", created_at=datetime.now(timezone.utc).isoformat())
+            samples.append(timed(signal_store.upsert, [row])[1] * 1000)
+        p50, p99 = percentiles(samples)
+        prefix = f"signals.{_label(size)}"
+        metrics[f"{prefix}.upsert_p50_ms"] = metric(p50, "ms")
+        metrics[f"{prefix}.upsert_p99_ms"] = metric(p99, "ms")
+        if size <= xlsx_max_rows:
+            _, seconds = timed(signal_store.export_xlsx)
+            metrics[f"{prefix}.xlsx_export_seconds"] = metric(seconds, "s")
+        print(f"[info] signals {_label(size)}: upsert p50 {p50:.2f}ms p99 {p99:.2f}ms")
+    return metrics
+
+
+def _label(size):
+    if size >= 1_000_000 and size % 1_000_000 == 0:
+        return f"{size // 1_000_000}m"
+    if size >= 1_000 and size % 1_000 == 0:
+        return f"{size // 1_000}k"
+    return str(size)
+
+
+def compare(metrics, baseline, tolerance=TOLERANCE):
+    """Per metric present in both runs: change vs baseline and whether it regressed beyond tolerance."""
+    report = {}
+    for name, current in sorted(metrics.items()):
+        previous = (baseline.get("metrics") or {}).get(name)
+        if not previous or not previous.get("value"):
+            continue
+        change = current["value"] / previous["value"] - 1
+        worse = change > tolerance if current["better"] == "lower" else change < -tolerance
+        report[name] = {
+            "baseline": previous["value"],
+            "current": current["value"],
+            "change": round(change, 4),
+            "regression": worse,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the collect, analyze and signal-write paths against local stand-ins",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("--only", nargs="*", choices=["collect", "analyze", "signals"], help="Benchmarks to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="Small sizes and fewer iterations (smoke run)")
+    parser.add_argument("--collect-sizes", nargs="*", type=int, default=COLLECT_SIZES, help="Total price rows per collect run")
+    parser.add_argument("--lookbacks", nargs="*", type=int, default=LOOKBACKS)
+    parser.add_argument("--signal-sizes", nargs="*", type=int, default=SIGNAL_SIZES, help="signals.db rows before timing upserts")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Samples per analyze lookback / upsert size")
+    parser.add_argument("--model-latency-ms", type=float, default=0.0, help="Mock Gemini latency (0 isolates local cost)")
+    parser.add_argument("--workers", type=int, default=8, help="Collector download workers")
+    parser.add_argument("--xlsx-max-rows", type=int, default=XLSX_MAX_ROWS, help="Skip xlsx round trips above this size")
+    parser.add_argument("--output", default="", help="Results JSON path (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Also store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed relative slowdown (default 0.2)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when a metric regressed")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.collect_sizes = QUICK["collect_sizes"]
+        args.lookbacks = QUICK["lookbacks"]
+        args.signal_sizes = QUICK["signal_sizes"]
+        args.iterations = QUICK["iterations"]
+    only = args.only or ["collect", "analyze", "signals"]
+
+    sandbox = make_sandbox()
+    mock, base_url = start_mock(sandbox, model_latency_ms=args.model_latency_ms)
+    print(f"[info] Sandbox {sandbox}, stand-ins at {base_url}")
+    metrics = {}
+    started = time.perf_counter()
+    try:
+        mods = load_modules(sandbox, base_url)
+        if "collect" in only:
+            metrics.update(bench_collect(mods, sandbox, args.collect_sizes, args.xlsx_max_rows, args.workers))
+        if "analyze" in only:
+            metrics.update(bench_analyze(mods, sandbox, base_url, args.lookbacks, args.iterations, args.workers))
+        if "signals" in only:
+            metrics.update(bench_signals(mods, sandbox, args.signal_sizes, args.iterations, args.xlsx_max_rows))
+    finally:
+        mock.terminate()
+        mock.wait()
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "benchmarks": only,
+            "model_latency_ms": args.model_latency_ms,
+            "iterations": args.iterations,
+            "wall_seconds": round(time.perf_counter() - started, 2),
+        },
+        "metrics": metrics,
+    }
+    baseline_path = Path(args.baseline)
+    regressions = []
+    if baseline_path.exists():
+        results["comparison"] = compare(metrics, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+        regressions = [name for name, entry in results["comparison"].items() if entry["regression"]]
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"[ok] Results: {output}")
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"[ok] Baseline: {baseline_path}")
+
+    if "comparison" in results:
+        print(f"[info] Compared {len(results['comparison'])} metrics with {baseline_path}")
+        for name in regressions:
+            entry = results["comparison"][name]
+            print(f"[warn] {name}: {entry['baseline']} -> {entry['current']} ({entry['change']:+.1%})")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Batch Collector - fetch every active symbol in data/config.xlsx with a bounded pool
+
+Downloads run concurrently (one pooled HTTP session, --workers at a time). Once every
+fetch has finished the results are written to the price store in one pass and
+state.xlsx is updated once for the whole batch instead of once per symbol.
+
+Usage:
+    python collect_batch.py
+    python collect_batch.py --workers 16
+    python collect_batch.py --symbols AAPL.US MSFT.US 005930.KS
+    python collect_batch.py --stagger-ms 250
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import unquote
+
+import pandas as pd
+
+import http_client
+import price_store
+import stooq_fetch
+import write_queue
+
+CONFIG_XLSX_PATH = price_store.BASE_DIR / "data" / "config.xlsx"
+DEFAULT_WORKERS = 8
+
+
+def is_active(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "1", "y", "yes")
+
+
+def read_config(config_path=CONFIG_XLSX_PATH):
+    """Return [{symbol, interval}] for every active row in config.xlsx."""
+    config_path = Path(config_path)
+    if not config_path.exists():
+        return []
+    config = pd.read_excel(config_path, sheet_name="config", dtype=str).fillna("")
+    entries = []
+    seen = set()
+    for row in config.to_dict("records"):
+        symbol = price_store.normalize_symbol(row.get("symbol"))
+        if not symbol or symbol in seen or not is_active(row.get("active", "")):
+            continue
+        seen.add(symbol)
+        entries.append({"symbol": symbol, "interval": (row.get("interval") or "d").strip() or "d"})
+    return entries
+
+
+def make_session(workers):
+    return http_client.make_session(max(workers, 1))
+
+
+def _fetch_at(start_at, symbol, last_date, interval, session):
+    delay = start_at - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    return stooq_fetch.fetch_window(symbol, last_date, interval, session)
+
+
+def collect_batch(entries, workers=DEFAULT_WORKERS, state_path=price_store.STATE_XLSX_PATH, export_xlsx=False, stagger=0.0):
+    """
+    Fetch all entries concurrently, then submit one write (price rows, state, index and
+    optional prices.xlsx export) to the single writer.
+    `stagger` spaces request starts by that many seconds so the source is not hit in a burst.
+    Returns a summary dict with per-symbol reports.
+    """
+    started = time.perf_counter()
+    first_start = time.monotonic()
+    state = stooq_fetch.read_state(state_path)
+    session = make_session(workers)
+    fetched = {}
+    reports = []
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {
+            pool.submit(
+                _fetch_at,
+                first_start + i * max(stagger, 0.0),
+                entry["symbol"],
+                state.get(entry["symbol"], ""),
+                entry["interval"],
+                session,
+            ): entry["symbol"]
+            for i, entry in enumerate(entries)
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                frame, report = future.result()
+            except Exception as exc:  # noqa: BLE001
+                reports.append({"symbol": symbol, "error": str(exc)})
+                continue
+            fetched[symbol] = frame
+            reports.append(report)
+    fetch_seconds = time.perf_counter() - started
+
+    new_state = {}
+    writes = []
+    by_symbol = {r["symbol"]: r for r in reports}
+    for symbol, frame in fetched.items():
+        full = by_symbol[symbol]["mode"] == "full"
+        after = state.get(symbol, "")
+        appended = price_store.pending_rows(symbol, frame, after=after, full=full)
+        by_symbol[symbol]["appended"] = len(appended)
+        if len(appended) or (full and not frame.empty):
+            rows = frame if full else appended
+            # The rows only land once the writer applies them; state is what the store will hold
+            new_state[symbol] = max(price_store.last_date(symbol), rows["date"].max())
+            writes.append(write_queue.rows_request(symbol, rows, full=full, after=after))
+    if new_state:
+        if state_path:
+            writes.append(("state", {"path": str(state_path), "last_dates": new_state}))
+        if export_xlsx:
+            writes.append(("prices-xlsx", None))
+    write = write_queue.submit(writes)
+
+    ok = [r for r in reports if "error" not in r]
+    return {
+        "symbols": len(entries),
+        "ok": len(ok),
+        "failed": len(reports) - len(ok),
+        "appended": sum(r.get("appended", 0) for r in ok),
+        "bytes_fetched": sum(r.get("bytes_fetched", 0) for r in ok),
+        "bytes_saved": sum(r.get("bytes_saved", 0) for r in ok),
+        "write": write,
+        "fetch_seconds": round(fetch_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "reports": sorted(reports, key=lambda r: r["symbol"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Collect prices for every active symbol in data/config.xlsx",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("--symbols", nargs="*", help="Collect these symbols instead of config.xlsx")
+    parser.add_argument("--interval", default="d", help="Interval for --symbols (default: d)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Concurrent downloads (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument("--config", default=str(CONFIG_XLSX_PATH), help="Path to config.xlsx")
+    parser.add_argument("--export-xlsx", action="store_true", help="Also refresh data/prices.xlsx")
+    parser.add_argument("--stagger-ms", type=int, default=0, help="Minimum gap between request starts (default: 0)")
+    args = parser.parse_args()
+
+    if args.symbols:
+        entries = [
+            {"symbol": price_store.normalize_symbol(unquote(s)), "interval": args.interval}
+            for s in args.symbols
+        ]
+    else:
+        entries = read_config(unquote(args.config))
+    if not entries:
+        print(json.dumps({"symbols": 0, "error": "No active symbols in config.xlsx"}))
+        sys.exit(1)
+
+    summary = collect_batch(entries, workers=args.workers, export_xlsx=args.export_xlsx, stagger=args.stagger_ms / 1000)
+    print(json.dumps(summary))
+    sys.exit(0 if not summary["failed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
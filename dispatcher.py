@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Dispatcher - front door that spreads analysis requests over the Analyzer shards
+
+`create_n8n_workflows.py --shards N` deploys N Analyzer workflows (webhook/analyze-<i>),
+each writing its own data/shards/<i>/signals.db. The dispatcher answers the webhooks
+analyze.py calls (POST /webhook/analyze, GET /webhook/analyze-status) and sends each
+symbol to the shard picked by a consistent-hash ring (VNODES points per shard): a symbol
+always lands on the same shard, and changing N moves only about 1/N of the symbols.
+Symbols are normalized through symbol_cache.py before hashing, so AAPL, aapl and AAPL.US
+(or a company name and its ticker) share a shard.
+
+Shards can run on several n8n instances: pass --n8n-url once per instance (or
+DISPATCHER_N8N_URLS, comma-separated); shard i is served by URL i mod count. Job ids
+come back as <shard>.<job id>, so status polls reach the shard (and instance) that runs
+the job. Ids without a shard prefix are polled on the first URL.
+
+Point analyze.py at it with N8N_BASE_URL=http://127.0.0.1:5680.
+
+Usage:
+    python dispatcher.py serve --shards 4
+    python dispatcher.py serve --shards 4 --n8n-url http://n8n-a:5678 --n8n-url http://n8n-b:5678
+    python dispatcher.py route AAPL.US MSFT.US 005930.KS --shards 4
+    python dispatcher.py route --file watchlist.txt --shards 4 --resize 5
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import sys
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+
+import http_client
+import symbol_cache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.getenv("DISPATCHER_PORT", "5680"))
+DEFAULT_SHARDS = int(os.getenv("ANALYZER_SHARDS", "0"))
+N8N_URLS = [
+    url.strip().rstrip("/")
+    for url in os.getenv("DISPATCHER_N8N_URLS", os.getenv("N8N_BASE_URL", "http://localhost:5678")).split(",")
+    if url.strip()
+]
+# Ring points per shard; more points even out the share of symbols each shard gets
+VNODES = 160
+SUBMIT_TIMEOUT = 30
+# Slack on top of the long-poll wait the client asked for
+STATUS_TIMEOUT_SLACK = 15
+
+
+def _point(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+@lru_cache(maxsize=16)
+def build_ring(shards, vnodes=VNODES):
+    """(sorted ring points, owning shard per point) for `shards` shards."""
+    if shards < 1:
+        raise ValueError("At least one shard is required.")
+    ring = sorted((_point(f"shard-{shard}#{v}"), shard) for shard in range(shards) for v in range(vnodes))
+    return [point for point, _ in ring], [shard for _, shard in ring]
+
+
+def routing_key(request, session=None):
+    """The resolved symbol an analyze request is routed by ("" when it names none)."""
+    request = request or {}
+    value = str(request.get("symbol") or request.get("query") or request.get("company") or "").strip()
+    if not value:
+        return ""
+    market = str(request.get("market") or "US")
+    return symbol_cache.resolve(value, default_market_suffix=market, session=session)["symbol"]
+
+
+def shard_for(key, shards, vnodes=VNODES):
+    """Shard owning `key`: the first ring point clockwise from the key's hash."""
+    points, owners = build_ring(shards, vnodes)
+    return owners[bisect.bisect(points, _point(key)) % len(points)]
+
+
+def shard_url(shard, urls):
+    return urls[shard % len(urls)]
+
+
+def split_job_id(job_id):
+    """(shard, n8n job id) for dispatcher job ids ("2.1234"), (None, job_id) for plain ones."""
+    shard, dot, inner = str(job_id).partition(".")
+    if dot and shard.isdigit():
+        return int(shard), inner
+    return None, str(job_id)
+
+
+class DispatchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AnalyzerDispatcher/1.0"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, shard, error=False):
+        with self.server.lock:
+            label = "unsharded" if shard is None else str(shard)
+            entry = self.server.stats.setdefault(label, {"requests": 0, "errors": 0})
+            entry["requests"] += 1
+            entry["errors"] += int(error)
+
+    def _forward(self, shard, method, url, **kwargs):
+        """(status, JSON payload) from the shard; upstream failures become 502."""
+        try:
+            response = self.server.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as exc:
+            self._count(shard, error=True)
+            return 502, {"status": "error", "error": f"Shard {shard} unreachable: {exc}"}
+        self._count(shard, error=response.status_code >= 400)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {"status": "error", "error": response.text[:500]}
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/webhook/analyze":
+            return self._send(404, {"message": f"Webhook {url.path} is not registered"})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, {"status": "error", "error": "Request body must be JSON"})
+        shard = shard_for(routing_key(request, self.server.session), self.server.shards)
+        target = f"{shard_url(shard, self.server.urls)}/webhook/analyze-{shard}"
+        status, payload = self._forward(shard, "POST", target, json=request, timeout=SUBMIT_TIMEOUT)
+        if isinstance(payload, dict) and payload.get("job_id"):
+            job_id = f"{shard}.{payload['job_id']}"
+            payload.update(job_id=job_id, status_url=f"/webhook/analyze-status?job_id={job_id}", shard=shard)
+        self._send(status, payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/health":
+            with self.server.lock:
+                stats = json.loads(json.dumps(self.server.stats))
+            return self._send(200, {"shards": self.server.shards, "urls": self.server.urls, "stats": stats})
+        if url.path != "/webhook/analyze-status":
+            return self._send(404, {"message": f"Webhook {url.path} is not registered"})
+        job_id = (query.get("job_id") or [""])[0]
+        wait = (query.get("wait") or ["0"])[0]
+        shard, inner = split_job_id(job_id)
+        base = shard_url(shard, self.server.urls) if shard is not None else self.server.urls[0]
+        try:
+            timeout = float(wait or 0) + STATUS_TIMEOUT_SLACK
+        except ValueError:
+            timeout = STATUS_TIMEOUT_SLACK
+        status, payload = self._forward(
+            shard, "GET", f"{base}/webhook/analyze-status", params={"job_id": inner, "wait": wait}, timeout=timeout
+        )
+        if isinstance(payload, dict) and "job_id" in payload:
+            payload["job_id"] = job_id
+        self._send(status, payload)
+
+
+def make_server(shards, urls=None, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    """Build (but do not start) the dispatcher; port 0 picks a free port."""
+    build_ring(shards)
+    server = ThreadingHTTPServer((host, port), DispatchHandler)
+    server.daemon_threads = True
+    server.shards = shards
+    server.urls = [url.rstrip("/") for url in (urls or N8N_URLS)]
+    # Every shard's connections stay open between requests (status polls included)
+    server.session = http_client.make_session(max(http_client.POOL_MAXSIZE, shards))
+    server.lock = threading.Lock()
+    server.stats = {}
+    server.verbose = verbose
+    return server
+
+
+def route(keys, shards, resize=None):
+    """{assignments, counts[, moved]} for `keys` on `shards` (and how many move at `resize`)."""
+    keys = [routing_key({"symbol": key}) for key in keys]
+    assignments = {key: shard_for(key, shards) for key in keys}
+    counts = {shard: 0 for shard in range(shards)}
+    for shard in assignments.values():
+        counts[shard] += 1
+    out = {"shards": shards, "assignments": assignments, "counts": counts}
+    if resize:
+        moved = [key for key in keys if shard_for(key, resize) != assignments[key]]
+        out.update(resize=resize, moved=len(moved), moved_share=round(len(moved) / len(keys), 3) if keys else 0.0)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Spread analyze requests over the Analyzer shards by consistent hashing",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Run the dispatcher in the foreground")
+    serve_parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="Analyzer shards deployed (ANALYZER_SHARDS)")
+    serve_parser.add_argument("--n8n-url", action="append", default=[], help="n8n base URL (repeat for several instances)")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--verbose", action="store_true", help="Log every request")
+
+    route_parser = sub.add_parser("route", help="Print the shard of each symbol")
+    route_parser.add_argument("symbols", nargs="*")
+    route_parser.add_argument("--file", default="", help="Read symbols from a file (one per line, '#' comments allowed)")
+    route_parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS)
+    route_parser.add_argument("--resize", type=int, default=0, help="Also count the symbols that move at this shard count")
+
+    args = parser.parse_args()
+    if args.shards < 1:
+        print("[err] --shards (or ANALYZER_SHARDS) must be at least 1")
+        sys.exit(2)
+
+    if args.command == "serve":
+        urls = [unquote(url) for url in args.n8n_url] or N8N_URLS
+        server = make_server(args.shards, urls, args.host, args.port, args.verbose)
+        print(f"[ok] Dispatching to {args.shards} shards on {', '.join(server.urls)}")
+        print(f"[info] Set N8N_BASE_URL=http://{args.host}:{server.server_port} for analyze.py")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    elif args.command == "route":
+        symbols = [unquote(symbol) for symbol in args.symbols]
+        if args.file:
+            with open(unquote(args.file), encoding="utf-8") as fh:
+                symbols += [line.split("#", 1)[0].strip() for line in fh]
+        print(json.dumps(route([s for s in symbols if s], args.shards, args.resize or None), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
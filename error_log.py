@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Error Log - structured, rotated error log for the Error Handler workflow
+
+Every failed execution is appended to logs/errors.jsonl as one JSON object:
+    ts, workflow, workflow_id, execution_id, mode, node, service (stooq|yahoo|gemini|store|n8n),
+    error_class (rate_limit|timeout|connection|http_5xx|http_4xx|parse|command|other),
+    http_code, symbol, duration_ms, message
+
+The live file is rotated when it passes ERROR_LOG_MAX_BYTES (10 MB) or its first record
+is older than ERROR_LOG_ROTATE_SECONDS (1 day); rotated files are gzip-compressed to
+logs/errors-<time>.jsonl.gz and only the newest ERROR_LOG_KEEP (30) are kept.
+Queries read the live file and the archives. Throttling and upstream failures of the native
+Gemini node are also fed to rate_limit.py so its bucket and circuit breaker see them.
+
+Usage:
+    python error_log.py log --event '{"workflow": {...}, "execution": {...}}'
+    python error_log.py summary --since 24h --by service error_class
+    python error_log.py summary --since 7d --by node symbol
+    python error_log.py timeline --since 24h --bucket 1h --service gemini
+    python error_log.py tail -n 20
+    python error_log.py rotate
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import unquote
+
+import pandas as pd
+
+import jobs
+import rate_limit
+
+BASE_DIR = Path(__file__).resolve().parent
+LOG_DIR = BASE_DIR / "logs"
+LOG_NAME = "errors.jsonl"
+
+MAX_BYTES = int(os.getenv("ERROR_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+ROTATE_SECONDS = int(os.getenv("ERROR_LOG_ROTATE_SECONDS", str(24 * 3600)))
+KEEP = int(os.getenv("ERROR_LOG_KEEP", "30"))
+MESSAGE_CHARS = 1000
+LOG_COLUMNS = [
+    "ts",
+    "workflow",
+    "workflow_id",
+    "execution_id",
+    "mode",
+    "node",
+    "service",
+    "error_class",
+    "http_code",
+    "symbol",
+    "duration_ms",
+    "message",
+]
+
+# Checked in order; the first pattern found in the message (or HTTP code) wins
+ERROR_CLASSES = [
+    ("rate_limit", r"\b429\b|rate.?limit|too many requests|quota|resource.?exhausted"),
+    ("timeout", r"time[d ]?out|ETIMEDOUT|ESOCKETTIMEDOUT|deadline exceeded"),
+    ("connection", r"ECONNREFUSED|ECONNRESET|ENOTFOUND|EAI_AGAIN|socket hang up|could not reach|connection (error|refused|reset)"),
+    ("http_5xx", r"\b5\d\d\b|service unavailable|bad gateway|internal server error"),
+    ("http_4xx", r"\b4\d\d\b|not found|forbidden|unauthorized|bad request"),
+    ("parse", r"JSON|unexpected token|parse|decode"),
+    ("command", r"command failed|exit code|traceback|\bpython\b"),
+]
+# Node name patterns -> upstream service
+SERVICES = [
+    ("stooq", r"stooq|collect"),
+    ("yahoo", r"on-demand|resolve symbol|yahoo"),
+    ("gemini", r"message a model|gemini"),
+    ("store", r"price window|prompt data|upsert|cache|job"),
+]
+# Services called by native n8n nodes: their failures only reach rate_limit.py through here
+# (Python callers such as stooq_fetch.py record their own outcomes)
+RATE_LIMITED_SERVICES = {"gemini": os.getenv("GEMINI_RATE_HOST", "generativelanguage.googleapis.com")}
+UPSTREAM_ERRORS = ("rate_limit", "http_5xx", "timeout", "connection")
+SYMBOL_PATTERN = re.compile(r"\b[0-9A-Z]{1,10}\.(?:US|KS|KQ|JP|HK|UK|DE|L|T)\b")
+
+
+def log_path(log_dir=LOG_DIR):
+    return Path(log_dir) / LOG_NAME
+
+
+def classify(message, http_code=None):
+    text = f"{http_code or ''} {message or ''}"
+    for name, pattern in ERROR_CLASSES:
+        if re.search(pattern, text, flags=re.IGNORECASE):
+            return name
+    return "other"
+
+
+def service_for(node, message=""):
+    for name, pattern in SERVICES:
+        if re.search(pattern, node or "", flags=re.IGNORECASE):
+            return name
+    for name in ("stooq", "yahoo", "gemini"):
+        if name in (message or "").lower():
+            return name
+    return "n8n"
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return None
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def build_record(event, now=None):
+    """
+    Turn an Error Trigger payload into a log record. Both payload shapes are accepted:
+    {execution: {error: {...}, lastNodeExecuted}} and the older {error: {node, message}}.
+    """
+    event = event or {}
+    execution = event.get("execution") or {}
+    workflow = event.get("workflow") or {}
+    error = execution.get("error") or event.get("error") or {}
+    node = (error.get("node") or {}).get("name") if isinstance(error.get("node"), dict) else error.get("node")
+    node = node or execution.get("lastNodeExecuted") or ""
+    message = " ".join(str(error.get(k) or "") for k in ("message", "description")).strip()
+    cause = error.get("cause") if isinstance(error.get("cause"), dict) else {}
+    http_code = error.get("httpCode") or cause.get("status")
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    started = _parse_time(execution.get("startedAt"))
+
+    execution_id = str(execution.get("id") or "")
+    symbol = ""
+    if execution_id:
+        try:
+            job = jobs.read_job(execution_id)
+        except ValueError:
+            job = None
+        symbol = str(((job or {}).get("request") or {}).get("symbol") or "").upper()
+    if not symbol:
+        found = SYMBOL_PATTERN.search(message)
+        symbol = found.group(0) if found else ""
+
+    return {
+        "ts": now.isoformat(),
+        "workflow": workflow.get("name") or "",
+        "workflow_id": str(workflow.get("id") or ""),
+        "execution_id": execution_id,
+        "mode": execution.get("mode") or "",
+        "node": node,
+        "service": service_for(node, message),
+        "error_class": classify(message, http_code),
+        "http_code": int(http_code) if str(http_code or "").isdigit() else None,
+        "symbol": symbol,
+        "duration_ms": round((now - started).total_seconds() * 1000) if started is not None else None,
+        "message": message[:MESSAGE_CHARS],
+    }
+
+
+def _first_ts(path):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return _parse_time(json.loads(fh.readline()).get("ts"))
+    except (OSError, ValueError):
+        return None
+
+
+def needs_rotation(path, now=None, max_bytes=MAX_BYTES, rotate_seconds=ROTATE_SECONDS):
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return False
+    if size == 0:
+        return False
+    if max_bytes and size >= max_bytes:
+        return True
+    first = _first_ts(path)
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    return bool(rotate_seconds and first is not None and (now - first).total_seconds() >= rotate_seconds)
+
+
+def archives(log_dir=LOG_DIR):
+    """Rotated logs, oldest first."""
+    return sorted(Path(log_dir).glob("errors-*.jsonl.gz"))
+
+
+def rotate(log_dir=LOG_DIR, keep=KEEP):
+    """Move the live log aside, gzip it and prune old archives. Returns the archive path (or None)."""
+    path = log_path(log_dir)
+    if not path.exists() or path.stat().st_size == 0:
+        return None
+    stamp = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S.%f}-{os.getpid()}"
+    rotated = path.with_name(f"errors-{stamp}.jsonl")
+    try:
+        # Only one concurrent rotation wins the rename; the others find nothing to move
+        os.replace(path, rotated)
+    except FileNotFoundError:
+        return None
+    archive = rotated.with_name(rotated.name + ".gz")
+    with open(rotated, "rb") as src, gzip.open(archive, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    rotated.unlink()
+    for old in archives(log_dir)[: -keep or None] if keep else []:
+        old.unlink()
+    return archive
+
+
+def write(record, log_dir=LOG_DIR, max_bytes=MAX_BYTES, rotate_seconds=ROTATE_SECONDS, keep=KEEP):
+    """Append one record (rotating first when due). Returns the log path."""
+    path = log_path(log_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if needs_rotation(path, record.get("ts"), max_bytes, rotate_seconds):
+        rotate(log_dir, keep)
+    # One write per line so concurrent error runs never interleave
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return path
+
+
+def _read_lines(lines):
+    records = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def read_records(since=None, log_dir=LOG_DIR):
+    """All records (archives and live file) as a DataFrame, optionally only those after `since`."""
+    since = _parse_time(since)
+    records = []
+    for archive in archives(log_dir):
+        # Archive names carry their rotation time, so older ones can be skipped
+        match = re.match(r"errors-(\d{8}T\d{6})", archive.name)
+        if since is not None and match and _parse_time(match.group(1)) < since:
+            continue
+        with gzip.open(archive, "rt", encoding="utf-8") as fh:
+            records.extend(_read_lines(fh))
+    path = log_path(log_dir)
+    if path.exists():
+        with open(path, encoding="utf-8") as fh:
+            records.extend(_read_lines(fh))
+    frame = pd.DataFrame.from_records(records, columns=LOG_COLUMNS)
+    if frame.empty:
+        return frame
+    frame["ts"] = pd.to_datetime(frame["ts"], utc=True, errors="coerce", format="ISO8601")
+    if since is not None:
+        frame = frame[frame["ts"] >= since]
+    return frame.sort_values("ts").reset_index(drop=True)
+
+
+def parse_since(value, now=None):
+    """'24h', '7d', '30m' or an ISO date/time -> UTC timestamp (None for empty)."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    match = re.fullmatch(r"(\d+)([mhd])", value)
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        return now - timedelta(**{{"m": "minutes", "h": "hours", "d": "days"}[unit]: amount})
+    return _parse_time(value)
+
+
+def summary(frame, by=("service", "error_class")):
+    """Error counts, share, errors per hour and first/last seen per group."""
+    if frame.empty:
+        return []
+    by = list(by)
+    hours = max((frame["ts"].max() - frame["ts"].min()).total_seconds() / 3600, 1 / 60)
+    grouped = frame.fillna({col: "" for col in by}).groupby(by)
+    out = grouped.agg(errors=("ts", "size"), first=("ts", "min"), last=("ts", "max"), p50_duration_ms=("duration_ms", "median"))
+    out["share"] = (out["errors"] / len(frame)).round(3)
+    out["per_hour"] = (out["errors"] / hours).round(2)
+    out = out.sort_values("errors", ascending=False).reset_index()
+    out["first"] = out["first"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    out["last"] = out["last"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return json.loads(out.to_json(orient="records", force_ascii=False))
+
+
+def timeline(frame, bucket="1h", service="", error_class=""):
+    """Errors per time bucket and error class (to see when throttling starts)."""
+    if service:
+        frame = frame[frame["service"] == service]
+    if error_class:
+        frame = frame[frame["error_class"] == error_class]
+    if frame.empty:
+        return []
+    freq = bucket.replace("m", "min")
+    counts = frame.groupby([frame["ts"].dt.floor(freq), "error_class"]).size().unstack(fill_value=0)
+    counts.index = counts.index.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return [{"bucket": idx, **{k: int(v) for k, v in row.items()}} for idx, row in counts.iterrows()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Structured, rotated error log for the Error Handler workflow",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    log_parser = sub.add_parser("log", help="Append one Error Trigger payload")
+    log_parser.add_argument("--event", required=True, help="Error Trigger JSON (may be URL-encoded)")
+
+    summary_parser = sub.add_parser("summary", help="Error counts and rates grouped by fields")
+    summary_parser.add_argument("--since", default="24h", help="e.g. 30m, 24h, 7d or an ISO time ('' for all)")
+    summary_parser.add_argument("--by", nargs="+", default=["service", "error_class"], choices=LOG_COLUMNS[1:-1])
+
+    timeline_parser = sub.add_parser("timeline", help="Errors per time bucket and class")
+    timeline_parser.add_argument("--since", default="24h")
+    timeline_parser.add_argument("--bucket", default="1h", help="e.g. 5m, 1h, 1d")
+    timeline_parser.add_argument("--service", default="")
+    timeline_parser.add_argument("--error-class", default="")
+
+    tail_parser = sub.add_parser("tail", help="Print the newest records")
+    tail_parser.add_argument("-n", type=int, default=20)
+
+    sub.add_parser("rotate", help="Rotate and compress the live log now")
+
+    args = parser.parse_args()
+
+    if args.command == "log":
+        try:
+            event = json.loads(unquote(args.event))
+        except ValueError:
+            event = {"error": {"message": unquote(args.event)}}
+        record = build_record(event)
+        write(record)
+        host = RATE_LIMITED_SERVICES.get(record["service"])
+        if host and record["error_class"] in UPSTREAM_ERRORS:
+            status = record["http_code"] or (429 if record["error_class"] == "rate_limit" else None)
+            rate_limit.record(host, status=status, error=status is None)
+        print(json.dumps(record, ensure_ascii=False))
+    elif args.command == "summary":
+        frame = read_records(parse_since(args.since))
+        print(json.dumps({"errors": len(frame), "groups": summary(frame, args.by)}, indent=2, ensure_ascii=False))
+    elif args.command == "timeline":
+        frame = read_records(parse_since(args.since))
+        print(json.dumps(timeline(frame, args.bucket, args.service, args.error_class), indent=2))
+    elif args.command == "tail":
+        frame = read_records()
+        frame = frame.tail(args.n).assign(ts=lambda f: f["ts"].dt.strftime("%Y-%m-%dT%H:%M:%SZ"))
+        for rec in frame.to_dict("records"):
+            print(json.dumps(rec, ensure_ascii=False))
+    elif args.command == "rotate":
+        archive = rotate()
+        print(f"[ok] Rotated to {archive}" if archive else "[info] Nothing to rotate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+HTTP Client - shared keep-alive sessions for every outbound call
+
+One pooled session per process, so repeated lookups, webhook calls and REST calls reuse
+their TCP/TLS connection instead of paying a handshake each time. Responses are requested
+gzip/deflate-encoded and decoded transparently.
+
+Pool sizes come from HTTP_POOL_CONNECTIONS (hosts kept, default 4) and HTTP_POOL_MAXSIZE
+(connections per host, default 10); tools with their own worker count pass it to
+make_session(). HTTP2=1 switches to an httpx client with HTTP/2 (needs `pip install
+httpx[http2]`); it falls back to requests with a warning when httpx/h2 is not installed.
+Either way callers get requests-style responses and requests exceptions.
+
+Usage:
+    python http_client.py https://stooq.com/q/d/l/?s=aapl.us&i=d
+    python http_client.py http://localhost:8799/_mock/stats --repeat 20
+    HTTP2=1 python http_client.py https://query1.finance.yahoo.com/v1/finance/search?q=apple
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import unquote
+
+import requests
+
+try:
+    import httpx
+except ImportError:  # optional: only needed for HTTP2=1
+    httpx = None
+
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+HTTP2 = os.getenv("HTTP2", "0").strip().lower() in ("1", "true", "yes", "on")
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (n8n-local-excel)",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+class _Http2Response:
+    """The part of requests.Response the callers use, over an httpx response."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.content = response.content
+        self.url = str(response.url)
+        self.http_version = response.http_version
+
+    @property
+    def text(self):
+        return self._response.text
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}", response=self
+            )
+
+
+class _Http2Session:
+    """requests.Session-like wrapper around httpx.Client(http2=True); errors map to requests exceptions."""
+
+    def __init__(self, client):
+        self.client = client
+        self.headers = client.headers
+
+    def request(self, method, url, params=None, data=None, json=None, headers=None, timeout=None, **_):
+        try:
+            form = data if isinstance(data, dict) else None
+            response = self.client.request(
+                method, url, params=params, content=None if form else data, data=form,
+                json=json, headers=headers, timeout=timeout,
+            )
+        except httpx.TimeoutException as exc:
+            raise requests.exceptions.Timeout(str(exc)) from exc
+        except httpx.TransportError as exc:
+            raise requests.exceptions.ConnectionError(str(exc)) from exc
+        return _Http2Response(response)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+
+def _http2_session(pool_size):
+    try:
+        if httpx is None:
+            raise ImportError("httpx")
+        # httpx raises ImportError here when the h2 package is missing
+        client = httpx.Client(
+            http2=True,
+            headers=DEFAULT_HEADERS,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            follow_redirects=True,
+        )
+    except ImportError:
+        print("[warn] HTTP2=1 needs `pip install httpx[http2]`; using HTTP/1.1 keep-alive", file=sys.stderr)
+        return None
+    return _Http2Session(client)
+
+
+def make_session(pool_size=POOL_MAXSIZE, http2=HTTP2):
+    """A keep-alive session holding up to `pool_size` connections per host."""
+    pool_size = max(int(pool_size), 1)
+    if http2:
+        session = _http2_session(pool_size)
+        if session is not None:
+            return session
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max(POOL_CONNECTIONS, 1), pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """The process-wide session (created on first use)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = make_session()
+        return _shared
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time repeated GETs over the shared keep-alive session",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("url", help="URL to fetch")
+    parser.add_argument("--repeat", type=int, default=5, help="Requests to send (default: 5)")
+    args = parser.parse_args()
+
+    url = unquote(args.url)
+    session = get_session()
+    times = []
+    for _ in range(max(args.repeat, 1)):
+        started = time.perf_counter()
+        try:
+            response = session.get(url, timeout=30)
+        except requests.exceptions.RequestException as exc:
+            print(f"[err] {exc}")
+            sys.exit(1)
+        times.append((time.perf_counter() - started) * 1000)
+    print(json.dumps({
+        "url": url,
+        "status": response.status_code,
+        "http_version": getattr(response, "http_version", "HTTP/1.1"),
+        "content_encoding": response.headers.get("Content-Encoding", ""),
+        "bytes": len(response.content),
+        "first_ms": round(times[0], 1),
+        "rest_mean_ms": round(sum(times[1:]) / len(times[1:]), 1) if len(times) > 1 else None,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Indicators - vectorized technical indicators for the Analyzer prompt and signal rows
+
+Computes SMA20/SMA60, EMA12/EMA26, RSI14, MACD(12,26,9), ATR14 and a trend label from
+the price store, so Gemini only interprets exact values instead of computing them
+from CSV pasted into the prompt.
+
+Usage:
+    python indicators.py AAPL.US
+    python indicators.py 005930.KS --lookback 120
+"""
+
+import argparse
+import json
+import math
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+import price_store
+
+# Rows read beyond the lookback so SMA60/EMA26/RSI14 are warmed up
+WARMUP_ROWS = 120
+
+
+def sma(close, window):
+    return close.rolling(window, min_periods=window).mean()
+
+
+def ema(close, span):
+    return close.ewm(span=span, adjust=False, min_periods=span).mean()
+
+
+def rsi(close, window=14):
+    """Wilder's RSI"""
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / window, adjust=False, min_periods=window).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / window, adjust=False, min_periods=window).mean()
+    rs = gain / loss.replace(0, np.nan)
+    out = 100 - 100 / (1 + rs)
+    return out.where(loss != 0, 100.0).where(gain.notna())
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = line.ewm(span=signal, adjust=False, min_periods=signal).mean()
+    return line, signal_line, line - signal_line
+
+
+def atr(frame, window=14):
+    prev_close = frame["close"].shift(1)
+    true_range = pd.concat(
+        [
+            frame["high"] - frame["low"],
+            (frame["high"] - prev_close).abs(),
+            (frame["low"] - prev_close).abs(),
+        ],
+        axis=1,
+    ).max(axis=1)
+    return true_range.ewm(alpha=1 / window, adjust=False, min_periods=window).mean()
+
+
+def add_indicators(frame):
+    """Return a copy of an OHLCV frame (sorted by date) with indicator columns added."""
+    frame = frame.sort_values("date").reset_index(drop=True).copy()
+    close = frame["close"].astype(float)
+    frame["sma20"] = sma(close, 20)
+    frame["sma60"] = sma(close, 60)
+    frame["ema12"] = ema(close, 12)
+    frame["ema26"] = ema(close, 26)
+    frame["rsi14"] = rsi(close, 14)
+    frame["macd"], frame["macd_signal"], frame["macd_hist"] = macd(close)
+    frame["atr14"] = atr(frame.astype({"high": float, "low": float, "close": float}), 14)
+    frame["trend"] = trend_labels(frame)
+    return frame
+
+
+def trend_labels(frame):
+    """
+    up: close > SMA20 and SMA20 rising (and SMA20 > SMA60 when SMA60 exists)
+    down: the mirror image; sideways otherwise.
+    """
+    close, fast, slow = frame["close"], frame["sma20"], frame["sma60"]
+    slope = fast.diff(5)
+    long_up = slow.isna() | (fast > slow)
+    long_down = slow.isna() | (fast < slow)
+    up = (close > fast) & (slope > 0) & long_up
+    down = (close < fast) & (slope < 0) & long_down
+    return np.where(up, "up", np.where(down, "down", np.where(fast.isna(), "", "sideways")))
+
+
+def _clean(value, digits=4):
+    if value is None or isinstance(value, str):
+        return value
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
+
+
+def latest_indicators(frame):
+    """Indicator values for the last row of an OHLCV frame (None where data is insufficient)."""
+    if frame is None or frame.empty:
+        return {"as_of": "", "rows": 0}
+    last = add_indicators(frame).iloc[-1]
+    result = {"as_of": str(last["date"]), "rows": len(frame), "close": _clean(last["close"])}
+    for col in ["sma20", "sma60", "ema12", "ema26", "rsi14", "macd", "macd_signal", "macd_hist", "atr14"]:
+        result[col] = _clean(last[col])
+    result["trend"] = str(last["trend"]) or None
+    return result
+
+
+def compute_for_symbol(symbol, lookback=60):
+    frame = price_store.read_window(symbol, max(lookback, 0) + WARMUP_ROWS)
+    result = {"symbol": price_store.normalize_symbol(symbol), "lookback": lookback}
+    result.update(latest_indicators(frame))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute SMA/EMA/RSI/MACD/ATR and trend for a symbol from the price store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("symbol")
+    parser.add_argument("--lookback", type=int, default=60, help="Analysis window in rows (default: 60)")
+    args = parser.parse_args()
+
+    print(json.dumps(compute_for_symbol(unquote(args.symbol), lookback=args.lookback)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Jobs - file-backed job records for asynchronous Analyzer runs
+
+The analyze webhook answers immediately with a job id (the n8n execution id) and the
+workflow keeps running; its last step stores the result here. Clients poll the status
+webhook (or this CLI), optionally long-polling with --wait until the job finishes.
+
+Job states: running -> done | failed
+
+Usage:
+    python jobs.py submit 1234 --request '{"symbol": "AAPL.US"}'
+    python jobs.py finish 1234 --result '{"value": "BUY"}'
+    python jobs.py finish 1234 --result-file data/payloads/1234-result.json
+    python jobs.py fail 1234 --error "Gemini quota exceeded"
+    python jobs.py status 1234 --wait 20
+    python jobs.py prune
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import unquote
+
+BASE_DIR = Path(__file__).resolve().parent
+JOBS_DIR = BASE_DIR / "data" / "jobs"
+
+JOB_TTL = int(os.getenv("JOB_TTL", str(7 * 24 * 3600)))
+# Upper bound for one long-poll so the status webhook never holds a worker for long
+MAX_WAIT = 25
+POLL_INTERVAL = 0.5
+FINISHED = ("done", "failed")
+
+
+def job_path(job_id, jobs_dir=JOBS_DIR):
+    job_id = str(job_id).strip()
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", job_id):
+        raise ValueError(f"Invalid job id: {job_id!r}")
+    return Path(jobs_dir) / f"{job_id}.json"
+
+
+def _write(path, job):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One temp file per writer (process and thread), so concurrent writes never share it
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(job, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def read_job(job_id, jobs_dir=JOBS_DIR):
+    try:
+        return json.loads(job_path(job_id, jobs_dir).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def submit(job_id, request=None, jobs_dir=JOBS_DIR, now=None):
+    job = {
+        "job_id": str(job_id),
+        "status": "running",
+        "request": request or {},
+        "submitted_at": now or time.time(),
+        "finished_at": None,
+        "result": None,
+        "error": "",
+    }
+    _write(job_path(job_id, jobs_dir), job)
+    return job
+
+
+def _complete(job_id, status, result=None, error="", jobs_dir=JOBS_DIR, create=True):
+    path = job_path(job_id, jobs_dir)
+    job = read_job(job_id, jobs_dir)
+    if job is None:
+        if not create:
+            return None
+        # Manual runs never went through submit
+        job = submit(job_id, jobs_dir=jobs_dir)
+    job.update({"status": status, "result": result, "error": error, "finished_at": time.time()})
+    _write(path, job)
+    return job
+
+
+def finish(job_id, result, jobs_dir=JOBS_DIR):
+    return _complete(job_id, "done", result=result, jobs_dir=jobs_dir)
+
+
+def fail(job_id, error, jobs_dir=JOBS_DIR):
+    """Mark a submitted job failed; unknown ids (non-analyzer executions) are ignored."""
+    return _complete(job_id, "failed", error=error, jobs_dir=jobs_dir, create=False)
+
+
+def wait_for(job_id, wait=0, jobs_dir=JOBS_DIR, interval=POLL_INTERVAL):
+    """Return the job once it is finished or `wait` seconds have passed ({"status": "unknown"} if missing)."""
+    deadline = time.monotonic() + min(max(wait, 0), MAX_WAIT)
+    while True:
+        job = read_job(job_id, jobs_dir)
+        if (job and job["status"] in FINISHED) or time.monotonic() >= deadline:
+            break
+        time.sleep(interval)
+    if job is None:
+        return {"job_id": str(job_id), "status": "unknown"}
+    job["elapsed"] = round((job["finished_at"] or time.time()) - job["submitted_at"], 3)
+    return job
+
+
+def prune(jobs_dir=JOBS_DIR, ttl=JOB_TTL, now=None):
+    """Delete job files older than ttl seconds. Returns the number removed."""
+    now = now or time.time()
+    removed = 0
+    for path in Path(jobs_dir).glob("*.json"):
+        try:
+            if now - path.stat().st_mtime > ttl:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _json_arg(value, path=None):
+    """JSON from an argument (may be URL-encoded) or from a payload file, removed once read."""
+    if path:
+        path = Path(unquote(path))
+        try:
+            value = path.read_text(encoding="utf-8")
+        except OSError as exc:
+            raise ValueError(f"Cannot read {path}: {exc}") from exc
+        path.unlink(missing_ok=True)
+        return json.loads(value)
+    return json.loads(unquote(value)) if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="File-backed job records for asynchronous Analyzer runs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = sub.add_parser("submit", help="Record a new running job")
+    submit_parser.add_argument("job_id")
+    submit_parser.add_argument("--request", default="", help="Request JSON (may be URL-encoded)")
+
+    finish_parser = sub.add_parser("finish", help="Store a job's result")
+    finish_parser.add_argument("job_id")
+    result_group = finish_parser.add_mutually_exclusive_group(required=True)
+    result_group.add_argument("--result", help="Result JSON (may be URL-encoded)")
+    # The workflow writes the result to a file: URL-encoded JSON can outgrow the command line
+    result_group.add_argument("--result-file", help="File holding the result JSON (removed once read)")
+
+    fail_parser = sub.add_parser("fail", help="Mark a job failed")
+    fail_parser.add_argument("job_id")
+    fail_parser.add_argument("--error", default="", help="Error message (may be URL-encoded)")
+
+    status_parser = sub.add_parser("status", help="Print a job as JSON")
+    status_parser.add_argument("job_id")
+    status_parser.add_argument("--wait", default="0", help=f"Long-poll up to N seconds (max {MAX_WAIT})")
+
+    sub.add_parser("prune", help=f"Delete jobs older than JOB_TTL ({JOB_TTL}s)")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "submit":
+            prune()
+            job = submit(unquote(args.job_id), request=_json_arg(args.request))
+        elif args.command == "finish":
+            job = finish(unquote(args.job_id), _json_arg(args.result, args.result_file))
+        elif args.command == "fail":
+            job = fail(unquote(args.job_id), unquote(args.error)) or {"job_id": unquote(args.job_id), "status": "unknown"}
+        elif args.command == "status":
+            try:
+                wait = float(unquote(args.wait) or 0)
+            except ValueError:
+                wait = 0
+            job = wait_for(unquote(args.job_id), wait=wait)
+        else:
+            print(f"[ok] Removed {prune()} expired jobs from {JOBS_DIR}")
+            return
+    except ValueError as exc:
+        print(json.dumps({"job_id": "", "status": "error", "error": str(exc)}))
+        sys.exit(1)
+    print(json.dumps(job, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Mock Services - local stand-in for Stooq, Yahoo, Gemini and n8n (offline benchmarking)
+
+One HTTP server answers every external call the repo makes, with synthetic (or
+recorded) responses and configurable latency, error rate and payload size:
+    GET  /q/d/l/?s=aapl.us&i=d&d1=&d2=             Stooq daily CSV (stooq_fetch.py)
+    GET  /v1/finance/search?q=...                   Yahoo search (symbol_cache.py)
+    GET  /v8/finance/chart/<SYMBOL>?range=3mo       Yahoo chart (Analyzer on-demand fetch)
+    POST /v1beta/models/<model>:generateContent     Gemini REST (one JSON object per "symbol:" line)
+    *    /api/v1/workflows[...]                     n8n public API (create_n8n_workflows.py)
+    POST /webhook/analyze[-<shard>], GET /webhook/analyze-status   n8n Analyzer webhooks (analyze.py, dispatcher.py)
+    GET  /_mock/stats                                per-service request/error/byte counters
+Connections are kept alive (HTTP/1.1) and bodies of GZIP_MIN_BYTES or more are gzip-encoded
+when the client sends Accept-Encoding: gzip.
+
+Prices are a seeded random walk per symbol, so repeated and incremental fetches agree.
+With --fixtures DIR, recorded bodies are served instead when present:
+    DIR/stooq/<symbol>.csv, DIR/chart/<SYMBOL>.json, DIR/search/<query>.json, DIR/gemini/default.json
+
+Point the repo at it (`python mock_services.py env` prints these lines):
+    N8N_BASE_URL=http://127.0.0.1:8765      analyze.py and create_n8n_workflows.py
+    STOOQ_BASE_URL=http://127.0.0.1:8765
+    YAHOO_SEARCH_URL=http://127.0.0.1:8765/v1/finance/search
+    YAHOO_CHART_URL=http://127.0.0.1:8765/v8/finance/chart
+    GEMINI_API_URL=http://127.0.0.1:8765/v1beta   batch_analyzer.py
+    Gemini: set the n8n "Google Gemini(PaLM) Api" credential Host to http://127.0.0.1:8765
+
+Usage:
+    python mock_services.py serve --port 8765
+    python mock_services.py serve --latency-ms 80 --jitter-ms 40 --error-rate 0.02 --history-rows 5000
+    python mock_services.py serve --override gemini.latency_ms=1500 --override stooq.error_rate=0.1
+    python mock_services.py env --port 8765
+"""
+
+import argparse
+import gzip
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+SERVICES = ("stooq", "search", "chart", "gemini", "n8n-api", "webhook")
+# Synthetic history starts here so every fetch window cuts the same series
+EPOCH = "2000-01-03"
+CHART_RANGES = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260, "10y": 2520}
+# Same cap as jobs.MAX_WAIT
+MAX_WAIT = 25
+# Bodies at least this large are gzip-encoded for clients that accept it (like Stooq/Yahoo do)
+GZIP_MIN_BYTES = 1024
+SIGNALS = ("BUY", "SELL", "HOLD")
+
+DEFAULT_SETTINGS = {
+    "latency_ms": 0.0,
+    "jitter_ms": 0.0,
+    "error_rate": 0.0,
+    # Rows in a Stooq full-history download (no d1)
+    "history_rows": 2520,
+    # Padding added to each Gemini summary to grow the response
+    "analysis_bytes": 0,
+    # Seconds a webhook analysis job stays "running"
+    "job_seconds": 0.5,
+}
+
+
+def _seed(*parts):
+    return zlib.crc32("|".join(str(p) for p in parts).encode("utf-8"))
+
+
+def synthetic_bars(symbol, end=None):
+    """Seeded daily OHLCV from EPOCH to `end` (date or None for today) as a DataFrame."""
+    end = pd.Timestamp(end or date.today())
+    dates = pd.bdate_range(EPOCH, end)
+    n = len(dates)
+
+    # One generator per column keeps every prefix identical whatever `end` is
+    def draws(column):
+        return np.random.default_rng(_seed(symbol.upper(), column))
+
+    start_price = 20 + draws("start").random() * 180
+    close = start_price * np.exp(np.cumsum(draws("close").normal(0.0003, 0.015, n)))
+    spread = np.abs(draws("spread").normal(0, 0.01, n)) * close
+    open_ = close * (1 + draws("open").normal(0, 0.005, n))
+    return pd.DataFrame(
+        {
+            "date": dates.strftime("%Y-%m-%d"),
+            "open": open_.round(4),
+            "high": (np.maximum(open_, close) + spread).round(4),
+            "low": (np.minimum(open_, close) - spread).round(4),
+            "close": close.round(4),
+            "volume": draws("volume").integers(100_000, 5_000_000, n),
+        }
+    )
+
+
+class MockState:
+    """Settings, counters, fake n8n workflows and webhook jobs shared by the handler threads."""
+
+    def __init__(self, settings=None, overrides=None, fixtures=None, seed=0):
+        self.defaults = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.overrides = overrides or {}
+        self.fixtures = Path(fixtures) if fixtures else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {name: {"requests": 0, "errors": 0, "bytes": 0} for name in SERVICES}
+        self.workflows = {}
+        self.jobs = {}
+
+    def setting(self, service, name):
+        return self.overrides.get(service, {}).get(name, self.defaults[name])
+
+    def delay(self, service):
+        latency = self.setting(service, "latency_ms")
+        jitter = self.setting(service, "jitter_ms")
+        with self.lock:
+            ms = max(latency + (self.random.uniform(-jitter, jitter) if jitter else 0), 0)
+        if ms:
+            time.sleep(ms / 1000)
+
+    def should_fail(self, service):
+        rate = self.setting(service, "error_rate")
+        with self.lock:
+            return bool(rate) and self.random.random() < rate
+
+    def count(self, service, size, error=False):
+        with self.lock:
+            entry = self.stats[service]
+            entry["requests"] += 1
+            entry["bytes"] += size
+            entry["errors"] += int(error)
+
+    def fixture(self, service, name):
+        if not self.fixtures:
+            return None
+        path = self.fixtures / service / re.sub(r"[^A-Za-z0-9._-]", "_", name)
+        return path.read_bytes() if path.exists() else None
+
+
+def stooq_csv(state, query):
+    symbol = (query.get("s") or [""])[0]
+    recorded = state.fixture("stooq", f"{symbol.lower()}.csv")
+    if recorded is not None:
+        return 200, "text/csv", recorded
+    d1 = (query.get("d1") or [""])[0]
+    d2 = (query.get("d2") or [""])[0]
+    end = datetime.strptime(d2, "%Y%m%d").date() if d2 else None
+    bars = synthetic_bars(symbol, end)
+    if d1:
+        bars = bars[bars["date"] >= datetime.strptime(d1, "%Y%m%d").strftime("%Y-%m-%d")]
+    else:
+        bars = bars.tail(int(state.setting("stooq", "history_rows")))
+    if bars.empty:
+        return 200, "text/csv", b"No data"
+    bars = bars.rename(columns=str.capitalize)
+    return 200, "text/csv", bars.to_csv(index=False).encode("utf-8")
+
+
+def yahoo_search(state, query):
+    text = (query.get("q") or [""])[0].strip()
+    recorded = state.fixture("search", f"{text.lower()}.json")
+    if recorded is not None:
+        return 200, "application/json", recorded
+    ticker = re.sub(r"[^A-Z0-9]", "", text.upper())[:6] or "MOCK"
+    quote = {"symbol": ticker, "shortname": text, "quoteType": "EQUITY", "exchange": "NMS"}
+    return 200, "application/json", _json({"quotes": [quote], "news": []})
+
+
+def yahoo_chart(state, symbol, query):
+    recorded = state.fixture("chart", f"{symbol.upper()}.json")
+    if recorded is not None:
+        return 200, "application/json", recorded
+    span = (query.get("range") or ["3mo"])[0]
+    rows = CHART_RANGES.get(span)
+    bars = synthetic_bars(symbol)
+    if rows:
+        bars = bars.tail(rows)
+    timestamps = ((pd.to_datetime(bars["date"] + " 14:30") - pd.Timestamp("1970-01-01")) // pd.Timedelta(seconds=1)).tolist()
+    quote = {col: bars[col].tolist() for col in ("open", "high", "low", "close", "volume")}
+    result = {
+        "meta": {"symbol": symbol.upper(), "currency": "USD", "dataGranularity": "1d", "range": span},
+        "timestamp": timestamps,
+        "indicators": {"quote": [quote], "adjclose": [{"adjclose": quote["close"]}]},
+    }
+    return 200, "application/json", _json({"chart": {"result": [result], "error": None}})
+
+
+def gemini_generate(state, model, body):
+    recorded = state.fixture("gemini", "default.json")
+    if recorded is not None:
+        return 200, "application/json", recorded
+    prompt = " ".join(
+        part.get("text", "")
+        for content in (body or {}).get("contents", [])
+        for part in content.get("parts", [])
+    )
+    symbols = re.findall(r"^symbol: *(\S+)", prompt, flags=re.MULTILINE) or ["AAPL.US"]
+    as_ofs = re.findall(r"^as_of: *(\S+)", prompt, flags=re.MULTILINE)
+    padding = "." * int(state.setting("gemini", "analysis_bytes"))
+    answers = []
+    for i, symbol in enumerate(symbols):
+        as_of = as_ofs[i] if i < len(as_ofs) else ""
+        rng = random.Random(_seed(symbol, as_of, model))
+        answers.append(
+            {
+                "symbol": symbol,
+                "as_of": as_of,
+                "signal": rng.choice(SIGNALS),
+                "confidence": round(rng.uniform(0.4, 0.9), 2),
+                "summary": f"모의 분석 결과입니다 ({symbol}).{padding}",
+            }
+        )
+    text = json.dumps(answers[0] if len(answers) == 1 else answers, ensure_ascii=False)
+    tokens = max(len(prompt) // 4, 1)
+    response = {
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {
+            "promptTokenCount": tokens,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": tokens + len(text) // 4,
+        },
+        "modelVersion": model,
+    }
+    return 200, "application/json", _json(response)
+
+
+def n8n_api(state, method, path, query, body):
+    """In-memory subset of the n8n public API: list (paginated), get, create, update, activate."""
+    match = re.fullmatch(r"/api/v1/workflows(?:/([^/]+))?(?:/(activate|deactivate))?", path)
+    if not match:
+        return 404, "application/json", _json({"message": "not found"})
+    workflow_id, action = match.groups()
+    now = datetime.now(timezone.utc).isoformat()
+    with state.lock:
+        if workflow_id is None and method == "GET":
+            items = sorted(state.workflows.values(), key=lambda w: w["createdAt"])
+            limit = int((query.get("limit") or ["100"])[0])
+            offset = int((query.get("cursor") or ["0"])[0] or 0)
+            page = items[offset : offset + limit]
+            cursor = str(offset + limit) if offset + limit < len(items) else None
+            return 200, "application/json", _json({"data": page, "nextCursor": cursor})
+        if workflow_id is None and method == "POST":
+            workflow = dict(body or {}, id=uuid.uuid4().hex[:16], active=False, createdAt=now, updatedAt=now)
+            state.workflows[workflow["id"]] = workflow
+            return 200, "application/json", _json(workflow)
+        workflow = state.workflows.get(workflow_id)
+        if workflow is None:
+            return 404, "application/json", _json({"message": f"Workflow {workflow_id} not found"})
+        if action and method == "POST":
+            workflow["active"] = action == "activate"
+        elif method == "PUT":
+            workflow.update(body or {}, id=workflow_id, updatedAt=now)
+        elif method != "GET":
+            return 405, "application/json", _json({"message": "method not allowed"})
+        return 200, "application/json", _json(workflow)
+
+
+def webhook(state, method, path, query, body, base_url):
+    """Analyzer webhooks: POST /webhook/analyze starts a job, GET /webhook/analyze-status polls it."""
+    if re.fullmatch(r"/webhook/analyze(?:-\d+)?", path) and method == "POST":
+        job_id = uuid.uuid4().hex[:12]
+        request = body or {}
+        symbol = str(request.get("symbol") or request.get("query") or "AAPL.US").strip().upper()
+        rng = random.Random(_seed(symbol, date.today()))
+        result = {
+            "key": f"{symbol}|gemini",
+            "symbol": symbol,
+            "date": date.today().isoformat(),
+            "type": "gemini",
+            "value": rng.choice(SIGNALS),
+            "threshold": round(rng.uniform(0.4, 0.9), 2),
+            "message": f"모의 분석 결과입니다 ({symbol}).",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "cache": "miss",
+        }
+        # Same shape as the Analyzer's stage timings, split from the configured job time
+        total = state.setting("webhook", "job_seconds") * 1000
+        shares = {"symbol_lookup_ms": 0.05, "read_prices_ms": 0.1, "prompt_ms": 0.15, "cache_check_ms": 0.05, "model_ms": 0.55, "signals_write_ms": 0.1}
+        result["timings"] = {name: round(total * share, 1) for name, share in shares.items()}
+        result["timings"].update({"yahoo_fetch_ms": None, "total_ms": round(total, 1)})
+        with state.lock:
+            state.jobs[job_id] = {
+                "job_id": job_id,
+                "submitted_at": time.time(),
+                "ready_at": time.time() + state.setting("webhook", "job_seconds"),
+                "result": result,
+            }
+        status_url = f"{base_url}/webhook/analyze-status?job_id={job_id}"
+        return 202, "application/json", _json({"job_id": job_id, "status": "running", "status_url": status_url})
+    if path == "/webhook/analyze-status" and method == "GET":
+        job_id = (query.get("job_id") or [""])[0]
+        try:
+            wait = min(max(float((query.get("wait") or ["0"])[0] or 0), 0), MAX_WAIT)
+        except ValueError:
+            wait = 0
+        deadline = time.monotonic() + wait
+        while True:
+            with state.lock:
+                job = state.jobs.get(job_id)
+            if job is None:
+                return 200, "application/json", _json({"job_id": job_id, "status": "unknown"})
+            done = time.time() >= job["ready_at"]
+            if done or time.monotonic() >= deadline:
+                break
+            time.sleep(min(0.05, max(job["ready_at"] - time.time(), 0.001)))
+        out = {
+            "job_id": job_id,
+            "status": "done" if done else "running",
+            "result": job["result"] if done else None,
+            "error": "",
+            "elapsed": round(min(time.time(), job["ready_at"]) - job["submitted_at"], 3),
+        }
+        return 200, "application/json", _json(out)
+    return 404, "application/json", _json({"message": f"Webhook {path} is not registered"})
+
+
+def _json(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def route(path):
+    """Service name for a request path (None when unknown)."""
+    if path.startswith("/q/d/l"):
+        return "stooq"
+    if path.startswith("/v1/finance/search"):
+        return "search"
+    if path.startswith("/v8/finance/chart/"):
+        return "chart"
+    if re.match(r"/v1(beta)?/models/[^/]+:generateContent$", path):
+        return "gemini"
+    if path.startswith("/api/v1/"):
+        return "n8n-api"
+    if path.startswith("/webhook/"):
+        return "webhook"
+    return None
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, a kept-alive connection
+    # waits for the client's delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+    server_version = "MockServices/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, content_type, payload, headers=None):
+        if len(payload) >= GZIP_MIN_BYTES and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            payload = gzip.compress(payload, compresslevel=5)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+    def _handle(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            body = None
+
+        if path == "/_mock/stats":
+            with state.lock:
+                return self._send(200, "application/json", _json(state.stats))
+        service = route(path)
+        if service is None:
+            return self._send(404, "application/json", _json({"message": f"No mock for {path}"}))
+
+        state.delay(service)
+        if state.should_fail(service):
+            # Gemini answers quota errors with 429 + Retry-After; the rest look like an overloaded upstream
+            status, headers = (429, {"Retry-After": "1"}) if service == "gemini" else (503, {})
+            payload = _json({"error": {"code": status, "message": f"Injected {service} error"}})
+            state.count(service, len(payload), error=True)
+            return self._send(status, "application/json", payload, headers)
+
+        if service == "stooq":
+            status, content_type, payload = stooq_csv(state, query)
+        elif service == "search":
+            status, content_type, payload = yahoo_search(state, query)
+        elif service == "chart":
+            status, content_type, payload = yahoo_chart(state, path.rsplit("/", 1)[1], query)
+        elif service == "gemini":
+            model = re.match(r"/v1(?:beta)?/models/([^/:]+)", path).group(1)
+            status, content_type, payload = gemini_generate(state, model, body)
+        elif service == "n8n-api":
+            status, content_type, payload = n8n_api(state, self.command, path, query, body)
+        else:
+            host = self.headers.get("Host") or f"{DEFAULT_HOST}:{self.server.server_port}"
+            status, content_type, payload = webhook(state, self.command, path, query, body, f"http://{host}")
+        state.count(service, len(payload), error=status >= 400)
+        self._send(status, content_type, payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = _handle
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, state=None, verbose=False):
+    """Build (but do not start) the mock server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = state or MockState()
+    server.verbose = verbose
+    return server
+
+
+def start_in_thread(host=DEFAULT_HOST, port=0, **state_options):
+    """Start a mock server on a background thread (benchmarks). Returns (server, base_url)."""
+    server = make_server(host, port, MockState(**state_options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def env_lines(base_url):
+    return [
+        f"N8N_BASE_URL={base_url}",
+        f"STOOQ_BASE_URL={base_url}",
+        f"YAHOO_SEARCH_URL={base_url}/v1/finance/search",
+        f"YAHOO_CHART_URL={base_url}/v8/finance/chart",
+        f"GEMINI_API_URL={base_url}/v1beta",
+    ]
+
+
+def parse_overrides(items):
+    """["gemini.latency_ms=1500", ...] -> {"gemini": {"latency_ms": 1500.0}}"""
+    overrides = {}
+    for item in items or []:
+        match = re.fullmatch(r"([a-z-]+)\.([a-z_]+)=(.+)", item.strip())
+        if not match or match.group(1) not in SERVICES or match.group(2) not in DEFAULT_SETTINGS:
+            raise ValueError(f"Invalid override {item!r} (expected SERVICE.SETTING=VALUE, services: {', '.join(SERVICES)})")
+        service, name, value = match.groups()
+        overrides.setdefault(service, {})[name] = float(value)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for Stooq, Yahoo, Gemini and n8n",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Run the mock server")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--latency-ms", type=float, default=DEFAULT_SETTINGS["latency_ms"], help="Added to every response")
+    serve.add_argument("--jitter-ms", type=float, default=DEFAULT_SETTINGS["jitter_ms"], help="Uniform +/- around the latency")
+    serve.add_argument("--error-rate", type=float, default=DEFAULT_SETTINGS["error_rate"], help="Share of requests answered 503 (Gemini: 429)")
+    serve.add_argument("--history-rows", type=int, default=DEFAULT_SETTINGS["history_rows"], help="Rows in a Stooq full-history CSV")
+    serve.add_argument("--analysis-bytes", type=int, default=DEFAULT_SETTINGS["analysis_bytes"], help="Padding per Gemini summary")
+    serve.add_argument("--job-seconds", type=float, default=DEFAULT_SETTINGS["job_seconds"], help="Webhook job run time")
+    serve.add_argument("--override", action="append", default=[], help="Per-service setting, e.g. gemini.latency_ms=1500")
+    serve.add_argument("--fixtures", default="", help="Directory of recorded responses")
+    serve.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and error injection")
+    serve.add_argument("--verbose", action="store_true", help="Log every request")
+
+    env = sub.add_parser("env", help="Print .env lines that point the repo at the mock server")
+    env.add_argument("--host", default=DEFAULT_HOST)
+    env.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    args = parser.parse_args()
+
+    if args.command == "env":
+        print("\n".join(env_lines(f"http://{args.host}:{args.port}")))
+        return
+
+    try:
+        overrides = parse_overrides(args.override)
+    except ValueError as exc:
+        print(f"[err] {exc}")
+        sys.exit(1)
+    settings = {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "history_rows": args.history_rows,
+        "analysis_bytes": args.analysis_bytes,
+        "job_seconds": args.job_seconds,
+    }
+    state = MockState(settings, overrides, unquote(args.fixtures) or None, seed=args.seed)
+    server = make_server(args.host, args.port, state, verbose=args.verbose)
+    print(f"[ok] Mock services on http://{args.host}:{server.server_port}")
+    for line in env_lines(f"http://{args.host}:{server.server_port}"):
+        print(f"    {line}")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
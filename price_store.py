@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Price Store - columnar per-symbol storage that replaces full rewrites of data/prices.xlsx
+
+Each symbol is kept as a compacted Parquet file plus an append-only delta log:
+    data/store/prices/<SYMBOL>.parquet    compacted history
+    data/store/prices/<SYMBOL>.delta.csv  rows appended since the last compaction
+    data/store/prices/_index.json         symbol -> rows, first/last date, row group sizes
+
+Appends only write the new rows to the delta log, so the cost of a Collector run no
+longer grows with history. Readers merge both files; window reads only load the
+trailing Parquet row groups they need. data/prices.xlsx can still be produced as an
+export.
+
+Usage:
+    python price_store.py import-xlsx
+    python price_store.py ingest-csv AAPL.US data/store/incoming/AAPL.US.csv --after 2026-01-02
+    python price_store.py tail AAPL.US --rows 60
+    python price_store.py window AAPL.US --rows 60
+    python price_store.py index
+    python price_store.py compact
+    python price_store.py export-xlsx
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+from urllib.parse import unquote
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+BASE_DIR = Path(__file__).resolve().parent
+STORE_DIR = BASE_DIR / "data" / "store" / "prices"
+PRICES_XLSX_PATH = BASE_DIR / "data" / "prices.xlsx"
+STATE_XLSX_PATH = BASE_DIR / "data" / "state.xlsx"
+
+PRICE_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+XLSX_COLUMNS = ["open", "high", "low", "close", "volume", "key", "symbol", "date"]
+COMPACT_THRESHOLD = 500
+ROW_GROUP_SIZE = 4096
+INDEX_NAME = "_index.json"
+
+
+def normalize_symbol(symbol):
+    return (symbol or "").strip().upper()
+
+
+def symbol_paths(symbol, store_dir=STORE_DIR):
+    """Return (parquet_path, delta_path) for a symbol."""
+    safe = re.sub(r"[^A-Z0-9._-]", "_", normalize_symbol(symbol))
+    if not safe:
+        raise ValueError("A symbol is required.")
+    store_dir = Path(store_dir)
+    return store_dir / f"{safe}.parquet", store_dir / f"{safe}.delta.csv"
+
+
+def normalize_rows(frame):
+    """
+    Coerce an OHLCV frame (Stooq CSV, xlsx export, Yahoo rows) into PRICE_COLUMNS.
+    Header names are matched case-insensitively; rows without a valid date are dropped.
+    """
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    frame = frame.rename(columns={c: str(c).strip().lower() for c in frame.columns})
+    if "date" not in frame.columns:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    out = pd.DataFrame(index=frame.index)
+    out["date"] = pd.to_datetime(frame["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    for col in PRICE_COLUMNS[1:]:
+        values = frame[col] if col in frame.columns else None
+        out[col] = pd.to_numeric(values, errors="coerce") if values is not None else float("nan")
+    out = out.dropna(subset=["date"])
+    return out.drop_duplicates(subset="date", keep="last").sort_values("date").reset_index(drop=True)
+
+
+def _read_delta(delta_path):
+    if not delta_path.exists() or delta_path.stat().st_size == 0:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    return pd.read_csv(delta_path, dtype={"date": str})
+
+
+def read_symbol(symbol, store_dir=STORE_DIR, columns=None):
+    """Read the full merged history for a symbol, sorted by date (empty frame when unknown)."""
+    parquet_path, delta_path = symbol_paths(symbol, store_dir)
+    parts = []
+    delta = _read_delta(delta_path)
+    if parquet_path.exists():
+        if delta.empty:
+            # Parquet files are written already normalized; skip the re-parse
+            return pd.read_parquet(parquet_path, columns=columns)
+        parts.append(pd.read_parquet(parquet_path))
+    if not delta.empty:
+        parts.append(delta)
+    if not parts:
+        frame = pd.DataFrame(columns=PRICE_COLUMNS)
+    else:
+        frame = normalize_rows(pd.concat(parts, ignore_index=True))
+    return frame[columns] if columns else frame
+
+
+def last_date(symbol, store_dir=STORE_DIR):
+    """Latest stored date for a symbol ('' when the symbol has no rows)."""
+    parquet_path, delta_path = symbol_paths(symbol, store_dir)
+    dates = []
+    delta = _read_delta(delta_path)
+    if not delta.empty:
+        dates.append(str(delta["date"].max()))
+    if parquet_path.exists():
+        column = pd.read_parquet(parquet_path, columns=["date"])["date"]
+        if not column.empty:
+            dates.append(str(column.max()))
+    return max(dates) if dates else ""
+
+
+def row_count(symbol, store_dir=STORE_DIR):
+    """Number of stored rows, read from Parquet metadata plus the delta log."""
+    parquet_path, delta_path = symbol_paths(symbol, store_dir)
+    count = len(_read_delta(delta_path))
+    if parquet_path.exists():
+        count += pq.ParquetFile(parquet_path).metadata.num_rows
+    return count
+
+
+def read_window(symbol, rows, store_dir=STORE_DIR):
+    """
+    Read the latest `rows` rows for a symbol (sorted oldest first) without loading the
+    whole history: the delta log plus only the trailing Parquet row groups that are needed.
+    """
+    parquet_path, delta_path = symbol_paths(symbol, store_dir)
+    rows = max(int(rows), 0)
+    parts = []
+    delta = _read_delta(delta_path)
+    needed = rows - len(delta)
+    if needed > 0 and parquet_path.exists():
+        parquet = pq.ParquetFile(parquet_path)
+        groups = []
+        covered = 0
+        for group in range(parquet.num_row_groups - 1, -1, -1):
+            groups.insert(0, group)
+            covered += parquet.metadata.row_group(group).num_rows
+            if covered >= needed:
+                break
+        if groups:
+            parts.append(parquet.read_row_groups(groups).to_pandas())
+    if not delta.empty:
+        parts.append(delta)
+    if not parts:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    return normalize_rows(pd.concat(parts, ignore_index=True)).tail(rows).reset_index(drop=True)
+
+
+def read_index(store_dir=STORE_DIR):
+    try:
+        return json.loads((Path(store_dir) / INDEX_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _index_entry(symbol, store_dir=STORE_DIR):
+    parquet_path, delta_path = symbol_paths(symbol, store_dir)
+    delta = _read_delta(delta_path)
+    entry = {"rows": len(delta), "first_date": "", "last_date": "", "row_groups": []}
+    dates = [str(d) for d in (delta["date"].min(), delta["date"].max())] if not delta.empty else []
+    if parquet_path.exists():
+        metadata = pq.ParquetFile(parquet_path).metadata
+        entry["rows"] += metadata.num_rows
+        entry["row_groups"] = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+        date_col = metadata.schema.to_arrow_schema().get_field_index("date")
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(date_col).statistics
+            if stats is not None and stats.has_min_max:
+                dates.extend([str(stats.min), str(stats.max)])
+    if dates:
+        entry["first_date"], entry["last_date"] = min(dates), max(dates)
+    return entry
+
+
+def update_index(symbols, store_dir=STORE_DIR):
+    """Refresh the sidecar index entries for the given symbols (atomic rewrite)."""
+    index = read_index(store_dir)
+    for symbol in symbols:
+        symbol = normalize_symbol(symbol)
+        entry = _index_entry(symbol, store_dir)
+        if entry["rows"]:
+            index[symbol] = entry
+        else:
+            index.pop(symbol, None)
+    index_path = Path(store_dir) / INDEX_NAME
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_name(f"{INDEX_NAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(index, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, index_path)
+    return index
+
+
+def rebuild_index(store_dir=STORE_DIR):
+    index_path = Path(store_dir) / INDEX_NAME
+    if index_path.exists():
+        index_path.unlink()
+    return update_index(list_symbols(store_dir), store_dir)
+
+
+def latest_symbol(store_dir=STORE_DIR):
+    """Symbol with the most recent stored bar (the Analyzer's default when none is given)."""
+    index = read_index(store_dir) or rebuild_index(store_dir)
+    if not index:
+        return ""
+    return max(index, key=lambda symbol: (index[symbol].get("last_date", ""), symbol))
+
+
+def price_window(symbol, lookback=60, store_dir=STORE_DIR):
+    """The Analyzer's price window: {symbol, lookback, rows (newest first), as_of}."""
+    symbol = normalize_symbol(symbol) or latest_symbol(store_dir)
+    if not symbol:
+        return {"symbol": "", "lookback": lookback, "rows": [], "as_of": ""}
+    frame = read_window(symbol, lookback, store_dir).iloc[::-1]
+    frame = frame.astype(object).where(frame.notna(), None)
+    rows = [dict(row, symbol=symbol) for row in frame.to_dict("records")]
+    return {"symbol": symbol, "lookback": lookback, "rows": rows, "as_of": rows[0]["date"] if rows else ""}
+
+
+def _write_parquet(frame, parquet_path):
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = parquet_path.with_name(f"{parquet_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    frame[PRICE_COLUMNS].to_parquet(tmp_path, index=False, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, parquet_path)
+
+
+def compact(symbol, store_dir=STORE_DIR, reindex=True):
+    """Fold the delta log into the Parquet file. Returns the number of rows stored."""
+    parquet_path, delta_path = symbol_paths(symbol, store_dir)
+    if not delta_path.exists():
+        return None
+    frame = read_symbol(symbol, store_dir)
+    _write_parquet(frame, parquet_path)
+    delta_path.unlink()
+    if reindex:
+        update_index([symbol], store_dir)
+    return len(frame)
+
+
+def append_rows(symbol, rows, store_dir=STORE_DIR, after=None, reindex=True):
+    """
+    Append rows newer than both `after` and the stored last date to the delta log.
+    Only the new rows are written; the delta is compacted once it grows past COMPACT_THRESHOLD.
+    Pass reindex=False when the caller refreshes the index itself (once per batch, or
+    through write_queue).
+    Returns the appended rows as a DataFrame.
+    """
+    rows = normalize_rows(rows)
+    cutoff = max(after or "", last_date(symbol, store_dir))
+    if cutoff:
+        rows = rows[rows["date"] > cutoff]
+    if rows.empty:
+        return rows
+
+    parquet_path, delta_path = symbol_paths(symbol, store_dir)
+    delta_path.parent.mkdir(parents=True, exist_ok=True)
+    write_header = not delta_path.exists() or delta_path.stat().st_size == 0
+    rows[PRICE_COLUMNS].to_csv(delta_path, mode="a", header=write_header, index=False)
+
+    if len(_read_delta(delta_path)) >= COMPACT_THRESHOLD:
+        compact(symbol, store_dir, reindex=reindex)
+    elif reindex:
+        update_index([symbol], store_dir)
+    return rows
+
+
+def pending_rows(symbol, rows, after=None, full=False, store_dir=STORE_DIR):
+    """
+    The rows append_rows (merge_rows with full=True) would add for `symbol`, without writing:
+    for callers that hand the write to write_queue and report the count themselves.
+    """
+    rows = normalize_rows(rows)
+    if full:
+        stored = read_symbol(symbol, store_dir, columns=["date"])["date"]
+        return rows[~rows["date"].isin(stored)].reset_index(drop=True)
+    cutoff = max(after or "", last_date(symbol, store_dir))
+    return rows[rows["date"] > cutoff].reset_index(drop=True) if cutoff else rows
+
+
+def merge_rows(symbol, rows, store_dir=STORE_DIR, reindex=True):
+    """
+    Merge a full-history download into the store: rows replace stored rows of the same date
+    and fill in the older dates that append_rows would drop (e.g. when on-demand Yahoo bars
+    were stored first). Rewrites the symbol's Parquet file and folds in its delta log.
+    Returns the rows whose dates were not stored before, as a DataFrame.
+    """
+    rows = normalize_rows(rows)
+    if rows.empty:
+        return rows
+    parquet_path, delta_path = symbol_paths(symbol, store_dir)
+    stored = read_symbol(symbol, store_dir)
+    # normalize_rows keeps the last duplicate, so the downloaded rows win
+    merged = normalize_rows(pd.concat([stored, rows], ignore_index=True))
+    _write_parquet(merged, parquet_path)
+    if delta_path.exists():
+        delta_path.unlink()
+    if reindex:
+        update_index([symbol], store_dir)
+    return rows[~rows["date"].isin(stored["date"])].reset_index(drop=True)
+
+
+def list_symbols(store_dir=STORE_DIR):
+    store_dir = Path(store_dir)
+    if not store_dir.exists():
+        return []
+    names = set()
+    for path in store_dir.iterdir():
+        if path.name.endswith(".delta.csv"):
+            names.add(path.name[: -len(".delta.csv")])
+        elif path.suffix == ".parquet":
+            names.add(path.stem)
+    return sorted(names)
+
+
+def import_xlsx(xlsx_path=PRICES_XLSX_PATH, store_dir=STORE_DIR):
+    """Seed the store from an existing prices.xlsx (one Parquet file per symbol)."""
+    frame = pd.read_excel(xlsx_path, sheet_name="prices", dtype={"date": str, "symbol": str})
+    frame = frame.rename(columns={c: str(c).strip().lower() for c in frame.columns})
+    frame = frame.dropna(subset=["symbol"])
+    counts = {}
+    for symbol, group in frame.groupby(frame["symbol"].str.strip().str.upper()):
+        if not symbol:
+            continue
+        merged = normalize_rows(pd.concat([read_symbol(symbol, store_dir), group], ignore_index=True))
+        _write_parquet(merged, symbol_paths(symbol, store_dir)[0])
+        delta_path = symbol_paths(symbol, store_dir)[1]
+        if delta_path.exists():
+            delta_path.unlink()
+        counts[symbol] = len(merged)
+    update_index(counts, store_dir)
+    return counts
+
+
+def export_xlsx(xlsx_path=PRICES_XLSX_PATH, store_dir=STORE_DIR):
+    """Write every stored symbol into a prices.xlsx laid out like the legacy sheet."""
+    frames = []
+    for symbol in list_symbols(store_dir):
+        frame = read_symbol(symbol, store_dir)
+        frame["symbol"] = symbol
+        frame["key"] = symbol + "|" + frame["date"]
+        frames.append(frame)
+    merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=XLSX_COLUMNS)
+    xlsx_path = Path(xlsx_path)
+    tmp_path = xlsx_path.with_name(f"~{os.getpid()}-{threading.get_ident()}-{xlsx_path.name}")
+    merged[XLSX_COLUMNS].to_excel(tmp_path, sheet_name="prices", index=False)
+    os.replace(tmp_path, xlsx_path)
+    return len(merged)
+
+
+def update_state(symbol, new_last_date, state_path=STATE_XLSX_PATH):
+    """Upsert one symbol's last_date into state.xlsx (small file, one row per symbol)."""
+    update_states({symbol: new_last_date}, state_path)
+
+
+def update_states(last_dates, state_path=STATE_XLSX_PATH):
+    """Upsert {symbol: last_date} into state.xlsx with a single read and write."""
+    if not last_dates:
+        return
+    state_path = Path(state_path)
+    if state_path.exists():
+        state = pd.read_excel(state_path, sheet_name="state", dtype=str)
+    else:
+        state = pd.DataFrame(columns=["symbol", "last_date"])
+    updates = {normalize_symbol(symbol): value for symbol, value in last_dates.items()}
+    state = state[~state["symbol"].astype(str).str.upper().isin(updates)]
+    rows = pd.DataFrame([{"symbol": symbol, "last_date": value} for symbol, value in updates.items()])
+    state = pd.concat([state, rows], ignore_index=True).sort_values("symbol")
+    tmp_path = state_path.with_name(f"~{os.getpid()}-{threading.get_ident()}-{state_path.name}")
+    state[["symbol", "last_date"]].to_excel(tmp_path, sheet_name="state", index=False)
+    os.replace(tmp_path, state_path)
+
+
+def ingest_csv(symbol, csv_path, after=None, store_dir=STORE_DIR, state_path=STATE_XLSX_PATH):
+    """
+    Append new rows from a Stooq CSV download and refresh state.xlsx for the symbol.
+    Without `after` the CSV is the full history and is merged rather than appended.
+    """
+    try:
+        raw = pd.read_csv(csv_path)
+    except (pd.errors.EmptyDataError, FileNotFoundError):
+        raw = pd.DataFrame()
+    if after:
+        appended = append_rows(symbol, raw, store_dir=store_dir, after=after)
+    else:
+        appended = merge_rows(symbol, raw, store_dir=store_dir)
+    latest = last_date(symbol, store_dir)
+    # A full download records state even when it only replaced stored dates
+    if (len(appended) or (not after and latest)) and state_path:
+        update_state(symbol, latest, state_path)
+    return {"symbol": normalize_symbol(symbol), "appended": len(appended), "last_date": latest}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Columnar per-symbol price store (Parquet + append-only delta log)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest-csv", help="Append new rows from a Stooq CSV file")
+    ingest.add_argument("symbol")
+    ingest.add_argument("csv_path")
+    ingest.add_argument("--after", default="", help="Only keep rows after this date (YYYY-MM-DD)")
+    ingest.add_argument("--export-xlsx", action="store_true", help="Also refresh data/prices.xlsx")
+
+    tail = sub.add_parser("tail", help="Print the latest rows for a symbol as JSON")
+    tail.add_argument("symbol")
+    tail.add_argument("--rows", type=int, default=60)
+
+    window = sub.add_parser("window", help="Print the Analyzer's price window as JSON")
+    window.add_argument("symbol", help="Symbol ('' picks the symbol with the latest bar)")
+    window.add_argument("--rows", type=int, default=60)
+
+    sub.add_parser("index", help="Rebuild the sidecar symbol/date index")
+
+    comp = sub.add_parser("compact", help="Fold delta logs into Parquet files")
+    comp.add_argument("symbols", nargs="*")
+
+    sub.add_parser("import-xlsx", help="Seed the store from data/prices.xlsx")
+    sub.add_parser("export-xlsx", help="Write the store back out to data/prices.xlsx")
+
+    args = parser.parse_args()
+
+    if args.command == "ingest-csv":
+        result = ingest_csv(unquote(args.symbol), unquote(args.csv_path), after=unquote(args.after))
+        if args.export_xlsx and result["appended"]:
+            result["exported_rows"] = export_xlsx()
+        print(json.dumps(result))
+    elif args.command == "tail":
+        frame = read_window(unquote(args.symbol), args.rows)
+        print(frame.iloc[::-1].to_json(orient="records"))
+    elif args.command == "window":
+        print(json.dumps(price_window(unquote(args.symbol), lookback=max(args.rows, 1))))
+    elif args.command == "index":
+        index = rebuild_index()
+        print(f"[ok] Indexed {len(index)} symbols in {STORE_DIR / INDEX_NAME}")
+    elif args.command == "compact":
+        for symbol in args.symbols or list_symbols():
+            rows = compact(unquote(symbol))
+            if rows is not None:
+                print(f"[ok] {symbol}: {rows} rows")
+    elif args.command == "import-xlsx":
+        counts = import_xlsx()
+        for symbol, rows in counts.items():
+            print(f"[ok] {symbol}: {rows} rows")
+        if not counts:
+            print("[warn] No rows found in prices.xlsx")
+    elif args.command == "export-xlsx":
+        rows = export_xlsx()
+        print(f"[ok] Wrote {rows} rows to {PRICES_XLSX_PATH}")
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
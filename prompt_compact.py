@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Prompt Compact - compact encodings of the Analyzer's OHLCV window for the Gemini prompt
+
+Modes (most to least detailed):
+    csv      full-precision rows (legacy "Build prompt" format)
+    rounded  prices rounded to 4 significant digits, volume in K/M
+    delta    first bar absolute, then day offsets and changes vs the previous close
+    weekly   bars resampled to weeks (for long lookbacks)
+    summary  window statistics plus the last N bars (rounded)
+    auto     the most detailed mode whose estimated token count fits --budget
+
+Usage:
+    python prompt_compact.py AAPL.US --lookback 60
+    python prompt_compact.py AAPL.US --lookback 250 --mode auto --budget 800
+    python prompt_compact.py AAPL.US --mode summary --last 10 --indicators
+"""
+
+import argparse
+import json
+import math
+from urllib.parse import unquote
+
+import pandas as pd
+
+import indicators
+import price_store
+
+MODES = ["csv", "rounded", "delta", "weekly", "summary"]
+DEFAULT_BUDGET = 1200
+DEFAULT_LAST_BARS = 10
+# Digit-heavy text tokenizes at roughly 3 characters per token
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _num(value, sig=4):
+    # pd.isna also covers None, pd.NA and NaN numpy scalars that are not Python floats
+    if pd.isna(value):
+        return ""
+    value = float(value)
+    if value == 0:
+        return "0"
+    digits = max(sig - int(math.floor(math.log10(abs(value)))) - 1, 0)
+    return f"{value:.{digits}f}"
+
+
+def _volume(value):
+    # pd.isna also covers None, pd.NA and NaN numpy scalars that are not Python floats
+    if pd.isna(value):
+        return ""
+    value = float(value)
+    for unit, size in (("B", 1e9), ("M", 1e6), ("K", 1e3)):
+        if abs(value) >= size:
+            return f"{value / size:.1f}{unit}"
+    return f"{value:.0f}"
+
+
+def encode_csv(frame):
+    header = "date,open,high,low,close,volume"
+    lines = [",".join(str(r[c]) for c in price_store.PRICE_COLUMNS) for r in frame.to_dict("records")]
+    return header, "\n".join(lines)
+
+
+def encode_rounded(frame):
+    header = "date,open,high,low,close,volume (prices 4 significant digits, volume K/M/B)"
+    lines = [
+        ",".join([r["date"], _num(r["open"]), _num(r["high"]), _num(r["low"]), _num(r["close"]), _volume(r["volume"])])
+        for r in frame.to_dict("records")
+    ]
+    return header, "\n".join(lines)
+
+
+def encode_delta(frame):
+    header = (
+        "first row: date,open,high,low,close,volume; following rows: +days since previous row,"
+        "open,high,low,close as change vs previous close, volume K/M/B"
+    )
+    records = frame.to_dict("records")
+    if not records:
+        return header, ""
+    first = records[0]
+    lines = [
+        ",".join([first["date"], _num(first["open"]), _num(first["high"]), _num(first["low"]), _num(first["close"]), _volume(first["volume"])])
+    ]
+    prev_date = pd.Timestamp(first["date"])
+    prev_close = float(first["close"])
+    # Same absolute precision as the rounded first close (NaN is truthy, so check it first)
+    decimals = max(3 - int(math.floor(math.log10(abs(prev_close)))), 0) if pd.notna(prev_close) and prev_close else 2
+    for r in records[1:]:
+        day = pd.Timestamp(r["date"])
+        diffs = [
+            f"{float(r[c]) - prev_close:.{decimals}f}" if pd.notna(r[c]) and pd.notna(prev_close) else ""
+            for c in ("open", "high", "low", "close")
+        ]
+        lines.append(",".join([f"+{(day - prev_date).days}"] + diffs + [_volume(r["volume"])]))
+        # A missing close keeps the last known one as the base for the next row
+        prev_date = day
+        if pd.notna(r["close"]):
+            prev_close = float(r["close"])
+    return header, "\n".join(lines)
+
+
+def summary_stats(frame):
+    close = frame["close"].astype(float)
+    returns = close.pct_change().dropna()
+    return {
+        "period": f"{frame['date'].iloc[0]}..{frame['date'].iloc[-1]}",
+        "bars": len(frame),
+        "first_close": _num(close.iloc[0]),
+        "last_close": _num(close.iloc[-1]),
+        "return_pct": _num((close.iloc[-1] / close.iloc[0] - 1) * 100, 3),
+        "high": _num(frame["high"].max()),
+        "low": _num(frame["low"].min()),
+        "avg_volume": _volume(frame["volume"].mean()),
+        "daily_vol_pct": _num(returns.std() * 100, 3) if len(returns) > 1 else "",
+    }
+
+
+def encode_summary(frame, last=DEFAULT_LAST_BARS):
+    stats = summary_stats(frame)
+    _, bars = encode_rounded(frame.tail(last))
+    header = f"summary + last {min(last, len(frame))} bars: date,open,high,low,close,volume"
+    text = "summary: " + ", ".join(f"{k}={v}" for k, v in stats.items()) + "\n" + bars
+    return header, text
+
+
+def to_weekly(frame):
+    weekly = (
+        frame.assign(date=pd.to_datetime(frame["date"]))
+        .set_index("date")
+        .resample("W-FRI")
+        .agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+        .dropna(subset=["close"])
+        .reset_index()
+    )
+    weekly["date"] = weekly["date"].dt.strftime("%Y-%m-%d")
+    return weekly
+
+
+def encode_weekly(frame):
+    _, text = encode_rounded(to_weekly(frame))
+    return "weekly bars (week ending): date,open,high,low,close,volume", text
+
+
+def encode(frame, mode, last=DEFAULT_LAST_BARS):
+    if mode == "csv":
+        return encode_csv(frame)
+    if mode == "rounded":
+        return encode_rounded(frame)
+    if mode == "delta":
+        return encode_delta(frame)
+    if mode == "summary":
+        return encode_summary(frame, last=last)
+    if mode == "weekly":
+        return encode_weekly(frame)
+    raise ValueError(f"Unknown mode: {mode}")
+
+
+def compact_window(frame, mode="auto", budget=DEFAULT_BUDGET, last=DEFAULT_LAST_BARS):
+    """
+    Encode an OHLCV window (sorted oldest first). In auto mode the candidates are tried from
+    most to least detailed and the first one under the token budget wins; if none fits, the
+    smallest encoding is returned.
+    """
+    if frame is None or frame.empty:
+        return {"mode": mode, "header": "", "text": "", "est_tokens": 0, "rows": 0}
+
+    if mode != "auto":
+        header, text = encode(frame, mode, last=last)
+        return {"mode": mode, "header": header, "text": text, "est_tokens": estimate_tokens(header + text), "rows": len(frame)}
+
+    candidates = []
+    for candidate in MODES + ["summary-short"]:
+        if candidate == "summary-short":
+            header, text = encode_summary(frame, last=min(5, last))
+        else:
+            header, text = encode(frame, candidate, last=last)
+        tokens = estimate_tokens(header + text)
+        candidates.append((tokens, candidate, header, text))
+        if tokens <= budget:
+            break
+    tokens, chosen, header, text = min(candidates) if candidates[-1][0] > budget else candidates[-1]
+    return {"mode": chosen, "header": header, "text": text, "est_tokens": tokens, "rows": len(frame)}
+
+
+def prepare(symbol, lookback=60, mode="auto", budget=DEFAULT_BUDGET, last=DEFAULT_LAST_BARS, with_indicators=False):
+    """Read the window from the price store and encode it (optionally with indicator values)."""
+    history = price_store.read_window(symbol, max(lookback, 1) + (indicators.WARMUP_ROWS if with_indicators else 0))
+    window = history.tail(max(lookback, 1))
+    result = {"symbol": price_store.normalize_symbol(symbol), "lookback": lookback}
+    result["as_of"] = str(window["date"].iloc[-1]) if not window.empty else ""
+    result["window"] = compact_window(window, mode=mode, budget=budget, last=last)
+    if with_indicators:
+        result["indicators"] = indicators.latest_indicators(history)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Encode a symbol's OHLCV window compactly for the Gemini prompt",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("symbol")
+    parser.add_argument("--lookback", type=int, default=60, help="Window size in rows (default: 60)")
+    parser.add_argument("--mode", default="auto", choices=["auto"] + MODES, help="Encoding (default: auto)")
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=DEFAULT_BUDGET,
+        help=f"Token budget for auto mode (default: {DEFAULT_BUDGET})",
+    )
+    parser.add_argument("--last", type=int, default=DEFAULT_LAST_BARS, help="Bars kept by summary mode")
+    parser.add_argument("--indicators", action="store_true", help="Include indicators.py values")
+    args = parser.parse_args()
+
+    result = prepare(
+        unquote(args.symbol),
+        lookback=args.lookback,
+        mode=unquote(args.mode),
+        budget=args.budget,
+        last=args.last,
+        with_indicators=args.indicators,
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Rate Limit - shared outbound-call scheduler (per-host token buckets, backoff, circuit breaker)
+
+Every outbound call to Stooq, Yahoo and Gemini goes through `request()`:
+- a token bucket per host limits the request rate; the rate adapts (additive increase on
+  success up to max_rate, halved on 429 down to min_rate), so batch runs settle at the
+  highest rate a provider accepts
+- 429 and 5xx responses and connection errors are retried with exponential backoff and
+  full jitter; a Retry-After header (seconds or HTTP date) is honoured as the minimum wait
+  and blocks the whole host, not only the failing call. Waits never exceed BACKOFF_CAP: a
+  longer Retry-After blocks the host for BACKOFF_CAP and returns the response at once
+- after BREAKER_THRESHOLD consecutive failures the host's circuit opens for
+  BREAKER_COOLDOWN seconds and calls fail fast (CircuitOpenError); the first call after
+  the cooldown is a trial that closes it again on success
+
+Bucket state lives in data/ratelimit/<host>.json under a lockfile, so the separate
+processes n8n starts (Execute Command nodes) share one budget per host. Workflows use the
+CLI: `acquire` before a native node (e.g. Gemini) and `report` with the outcome; the
+Error Handler reports failures through error_log.py.
+
+Limits per host: DEFAULT_LIMITS, overridden with RATE_LIMITS="host=rate:burst:max_rate,..."
+(requests per second; hosts not listed are not throttled but still back off).
+
+Usage:
+    python rate_limit.py status
+    python rate_limit.py acquire generativelanguage.googleapis.com
+    python rate_limit.py report generativelanguage.googleapis.com --status 429 --retry-after 30
+    python rate_limit.py reset stooq.com
+"""
+
+import argparse
+import email.utils
+import json
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+import requests
+
+import http_client
+
+BASE_DIR = Path(__file__).resolve().parent
+STATE_DIR = BASE_DIR / "data" / "ratelimit"
+
+DEFAULT_LIMITS = {
+    "stooq.com": {"rate": 2.0, "burst": 4, "max_rate": 8.0},
+    "query1.finance.yahoo.com": {"rate": 2.0, "burst": 4, "max_rate": 10.0},
+    "query2.finance.yahoo.com": {"rate": 2.0, "burst": 4, "max_rate": 10.0},
+    "generativelanguage.googleapis.com": {"rate": 0.5, "burst": 2, "max_rate": 5.0},
+}
+MIN_RATE_SHARE = 0.05
+# Each success adds this share of max_rate back (additive increase)
+INCREASE_SHARE = 0.02
+MAX_ATTEMPTS = int(os.getenv("RATE_LIMIT_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("RATE_LIMIT_BACKOFF_CAP", "60"))
+BREAKER_THRESHOLD = int(os.getenv("RATE_LIMIT_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("RATE_LIMIT_BREAKER_COOLDOWN", "60"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LOCK_STALE = 5
+LOCK_TIMEOUT = 10
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a host whose circuit is open."""
+
+
+def host_of(url):
+    """Bucket key for a URL (host, plus the port when it is not the default)."""
+    parts = urlsplit(url if "//" in url else f"//{url}")
+    return (parts.netloc or parts.path).lower()
+
+
+def parse_limits(spec):
+    """'host=rate:burst:max_rate,...' -> {host: {rate, burst, max_rate}}."""
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        host, values = item.split("=", 1)
+        numbers = [float(v) for v in values.split(":") if v.strip()]
+        if not numbers:
+            continue
+        rate = numbers[0]
+        burst = numbers[1] if len(numbers) > 1 else max(rate, 1)
+        limits[host.strip().lower()] = {"rate": rate, "burst": burst, "max_rate": numbers[2] if len(numbers) > 2 else rate}
+    return limits
+
+
+LIMITS = dict(DEFAULT_LIMITS, **parse_limits(os.getenv("RATE_LIMITS", "")))
+
+
+def limits_for(host):
+    return LIMITS.get(host)
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date); None when absent."""
+    if value is None or str(value).strip() == "":
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - (now or time.time()), 0.0)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _state_path(host, state_dir=STATE_DIR):
+    safe = "".join(c if c.isalnum() or c in ".-" else "_" for c in host)
+    return Path(state_dir) / f"{safe}.json"
+
+
+def _thread_lock(host):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(host, threading.Lock())
+
+
+class _HostState:
+    """Read-modify-write of one host's state file under a lockfile (and a per-process lock)."""
+
+    def __init__(self, host, state_dir=STATE_DIR):
+        self.host = host
+        self.path = _state_path(host, state_dir)
+        self.lock_path = self.path.with_suffix(".lock")
+        self.thread_lock = _thread_lock(host)
+        self.state = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    stale = time.time() - self.lock_path.stat().st_mtime > LOCK_STALE
+                except FileNotFoundError:
+                    continue
+                if stale or time.monotonic() >= deadline:
+                    # The holder died between open and unlink; the state it guarded is still valid
+                    try:
+                        self.lock_path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    continue
+                time.sleep(0.005)
+        try:
+            self.state = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.state = {}
+        return self.state
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp_path.write_text(json.dumps(self.state), encoding="utf-8")
+                os.replace(tmp_path, self.path)
+        finally:
+            try:
+                self.lock_path.unlink()
+            except FileNotFoundError:
+                pass
+            self.thread_lock.release()
+        return False
+
+
+def _defaults(state, limits, now):
+    if limits:
+        state.setdefault("rate", limits["rate"])
+        state.setdefault("tokens", float(limits["burst"]))
+    state.setdefault("updated", now)
+    state.setdefault("failures", 0)
+    state.setdefault("blocked_until", 0.0)
+    state.setdefault("circuit", "closed")
+    state.setdefault("open_until", 0.0)
+
+
+def reserve(host, now=None, state_dir=STATE_DIR):
+    """
+    Take one token for `host` and return the seconds to wait before sending (0 when the
+    bucket has a token and nothing blocks the host). Raises CircuitOpenError when open.
+    """
+    limits = limits_for(host)
+    with _HostState(host, state_dir) as state:
+        now = now or time.time()
+        _defaults(state, limits, now)
+        if state["circuit"] == "open":
+            if now < state["open_until"]:
+                raise CircuitOpenError(f"circuit open for {host} until {time.strftime('%H:%M:%S', time.localtime(state['open_until']))}")
+            # Cooldown over: let this one call through as the trial
+            state["circuit"] = "half_open"
+        elif state["circuit"] == "half_open" and now < state["open_until"] + BREAKER_COOLDOWN:
+            raise CircuitOpenError(f"circuit half-open for {host}; a trial call is in flight")
+        wait = max(state["blocked_until"] - now, 0.0)
+        if limits:
+            rate = max(state["rate"], limits["max_rate"] * MIN_RATE_SHARE)
+            state["tokens"] = min(float(limits["burst"]), state["tokens"] + (now - state["updated"]) * rate)
+            state["tokens"] -= 1
+            # A negative balance is a reservation: wait until it has been refilled
+            if state["tokens"] < 0:
+                wait = max(wait, -state["tokens"] / rate)
+        state["updated"] = now
+        return wait
+
+
+def acquire(host, state_dir=STATE_DIR):
+    """Block until a call to `host` may be sent. Returns the seconds waited."""
+    wait = reserve(host, state_dir=state_dir)
+    if wait > 0:
+        time.sleep(wait)
+    return wait
+
+
+def record(host, status=None, retry_after=None, error=False, now=None, state_dir=STATE_DIR):
+    """
+    Feed an outcome back: status code (None with error=True for connection errors/timeouts)
+    and the Retry-After seconds. Adapts the rate and drives the circuit breaker.
+    Returns the host state.
+    """
+    limits = limits_for(host)
+    with _HostState(host, state_dir) as state:
+        now = now or time.time()
+        _defaults(state, limits, now)
+        throttled = status == 429
+        failed = error or throttled or (status is not None and status >= 500)
+        if not failed:
+            state["failures"] = 0
+            state["circuit"] = "closed"
+            if limits:
+                state["rate"] = min(limits["max_rate"], state["rate"] + limits["max_rate"] * INCREASE_SHARE)
+            return dict(state)
+
+        state["failures"] += 1
+        if throttled and limits:
+            state["rate"] = max(limits["max_rate"] * MIN_RATE_SHARE, state["rate"] / 2)
+        if retry_after is not None:
+            state["blocked_until"] = max(state["blocked_until"], now + min(retry_after, BACKOFF_CAP))
+        if state["circuit"] == "half_open" or state["failures"] >= BREAKER_THRESHOLD:
+            state["circuit"] = "open"
+            state["open_until"] = now + BREAKER_COOLDOWN
+        return dict(state)
+
+
+def request(session, method, url, max_attempts=MAX_ATTEMPTS, **kwargs):
+    """
+    Send through the host's bucket, retrying 429/5xx and connection errors with backoff.
+    Returns the last response (callers still call raise_for_status) or re-raises the last
+    connection error. Raises CircuitOpenError without sending while the circuit is open.
+    """
+    host = host_of(url)
+    sender = session or http_client.get_session()
+    for attempt in range(max(max_attempts, 1)):
+        acquire(host)
+        last_try = attempt == max_attempts - 1
+        try:
+            response = sender.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            record(host, error=True)
+            if last_try:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        if response.status_code not in RETRY_STATUSES:
+            record(host, response.status_code)
+            return response
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        record(host, response.status_code, retry_after)
+        if last_try or (retry_after or 0.0) > BACKOFF_CAP:
+            # Not worth holding a worker (or an n8n node) for; the caller sees the 429/503
+            return response
+        time.sleep(max(retry_after or 0.0, backoff_delay(attempt)))
+    return response
+
+
+def status(state_dir=STATE_DIR):
+    """{host: state} for every host that has been called."""
+    out = {}
+    for path in sorted(Path(state_dir).glob("*.json")):
+        try:
+            out[path.stem] = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            continue
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Shared per-host rate limiter, backoff and circuit breaker for outbound calls",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Print every host's bucket and circuit state")
+
+    acquire_parser = sub.add_parser("acquire", help="Wait for a token (exit 1 when the circuit is open)")
+    acquire_parser.add_argument("host", help="Host or URL")
+
+    report_parser = sub.add_parser("report", help="Record the outcome of a call made outside Python")
+    report_parser.add_argument("host", help="Host or URL")
+    report_parser.add_argument("--status", type=int, default=None, help="HTTP status (omit for a connection error)")
+    report_parser.add_argument("--retry-after", default="", help="Retry-After header value")
+
+    reset_parser = sub.add_parser("reset", help="Forget a host's state (or every host)")
+    reset_parser.add_argument("host", nargs="?", default="")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(status(), indent=2))
+        return
+    if args.command == "reset":
+        paths = [_state_path(host_of(unquote(args.host)))] if args.host else list(STATE_DIR.glob("*.json"))
+        for path in paths:
+            if path.exists():
+                path.unlink()
+        print(f"[ok] Reset {len(paths)} host(s)")
+        return
+
+    host = host_of(unquote(args.host))
+    if args.command == "acquire":
+        try:
+            waited = acquire(host)
+        except CircuitOpenError as exc:
+            print(json.dumps({"host": host, "error": str(exc)}))
+            sys.exit(1)
+        print(json.dumps({"host": host, "waited_ms": round(waited * 1000, 1)}))
+    elif args.command == "report":
+        state = record(
+            host,
+            status=args.status,
+            retry_after=parse_retry_after(unquote(args.retry_after)),
+            error=args.status is None,
+        )
+        print(json.dumps({"host": host, **state}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,6 @@
-import pandas as pd
-import os
+import signal_store
 
-file_path = 'data/signals.xlsx'
-
-# Create a DataFrame with the required columns
-df = pd.DataFrame(columns=['symbol', 'key', 'type', 'created_at', 'date', 'threshold', 'signal', 'reasoning'])
-
-# Write to Excel
-df.to_excel(file_path, sheet_name='signals', index=False)
-print(f"Reset {file_path} with headers only.")
+# Clear the keyed store (and every Analyzer shard's) and rewrite signals.xlsx with the workflow's columns only
+removed = sum(signal_store.reset(path) for path in signal_store.db_paths())
+signal_store.export_xlsx()
+print(f"Reset {signal_store.DB_PATH} ({removed} rows removed) and {signal_store.SIGNALS_XLSX_PATH} with headers only.")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Scheduler - run the batch collection after each market's close, on trading days only
+
+The market comes from the symbol suffix (.US -> US, .KS/.KQ -> KR). A market is due once
+its latest session has closed (plus COLLECT_DELAY_MINUTES for the data source to publish
+the bar) and that session has not been collected yet. Weekends and the holidays listed in
+data/market_calendar.csv are skipped, so no fetch is made on a day without a new bar.
+Requests to one data source are staggered (STOOQ_STAGGER_MS between request starts).
+
+The n8n Schedule Trigger calls `scheduler.py run` every SCHEDULE_INTERVAL_MINUTES; a run
+with nothing due exits without touching the network. Collected sessions are recorded in
+data/schedule_state.json; a session whose batch had failures is retried on the next runs
+(up to MAX_ATTEMPTS).
+
+Usage:
+    python scheduler.py run
+    python scheduler.py run --dry-run --now 2026-10-16T21:00:00+00:00
+    python scheduler.py run --market KR --force
+    python scheduler.py next
+    python scheduler.py check 2026-12-25 --market US
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from urllib.parse import unquote
+from zoneinfo import ZoneInfo
+
+import collect_batch
+import price_store
+
+BASE_DIR = Path(__file__).resolve().parent
+CALENDAR_PATH = BASE_DIR / "data" / "market_calendar.csv"
+STATE_PATH = BASE_DIR / "data" / "schedule_state.json"
+
+MARKETS = {
+    "US": {"suffixes": ("US",), "tz": "America/New_York", "close": "16:00", "source": "stooq"},
+    "KR": {"suffixes": ("KS", "KQ"), "tz": "Asia/Seoul", "close": "15:30", "source": "stooq"},
+}
+COLLECT_DELAY_MINUTES = int(os.getenv("COLLECT_DELAY_MINUTES", "45"))
+SOURCE_STAGGER_MS = {"stooq": int(os.getenv("STOOQ_STAGGER_MS", "250"))}
+MAX_ATTEMPTS = int(os.getenv("SCHEDULE_MAX_ATTEMPTS", "3"))
+# How far back to look for the previous session (covers long holiday runs such as 설날 + weekend)
+MAX_LOOKBACK_DAYS = 14
+
+
+def market_for(symbol):
+    """Market key for a symbol's suffix ('' when the suffix is not scheduled)."""
+    suffix = price_store.normalize_symbol(symbol).rpartition(".")[2]
+    return next((name for name, market in MARKETS.items() if suffix in market["suffixes"]), "")
+
+
+def load_calendar(path=CALENDAR_PATH):
+    """{market: {YYYY-MM-DD: early close 'HH:MM' or '' when closed}} from the calendar table."""
+    calendar = {}
+    path = Path(path)
+    if not path.exists():
+        return calendar
+    with open(path, encoding="utf-8", newline="") as fh:
+        rows = csv.DictReader(line for line in fh if line.strip() and not line.startswith("#"))
+        for row in rows:
+            market = (row.get("market") or "").strip().upper()
+            day = (row.get("date") or "").strip()[:10]
+            if market and day:
+                calendar.setdefault(market, {})[day] = (row.get("close") or "").strip()
+    return calendar
+
+
+def _parse_hhmm(value):
+    hours, minutes = value.split(":", 1)
+    return time(int(hours), int(minutes))
+
+
+def session_close(market, day, calendar):
+    """Aware close time of `market` on `day`, or None when the market is closed."""
+    if day.weekday() >= 5:
+        return None
+    spec = MARKETS[market]
+    holiday = calendar.get(market, {}).get(day.isoformat())
+    if holiday == "":
+        return None
+    close = _parse_hhmm(holiday or spec["close"])
+    return datetime.combine(day, close, tzinfo=ZoneInfo(spec["tz"]))
+
+
+def latest_session(market, now, calendar, delay=COLLECT_DELAY_MINUTES):
+    """(session date, ready time) of the latest session whose bar should be out by `now`."""
+    local = now.astimezone(ZoneInfo(MARKETS[market]["tz"]))
+    for back in range(MAX_LOOKBACK_DAYS + 1):
+        day = local.date() - timedelta(days=back)
+        close = session_close(market, day, calendar)
+        if close is not None and close + timedelta(minutes=delay) <= now:
+            return day, close + timedelta(minutes=delay)
+    return None, None
+
+
+def next_session(market, now, calendar, delay=COLLECT_DELAY_MINUTES):
+    """(session date, ready time) of the next session that is not ready yet."""
+    local = now.astimezone(ZoneInfo(MARKETS[market]["tz"]))
+    for ahead in range(MAX_LOOKBACK_DAYS + 1):
+        day = local.date() + timedelta(days=ahead)
+        close = session_close(market, day, calendar)
+        if close is not None and close + timedelta(minutes=delay) > now:
+            return day, close + timedelta(minutes=delay)
+    return None, None
+
+
+def calendar_warnings(calendar, markets, today):
+    """Markets whose calendar table has no holidays for this year (probably not filled in yet)."""
+    year = str(today.year)
+    return [
+        f"No {year} holidays for {market} in {CALENDAR_PATH.name}; only weekends are skipped"
+        for market in markets
+        if not any(day.startswith(year) for day in calendar.get(market, {}))
+    ]
+
+
+def load_state(path=STATE_PATH):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(state, indent=1), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def group_entries(entries):
+    """{market: [entries]} for config entries; unscheduled suffixes are reported separately."""
+    groups, unscheduled = {}, []
+    for entry in entries:
+        market = market_for(entry["symbol"])
+        if market:
+            groups.setdefault(market, []).append(entry)
+        else:
+            unscheduled.append(entry["symbol"])
+    return groups, unscheduled
+
+
+def due_markets(now, groups, state, calendar, force=False):
+    """[{market, session, entries}] for markets with a finished, not yet collected session."""
+    due = []
+    for market, entries in groups.items():
+        session, _ = latest_session(market, now, calendar)
+        if session is None:
+            continue
+        done = state.get(market) or {}
+        if not force and done.get("session") == session.isoformat():
+            if done.get("ok") or done.get("attempts", 0) >= MAX_ATTEMPTS:
+                continue
+        due.append({"market": market, "session": session.isoformat(), "entries": entries})
+    return due
+
+
+def run(now=None, markets=None, dry_run=False, force=False, workers=collect_batch.DEFAULT_WORKERS,
+        config_path=collect_batch.CONFIG_XLSX_PATH, state_path=STATE_PATH, calendar_path=CALENDAR_PATH):
+    """Collect every due market once. Returns a JSON-serializable summary."""
+    now = now or datetime.now(timezone.utc)
+    calendar = load_calendar(calendar_path)
+    groups, unscheduled = group_entries(collect_batch.read_config(config_path))
+    if markets:
+        groups = {m: e for m, e in groups.items() if m in markets}
+    for warning in calendar_warnings(calendar, groups, now.date()):
+        print(f"[warn] {warning}", file=sys.stderr)
+
+    state = load_state(state_path)
+    due = due_markets(now, groups, state, calendar, force=force)
+    summary = {"now": now.isoformat(), "due": [], "unscheduled": unscheduled}
+    for item in due:
+        market = item["market"]
+        stagger = SOURCE_STAGGER_MS.get(MARKETS[market]["source"], 0) / 1000
+        report = {"market": market, "session": item["session"], "symbols": len(item["entries"])}
+        if not dry_run:
+            result = collect_batch.collect_batch(item["entries"], workers=workers, stagger=stagger)
+            previous = state.get(market) or {}
+            attempts = previous.get("attempts", 0) + 1 if previous.get("session") == item["session"] else 1
+            state[market] = {
+                "session": item["session"],
+                "ok": not result["failed"],
+                "attempts": attempts,
+                "collected_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            save_state(state, state_path)
+            report.update({k: result[k] for k in ("ok", "failed", "appended", "total_seconds")})
+        summary["due"].append(report)
+    summary["next"] = {}
+    for market in groups:
+        _, ready = next_session(market, now, calendar)
+        summary["next"][market] = ready.isoformat() if ready else None
+    return summary
+
+
+def _parse_now(value):
+    if not value:
+        return None
+    now = datetime.fromisoformat(unquote(value))
+    return now if now.tzinfo else now.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the batch collector after each market's close on trading days",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Collect every market whose latest session is not collected yet")
+    run_parser.add_argument("--now", default="", help="Pretend it is this ISO time (default: now)")
+    run_parser.add_argument("--market", nargs="*", choices=sorted(MARKETS), help="Only these markets")
+    run_parser.add_argument("--force", action="store_true", help="Collect even if the session was collected")
+    run_parser.add_argument("--dry-run", action="store_true", help="Only report what is due")
+    run_parser.add_argument("--workers", type=int, default=collect_batch.DEFAULT_WORKERS)
+    run_parser.add_argument("--config", default=str(collect_batch.CONFIG_XLSX_PATH), help="Path to config.xlsx")
+
+    next_parser = sub.add_parser("next", help="Latest and next ready time per market")
+    next_parser.add_argument("--now", default="")
+
+    check_parser = sub.add_parser("check", help="Is DATE a trading day?")
+    check_parser.add_argument("date", help="YYYY-MM-DD")
+    check_parser.add_argument("--market", default="US", choices=sorted(MARKETS))
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        summary = run(
+            now=_parse_now(args.now),
+            markets=args.market,
+            dry_run=args.dry_run,
+            force=args.force,
+            workers=args.workers,
+            config_path=unquote(args.config),
+        )
+        print(json.dumps(summary, ensure_ascii=False))
+        sys.exit(1 if any(item.get("failed") for item in summary["due"]) else 0)
+    elif args.command == "next":
+        now = _parse_now(args.now) or datetime.now(timezone.utc)
+        calendar = load_calendar()
+        out = {}
+        for market in MARKETS:
+            latest, _ = latest_session(market, now, calendar)
+            upcoming, ready = next_session(market, now, calendar)
+            out[market] = {
+                "latest_session": latest.isoformat() if latest else None,
+                "next_session": upcoming.isoformat() if upcoming else None,
+                "next_run": ready.isoformat() if ready else None,
+            }
+        print(json.dumps(out, indent=2))
+    elif args.command == "check":
+        day = date.fromisoformat(unquote(args.date))
+        calendar = load_calendar()
+        close = session_close(args.market, day, calendar)
+        print(json.dumps({
+            "market": args.market,
+            "date": day.isoformat(),
+            "trading_day": close is not None,
+            "close": close.isoformat() if close else None,
+            "listed": day.isoformat() in calendar.get(args.market, {}),
+        }))
+
+
+if __name__ == "__main__":
+    main()
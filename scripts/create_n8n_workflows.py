@@ -1,18 +1,131 @@
+"""
+Create or update the n8n workflows through the n8n public API (N8N_API_KEY from .env)
+
+The workflow list is fetched once (following nextCursor pages) and every generated
+workflow is compared with the deployed one by a hash of its name, nodes, connections and
+settings; unchanged workflows are not PUT again, so n8n keeps no new versions for them.
+The Error Handler goes first (the others reference its id), then the changed workflows
+are deployed in parallel (DEPLOY_WORKERS, default 4).
+
+--shards N (ANALYZER_SHARDS) also deploys N Analyzer shards, "Analyzer (...) shard <i>" on
+webhook/analyze-<i>, each writing its own data/shards/<i>/signals.db; dispatcher.py spreads
+symbols over them by consistent hashing. The unsharded Analyzer stays on webhook/analyze.
+Shards do not export signals.xlsx per row; with EXPORT_SIGNALS_XLSX=1 a "Signals export"
+workflow refreshes it on a schedule instead.
+
+Usage:
+    python scripts/create_n8n_workflows.py
+    python scripts/create_n8n_workflows.py --dry-run
+    python scripts/create_n8n_workflows.py --force --workers 8
+    python scripts/create_n8n_workflows.py --shards 4
+"""
+
+import argparse
+import difflib
+import hashlib
 import json
-import urllib.request
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import quote
 
+# The shared HTTP client lives in the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import http_client  # noqa: E402
 
-API_BASE = "http://localhost:5678/api/v1"
+# Point at mock_services.py (or another n8n) with N8N_BASE_URL
+N8N_BASE_URL = os.getenv("N8N_BASE_URL", "http://localhost:5678").rstrip("/")
+API_BASE = f"{N8N_BASE_URL}/api/v1"
 WORKFLOW_A_NAME = "Collector (local excel)"
 WORKFLOW_B_NAME = "Error Handler (local excel)"
 WORKFLOW_C_NAME = "Analyzer (local excel, gemini)"
+WORKFLOW_D_NAME = "Collector (batch, config.xlsx)"
+WORKFLOW_E_NAME = "Analysis jobs (status)"
+WORKFLOW_F_NAME = "Signals export (shards)"
 BASE_DIR = Path(__file__).resolve().parents[1]
 CONFIG_PATH = str((BASE_DIR / "data" / "config.xlsx").resolve())
-PRICES_PATH = str((BASE_DIR / "data" / "prices.xlsx").resolve())
 STATE_PATH = str((BASE_DIR / "data" / "state.xlsx").resolve())
-SIGNALS_PATH = str((BASE_DIR / "data" / "signals.xlsx").resolve())
-LOG_PATH = str((BASE_DIR / "logs" / "error.log").resolve())
+# JSON payloads too large for a command line (cmd.exe stops at 8191 characters) are written
+# here by the workflow and read (then removed) by the script; see payload_file_nodes
+PAYLOAD_DIR = (BASE_DIR / "data" / "payloads").resolve().as_posix()
+PYTHON_BIN = os.getenv("PYTHON_BIN", "python")
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+# The Analyzer reads the price store directly; set EXPORT_PRICES_XLSX=1 to keep prices.xlsx for Excel users
+EXPORT_PRICES_XLSX = os.getenv("EXPORT_PRICES_XLSX", "0") == "1"
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
+# signals.xlsx is an export of data/signals.db; set 0 for large batches and run `signal_store.py export-xlsx` once
+EXPORT_SIGNALS_XLSX = os.getenv("EXPORT_SIGNALS_XLSX", "1") == "1"
+# Schedule Trigger interval for `scheduler.py run` (a run with no market due makes no requests)
+SCHEDULE_INTERVAL_MINUTES = int(os.getenv("SCHEDULE_INTERVAL_MINUTES", "15"))
+# Host whose rate_limit.py bucket gates "Message a model" (match the Gemini credential Host)
+GEMINI_RATE_HOST = os.getenv("GEMINI_RATE_HOST", "generativelanguage.googleapis.com")
+DEPLOY_WORKERS = int(os.getenv("DEPLOY_WORKERS", "4"))
+# Analyzer shards deployed next to the unsharded Analyzer (0 = none); see dispatcher.py
+ANALYZER_SHARDS = int(os.getenv("ANALYZER_SHARDS", "0"))
+# How often the sharded setup refreshes signals.xlsx (shards skip the per-row export)
+SIGNALS_EXPORT_INTERVAL_MINUTES = int(os.getenv("SIGNALS_EXPORT_INTERVAL_MINUTES", "5"))
+# n8n caps a list page at 250 workflows
+LIST_PAGE_LIMIT = 250
+# What a deploy sends; everything else on a workflow is server-side state
+WORKFLOW_FIELDS = ("name", "nodes", "connections", "settings")
+# Default long-poll for GET /webhook/analyze-status (jobs.py caps it at 25s)
+JOB_STATUS_WAIT = int(os.getenv("JOB_STATUS_WAIT", "20"))
+
+
+class literal(str):
+    """A python_command argument passed as-is (subcommands such as "ingest-csv"), never evaluated as JS."""
+
+
+def python_command(script, *args):
+    """
+    Build an Execute Command expression that runs a repo script.
+    Flags (starting with "--") and literal(...) words are passed as-is; anything else is a JS
+    expression whose value is URL-encoded and quoted so user input cannot break out of the
+    shell command (the scripts URL-decode their string arguments).
+    """
+    script_path = (BASE_DIR / script).resolve().as_posix()
+    parts = [f"'{PYTHON_BIN} \"{script_path}\"'"]
+    for arg in args:
+        if isinstance(arg, literal) or arg.startswith("--"):
+            parts.append(f"'{arg}'")
+        else:
+            parts.append(f"'\"' + encodeURIComponent(String({arg})) + '\"'")
+    return "={{ " + " + ' ' + ".join(parts) + " }}"
+
+
+def payload_path(name):
+    """JS expression for this execution's payload file (data/payloads/<execution id>-<name>.json)."""
+    return f"'{PAYLOAD_DIR}/' + $execution.id + '-{name}.json'"
+
+
+def payload_file_nodes(label, name, position, source_key=None):
+    """
+    Move Binary Data + Write Binary File nodes that save the item's JSON (or its `source_key`
+    field) to payload_path(name), so the next Execute Command only passes the file name.
+    Returns the two nodes, "<label> to file" and "Write <label> file".
+    """
+    x, y = position
+    convert = {"mode": "jsonToBinary", "options": {"encoding": "utf8", "mimeType": "application/json"}}
+    if source_key:
+        convert.update({"setAllData": False, "sourceKey": source_key})
+    return [
+        {
+            "parameters": convert,
+            "name": f"{label.capitalize()} to file",
+            "type": "n8n-nodes-base.moveBinaryData",
+            "typeVersion": 1,
+            "position": [x, y],
+        },
+        {
+            "parameters": {"fileName": "={{ " + payload_path(name) + " }}", "dataPropertyName": "data"},
+            "name": f"Write {label} file",
+            "type": "n8n-nodes-base.writeBinaryFile",
+            "typeVersion": 1,
+            "position": [x + 220, y],
+        },
+    ]
 
 
 def load_api_key():
@@ -28,39 +141,88 @@ def load_api_key():
 
 
 def api_request(method, path, api_key, payload=None):
+    # Every REST call of a deploy reuses the shared keep-alive session
     url = f"{API_BASE}{path}"
-    data = None
-    headers = {"X-N8N-API-KEY": api_key}
-    if payload is not None:
-        data = json.dumps(payload).encode("utf-8")
-        headers["Content-Type"] = "application/json"
-    req = urllib.request.Request(url, data=data, headers=headers, method=method)
-    try:
-        with urllib.request.urlopen(req) as resp:
-            body = resp.read().decode("utf-8")
-            return json.loads(body) if body else None
-    except urllib.error.HTTPError as e:
-        detail = e.read().decode("utf-8", errors="ignore")
-        raise RuntimeError(f"HTTP {e.code} {e.reason} for {method} {path}: {detail}") from e
+    resp = http_client.get_session().request(method, url, json=payload, headers={"X-N8N-API-KEY": api_key}, timeout=60)
+    if resp.status_code >= 400:
+        raise RuntimeError(f"HTTP {resp.status_code} {resp.reason} for {method} {path}: {resp.text}")
+    return resp.json() if resp.content else None
 
 
 def list_workflows(api_key):
-    resp = api_request("GET", "/workflows", api_key)
-    return resp.get("data", [])
+    """Every workflow on the instance, following the nextCursor pages."""
+    workflows, cursor = [], None
+    while True:
+        query = f"?limit={LIST_PAGE_LIMIT}" + (f"&cursor={quote(cursor)}" if cursor else "")
+        resp = api_request("GET", f"/workflows{query}", api_key) or {}
+        workflows.extend(resp.get("data", []))
+        cursor = resp.get("nextCursor")
+        if not cursor:
+            return workflows
 
 
-def upsert_workflow(api_key, name, workflow, activate=False):
-    existing = next((w for w in list_workflows(api_key) if w.get("name") == name), None)
-    if existing:
-        workflow["name"] = name
-        updated = api_request("PUT", f"/workflows/{existing['id']}", api_key, workflow)
-        if activate:
-            activate_workflow(api_key, updated["id"])
-        return updated
-    created = api_request("POST", "/workflows", api_key, workflow)
-    if activate:
-        activate_workflow(api_key, created["id"])
-    return created
+def comparable(workflow, like=None):
+    """
+    The deployed fields of `workflow` in a stable order. With `like` (the generated
+    workflow), node and settings keys it does not set are dropped, so ids and defaults
+    n8n adds on save do not count as changes.
+    """
+    like = like or workflow
+    generated = {node["name"]: node for node in like.get("nodes", [])}
+    nodes = []
+    for node in workflow.get("nodes") or []:
+        keys = generated.get(node.get("name"))
+        nodes.append({k: v for k, v in node.items() if keys is None or k in keys})
+    settings = workflow.get("settings") or {}
+    return {
+        "name": workflow.get("name"),
+        "nodes": sorted(nodes, key=lambda node: str(node.get("name"))),
+        "connections": workflow.get("connections") or {},
+        "settings": {k: v for k, v in settings.items() if k in (like.get("settings") or {})},
+    }
+
+
+def workflow_hash(workflow, like=None):
+    canonical = json.dumps(comparable(workflow, like), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def workflow_diff(name, deployed, workflow):
+    """Unified diff of the deployed workflow against the generated one (dry runs)."""
+    def lines(item, like=None):
+        return json.dumps(comparable(item, like), indent=1, sort_keys=True, ensure_ascii=False).splitlines()
+
+    return list(difflib.unified_diff(lines(deployed, workflow), lines(workflow), f"n8n/{name}", f"generated/{name}", n=2, lineterm=""))
+
+
+def deploy_workflow(api_key, name, workflow, deployed=None, activate=False, force=False, dry_run=False):
+    """
+    Create, update or skip one workflow. Returns {name, id, action, hash, diff}; action is
+    created, updated, activated (unchanged but inactive) or unchanged.
+    """
+    workflow = dict(workflow, name=name)
+    digest = workflow_hash(workflow)
+    result = {"name": name, "id": (deployed or {}).get("id"), "hash": digest, "diff": []}
+    if deployed is None:
+        result["action"] = "created"
+    elif force or workflow_hash(deployed, workflow) != digest:
+        result["action"] = "updated"
+    elif activate and not deployed.get("active"):
+        result["action"] = "activated"
+    else:
+        result["action"] = "unchanged"
+    if dry_run:
+        if result["action"] == "updated":
+            result["diff"] = workflow_diff(name, deployed, workflow)
+        return result
+
+    if result["action"] == "created":
+        result["id"] = api_request("POST", "/workflows", api_key, workflow)["id"]
+    elif result["action"] == "updated":
+        api_request("PUT", f"/workflows/{result['id']}", api_key, workflow)
+    if activate and result["action"] != "unchanged":
+        activate_workflow(api_key, result["id"])
+    return result
 
 
 def activate_workflow(api_key, workflow_id):
@@ -68,6 +230,26 @@ def activate_workflow(api_key, workflow_id):
 
 
 def build_error_workflow():
+    # Only the fields error_log.py reads, so the command line stays short
+    log_error_command = python_command(
+        "error_log.py",
+        literal("log"),
+        "--event",
+        "JSON.stringify({ workflow: { id: $json.workflow?.id, name: $json.workflow?.name }, "
+        "execution: { id: $json.execution?.id, mode: $json.execution?.mode, startedAt: $json.execution?.startedAt, "
+        "lastNodeExecuted: $json.execution?.lastNodeExecuted, error: { "
+        "message: String($json.execution?.error?.message || $json.error?.message || '').slice(0, 500), "
+        "description: String($json.execution?.error?.description || '').slice(0, 300), "
+        "httpCode: $json.execution?.error?.httpCode || $json.error?.httpCode, "
+        "node: { name: $json.execution?.error?.node?.name || $json.error?.node?.name || '' } } } })",
+    )
+    fail_job_command = python_command(
+        "jobs.py",
+        literal("fail"),
+        "$json.execution?.id || ''",
+        "--error",
+        "($json.error?.node?.name ? $json.error.node.name + ': ' : '') + ($json.error?.message || 'workflow failed')",
+    )
     return {
         "name": WORKFLOW_B_NAME,
         "nodes": [
@@ -80,62 +262,33 @@ def build_error_workflow():
             },
             {
                 "parameters": {
-                    "keepOnlySet": True,
-                    "values": {
-                        "string": [
-                            {
-                                "name": "log_line",
-                                "value": "={{ '[' + ($json.execution && $json.execution.startedAt ? $json.execution.startedAt : '') + '] ' + ($json.workflow && $json.workflow.name ? $json.workflow.name : '') + ' ' + ($json.error && $json.error.node && $json.error.node.name ? $json.error.node.name : '') + ' ' + ($json.error && $json.error.message ? $json.error.message : '') + \"\\n\" }}",
-                            }
-                        ]
-                    },
-                },
-                "name": "Set log line",
-                "type": "n8n-nodes-base.set",
-                "typeVersion": 2,
-                "position": [520, 300],
-            },
-            {
-                "parameters": {
-                    "mode": "jsonToBinary",
-                    "convertAllData": False,
-                    "sourceKey": "log_line",
-                    "destinationKey": "data",
-                    "options": {
-                        "encoding": "utf8",
-                        "fileName": "error.log",
-                        "mimeType": "text/plain",
-                        "useRawData": True,
-                    },
+                    "command": log_error_command,
+                    "executeOnce": True,
                 },
-                "name": "To binary",
-                "type": "n8n-nodes-base.moveBinaryData",
+                "name": "Log error",
+                "type": "n8n-nodes-base.executeCommand",
                 "typeVersion": 1,
-                "position": [760, 300],
+                "position": [520, 300],
             },
             {
                 "parameters": {
-                    "fileName": LOG_PATH,
-                    "dataPropertyName": "data",
-                    "options": {
-                        "append": True,
-                    },
+                    "command": fail_job_command,
+                    "executeOnce": True,
                 },
-                "name": "Write error log",
-                "type": "n8n-nodes-base.writeBinaryFile",
+                "name": "Fail analysis job",
+                "type": "n8n-nodes-base.executeCommand",
                 "typeVersion": 1,
-                "position": [1000, 300],
+                "position": [520, 480],
             },
         ],
         "connections": {
             "Error Trigger": {
-                "main": [[{"node": "Set log line", "type": "main", "index": 0}]]
-            },
-            "Set log line": {
-                "main": [[{"node": "To binary", "type": "main", "index": 0}]]
-            },
-            "To binary": {
-                "main": [[{"node": "Write error log", "type": "main", "index": 0}]]
+                "main": [
+                    [
+                        {"node": "Log error", "type": "main", "index": 0},
+                        {"node": "Fail analysis job", "type": "main", "index": 0},
+                    ]
+                ]
             },
         },
         "settings": {"timezone": "Asia/Seoul"},
@@ -143,6 +296,20 @@ def build_error_workflow():
 
 
 def build_collector_workflow(error_workflow_id):
+    resolve_command = python_command(
+        "symbol_cache.py",
+        literal("resolve"),
+        "$json.query || $json.company || $json.symbol || 'AAPL'",
+    )
+    fetch_command = python_command(
+        "stooq_fetch.py",
+        "$json.symbol",
+        "--interval",
+        "$json.interval",
+        "--last-date",
+        "$json.last_date",
+        *(["--export-xlsx"] if EXPORT_PRICES_XLSX else []),
+    )
     return {
         "name": WORKFLOW_A_NAME,
         "nodes": [
@@ -182,30 +349,13 @@ def build_collector_workflow(error_workflow_id):
             },
             {
                 "parameters": {
-                    "authentication": "none",
-                    "requestMethod": "GET",
-                    "url": "={{ 'https://query1.finance.yahoo.com/v1/finance/search?q=' + encodeURIComponent($json.query || $json.company || $json.symbol || 'AAPL') + '&quotesCount=3&newsCount=0' }}",
-                    "responseFormat": "json",
-                    "options": {
-                        "ignoreResponseCode": True
-                    },
-                },
-                "name": "Lookup symbol",
-                "type": "n8n-nodes-base.httpRequest",
-                "typeVersion": 2,
-                "position": [620, 120],
-            },
-            {
-                "parameters": {
-                    "mode": "chooseBranch",
-                    "numberInputs": 2,
-                    "chooseBranchMode": "waitForAll",
-                    "output": "empty",
+                    "command": resolve_command,
+                    "executeOnce": True,
                 },
-                "name": "Wait for symbol lookup",
-                "type": "n8n-nodes-base.merge",
-                "typeVersion": 3.2,
-                "position": [840, 150],
+                "name": "Resolve symbol",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [620, 150],
             },
             {
                 "parameters": {
@@ -218,7 +368,7 @@ def build_collector_workflow(error_workflow_id):
                             },
                             {
                                 "name": "symbol",
-                                "value": "={{ (() => { const rawSym = ($node['Set manual config'].json.symbol || '').toString().trim(); const query = ($node['Set manual config'].json.query || '').toString().trim(); const company = ($node['Set manual config'].json.company || query).toString().trim(); const res = $node['Lookup symbol'].json || {}; const quotes = res.quotes || res.finance?.result || []; const fromQuotes = quotes.find(q => (String(q.quoteType || '').toLowerCase() === 'equity') && q.symbol) || quotes[0]; const fallbackMap = { '삼성전자': '005930.KS', '카카오': '035720.KS', '네이버': '035420.KS', '엔씨소프트': '036570.KS', '엔씨': '036570.KS', '현대차': '005380.KS', '기아': '000270.KS', 'lg에너지솔루션': '373220.KS', 'lg화학': '051910.KS', 'sk하이닉스': '000660.KS', 'posco': '005490.KS', '포스코': '005490.KS' }; const lowerQ = query.toLowerCase(); const mapHit = Object.keys(fallbackMap).find(k => lowerQ.includes(k)); if (rawSym) return rawSym.toUpperCase(); if (mapHit) return fallbackMap[mapHit]; let sym = (fromQuotes && fromQuotes.symbol ? String(fromQuotes.symbol) : (company || query)).toUpperCase(); if (!sym) return ''; if (sym.includes('.')) return sym; const exchange = (fromQuotes && fromQuotes.exchange ? String(fromQuotes.exchange) : '').toUpperCase(); const mapEx = { NMS: 'US', NYQ: 'US', NCM: 'US', NGM: 'US', NIM: 'US', ASE: 'US', BATS: 'US', PCX: 'US', NGQ: 'US', KSC: 'KS', KSE: 'KS', KOE: 'KS', KOS: 'KQ', KOSDAQ: 'KQ' }; const suffix = mapEx[exchange] || 'US'; return sym + '.' + suffix; })() }}",
+                                "value": "={{ (() => { const rawSym = ($node['Set manual config'].json.symbol || '').toString().trim(); if (rawSym) return rawSym.toUpperCase(); let res = {}; try { res = JSON.parse($node['Resolve symbol'].json.stdout || '{}'); } catch (e) { res = {}; } return (res.symbol || '').toString().toUpperCase(); })() }}",
                             },
                             {
                                 "name": "interval",
@@ -248,16 +398,6 @@ def build_collector_workflow(error_workflow_id):
                 "typeVersion": 1,
                 "position": [400, 300],
             },
-            {
-                "parameters": {
-                    "filePath": PRICES_PATH,
-                    "dataPropertyName": "data",
-                },
-                "name": "Read Prices File",
-                "type": "n8n-nodes-base.readBinaryFile",
-                "typeVersion": 1,
-                "position": [400, 450],
-            },
             {
                 "parameters": {
                     "operation": "fromFile",
@@ -273,21 +413,6 @@ def build_collector_workflow(error_workflow_id):
                 "typeVersion": 2,
                 "position": [620, 300],
             },
-            {
-                "parameters": {
-                    "operation": "fromFile",
-                    "binaryPropertyName": "data",
-                    "fileFormat": "xlsx",
-                    "options": {
-                        "sheetName": "prices",
-                        "headerRow": True,
-                    },
-                },
-                "name": "Read Prices Sheet",
-                "type": "n8n-nodes-base.spreadsheetFile",
-                "typeVersion": 2,
-                "position": [620, 450],
-            },
             {
                 "parameters": {
                     "mode": "combine",
@@ -346,49 +471,6 @@ def build_collector_workflow(error_workflow_id):
                 "typeVersion": 1,
                 "position": [1300, 230],
             },
-            {
-                "parameters": {
-                    "authentication": "none",
-                    "requestMethod": "GET",
-                    "url": "={{ 'https://stooq.com/q/d/l/?s=' + $json.symbol + '&i=' + $json.interval }}",
-                    "responseFormat": "file",
-                    "dataPropertyName": "data",
-                },
-                "name": "HTTP Request",
-                "type": "n8n-nodes-base.httpRequest",
-                "typeVersion": 2,
-                "position": [1520, 230],
-            },
-            {
-                "parameters": {
-                    "operation": "csv",
-                    "binaryPropertyName": "data",
-                    "options": {
-                        "headerRow": True,
-                    },
-                },
-                "name": "Extract CSV",
-                "type": "n8n-nodes-base.extractFromFile",
-                "typeVersion": 1,
-                "position": [1740, 230],
-            },
-            {
-                "parameters": {
-                    "conditions": {
-                        "string": [
-                            {
-                                "value1": "={{ $json.Date }}",
-                                "operation": "isNotEmpty",
-                            }
-                        ]
-                    },
-                    "combineOperation": "all",
-                },
-                "name": "IF has date",
-                "type": "n8n-nodes-base.if",
-                "typeVersion": 1,
-                "position": [1860, 230],
-            },
             {
                 "parameters": {
                     "mode": "chooseBranch",
@@ -403,80 +485,89 @@ def build_collector_workflow(error_workflow_id):
             },
             {
                 "parameters": {
-                    "conditions": {
-                        "number": [
-                            {
-                                "value1": "={{ Date.parse($json.Date || '1900-01-01') }}",
-                                "operation": "larger",
-                                "value2": "={{ Date.parse($items(\"Set defaults\")[0].json.last_date || '1900-01-01') }}",
-                            }
-                        ]
-                    },
-                    "combineOperation": "all",
+                    "command": fetch_command,
+                    "executeOnce": True,
                 },
-                "name": "IF new date",
-                "type": "n8n-nodes-base.if",
+                "name": "Fetch Stooq (incremental)",
+                "type": "n8n-nodes-base.executeCommand",
                 "typeVersion": 1,
-                "position": [2060, 230],
+                "position": [1520, 230],
+            },
+        ],
+        "connections": {
+            "Manual Trigger": {
+                "main": [
+                    [
+                        {"node": "Set manual config", "type": "main", "index": 0},
+                        {"node": "Read State File", "type": "main", "index": 0},
+                    ]
+                ]
+            },
+            "Set manual config": {
+                "main": [[{"node": "Resolve symbol", "type": "main", "index": 0}]]
+            },
+            "Resolve symbol": {
+                "main": [[{"node": "Set resolved config", "type": "main", "index": 0}]]
+            },
+            "Set resolved config": {
+                "main": [[{"node": "Merge Config/State", "type": "main", "index": 0}]]
+            },
+            "Read State File": {
+                "main": [[{"node": "Read State Sheet", "type": "main", "index": 0}]]
+            },
+            "Read State Sheet": {
+                "main": [[{"node": "Merge Config/State", "type": "main", "index": 1}]]
             },
+            "Merge Config/State": {
+                "main": [[{"node": "Set defaults", "type": "main", "index": 0}]]
+            },
+            "Set defaults": {
+                "main": [[{"node": "IF active", "type": "main", "index": 0}]]
+            },
+            "IF active": {
+                "main": [[{"node": "Fetch Stooq (incremental)", "type": "main", "index": 0}], []]
+            },
+        },
+        "settings": {"timezone": "Asia/Seoul", "errorWorkflow": error_workflow_id},
+    }
+
+
+def build_batch_collector_workflow(error_workflow_id):
+    collect_command = python_command(
+        "collect_batch.py",
+        "--workers",
+        f"{BATCH_WORKERS}",
+        "--config",
+        f"'{Path(CONFIG_PATH).as_posix()}'",
+        *(["--export-xlsx"] if EXPORT_PRICES_XLSX else []),
+    )
+    schedule_command = python_command(
+        "scheduler.py",
+        literal("run"),
+        "--workers",
+        f"{BATCH_WORKERS}",
+        "--config",
+        f"'{Path(CONFIG_PATH).as_posix()}'",
+    )
+    return {
+        "name": WORKFLOW_D_NAME,
+        "nodes": [
             {
-                "parameters": {
-                    "keepOnlySet": True,
-                    "values": {
-                        "string": [
-                            {
-                                "name": "key",
-                                "value": "={{ $items(\"Set defaults\")[0].json.symbol + '|' + $json.Date }}",
-                            },
-                            {
-                                "name": "symbol",
-                                "value": "={{ $items(\"Set defaults\")[0].json.symbol }}",
-                            },
-                            {
-                                "name": "date",
-                                "value": "={{ $json.Date }}",
-                            },
-                        ],
-                        "number": [
-                            {
-                                "name": "open",
-                                "value": "={{ $json.Open }}",
-                            },
-                            {
-                                "name": "high",
-                                "value": "={{ $json.High }}",
-                            },
-                            {
-                                "name": "low",
-                                "value": "={{ $json.Low }}",
-                            },
-                            {
-                                "name": "close",
-                                "value": "={{ $json.Close }}",
-                            },
-                            {
-                                "name": "volume",
-                                "value": "={{ $json.Volume }}",
-                            },
-                        ],
-                    },
-                },
-                "name": "Set price row",
-                "type": "n8n-nodes-base.set",
-                "typeVersion": 2,
-                "position": [2180, 230],
+                "parameters": {},
+                "name": "Manual Trigger",
+                "type": "n8n-nodes-base.manualTrigger",
+                "typeVersion": 1,
+                "position": [200, 300],
             },
             {
                 "parameters": {
-                    "mode": "chooseBranch",
-                    "numberInputs": 2,
-                    "chooseBranchMode": "waitForAll",
-                    "output": "empty",
+                    "command": collect_command,
+                    "executeOnce": True,
                 },
-                "name": "Wait for prices data",
-                "type": "n8n-nodes-base.merge",
-                "typeVersion": 3.2,
-                "position": [2400, 230],
+                "name": "Collect active symbols",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [420, 300],
             },
             {
                 "parameters": {
@@ -484,297 +575,294 @@ def build_collector_workflow(error_workflow_id):
                     "fields": {
                         "values": [
                             {
-                                "name": "rows",
-                                "type": "arrayValue",
-                                "arrayValue": "={{ $items(\"Read Prices Sheet\").map(item => item.json).concat($items(\"Set price row\").map(item => item.json)) }}",
+                                "name": "summary",
+                                "type": "objectValue",
+                                "objectValue": "={{ (() => { try { return JSON.parse($json.stdout || '{}'); } catch (e) { return { error: ($json.stderr || $json.stdout || '').toString().slice(0, 500) }; } })() }}",
                             }
                         ]
                     },
                     "include": "none",
                 },
-                "name": "Set combined prices",
+                "name": "Parse batch summary",
                 "type": "n8n-nodes-base.set",
                 "typeVersion": 3.2,
-                "position": [2620, 230],
+                "position": [640, 300],
             },
             {
                 "parameters": {
-                    "resource": "itemList",
-                    "operation": "splitOutItems",
-                    "fieldToSplitOut": "rows",
-                    "include": "noOtherFields",
-                },
-                "name": "Split combined prices",
-                "type": "n8n-nodes-base.itemLists",
-                "typeVersion": 3.1,
-                "position": [2840, 230],
-            },
-            {
-                "parameters": {
-                    "keepOnlySet": False,
-                    "values": {
-                        "string": [
-                            {
-                                "name": "symbol",
-                                "value": "={{ (() => { const base = ($json && $json.rows && typeof $json.rows === 'object') ? $json.rows : ($json || {}); const keys = Object.keys(base); const pick = (name) => { const key = keys.find(k => k.toLowerCase().trim() === name); return key ? base[key] : undefined; }; const val = pick('symbol'); return val !== undefined && val !== null ? String(val).trim() : ''; })() }}",
-                            },
-                            {
-                                "name": "date",
-                                "value": "={{ (() => { const base = ($json && $json.rows && typeof $json.rows === 'object') ? $json.rows : ($json || {}); const keys = Object.keys(base); const pick = (name) => { const key = keys.find(k => k.toLowerCase().trim() === name); return key ? base[key] : undefined; }; const val = pick('date'); return val !== undefined && val !== null ? String(val).trim() : ''; })() }}",
-                            },
-                            {
-                                "name": "key",
-                                "value": "={{ (() => { const base = ($json && $json.rows && typeof $json.rows === 'object') ? $json.rows : ($json || {}); const keys = Object.keys(base); const pick = (name) => { const key = keys.find(k => k.toLowerCase().trim() === name); return key ? base[key] : undefined; }; const rawKey = pick('key'); if (rawKey !== undefined && rawKey !== null && String(rawKey).trim() !== '') { return String(rawKey).trim(); } const sym = pick('symbol'); const date = pick('date'); const symVal = sym !== undefined && sym !== null ? String(sym).trim() : ''; const dateVal = date !== undefined && date !== null ? String(date).trim() : ''; return symVal && dateVal ? symVal + '|' + dateVal : ''; })() }}",
-                            },
+                    "rule": {
+                        "interval": [
+                            {"field": "minutes", "minutesInterval": SCHEDULE_INTERVAL_MINUTES}
                         ]
-                    },
+                    }
                 },
-                "name": "Normalize price row",
-                "type": "n8n-nodes-base.set",
-                "typeVersion": 2,
-                "position": [3060, 230],
+                "name": "Schedule Trigger",
+                "type": "n8n-nodes-base.scheduleTrigger",
+                "typeVersion": 1.2,
+                "position": [200, 520],
             },
             {
                 "parameters": {
-                    "resource": "itemList",
-                    "operation": "removeDuplicates",
-                    "compare": "selectedFields",
-                    "fieldsToCompare": "key",
+                    "command": schedule_command,
+                    "executeOnce": True,
                 },
-                "name": "Remove duplicate prices",
-                "type": "n8n-nodes-base.itemLists",
-                "typeVersion": 3.1,
-                "position": [3500, 350],
+                "name": "Collect due markets",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [420, 520],
             },
             {
                 "parameters": {
-                    "resource": "itemList",
-                    "operation": "sort",
-                    "type": "simple",
-                    "sortFieldsUi": {
-                        "sortField": [
-                            {
-                                "fieldName": "symbol",
-                                "order": "ascending",
-                            },
+                    "mode": "manual",
+                    "fields": {
+                        "values": [
                             {
-                                "fieldName": "date",
-                                "order": "ascending",
-                            },
+                                "name": "summary",
+                                "type": "objectValue",
+                                "objectValue": "={{ (() => { try { return JSON.parse($json.stdout || '{}'); } catch (e) { return { error: ($json.stderr || $json.stdout || '').toString().slice(0, 500) }; } })() }}",
+                            }
                         ]
                     },
+                    "include": "none",
                 },
-                "name": "Sort prices",
-                "type": "n8n-nodes-base.itemLists",
-                "typeVersion": 3.1,
-                "position": [3720, 250],
+                "name": "Parse schedule summary",
+                "type": "n8n-nodes-base.set",
+                "typeVersion": 3.2,
+                "position": [640, 520],
+            },
+        ],
+        "connections": {
+            "Manual Trigger": {
+                "main": [[{"node": "Collect active symbols", "type": "main", "index": 0}]]
+            },
+            "Collect active symbols": {
+                "main": [[{"node": "Parse batch summary", "type": "main", "index": 0}]]
+            },
+            "Schedule Trigger": {
+                "main": [[{"node": "Collect due markets", "type": "main", "index": 0}]]
+            },
+            "Collect due markets": {
+                "main": [[{"node": "Parse schedule summary", "type": "main", "index": 0}]]
             },
+        },
+        "settings": {"timezone": "Asia/Seoul", "errorWorkflow": error_workflow_id},
+    }
+
+
+def build_job_status_workflow(error_workflow_id):
+    status_command = python_command(
+        "jobs.py",
+        literal("status"),
+        "$json.query?.job_id || ''",
+        "--wait",
+        f"$json.query?.wait ?? {JOB_STATUS_WAIT}",
+    )
+    return {
+        "name": WORKFLOW_E_NAME,
+        "nodes": [
             {
                 "parameters": {
-                    "operation": "toFile",
-                    "fileFormat": "xlsx",
-                    "binaryPropertyName": "data",
+                    "httpMethod": "GET",
+                    "path": "analyze-status",
+                    "webhookId": "analyze-status",
+                    "responseMode": "responseNode",
                     "options": {
-                        "sheetName": "prices",
-                        "headerRow": True,
-                        "fileName": "prices.xlsx",
+                        "responseContentType": "application/json",
                     },
                 },
-                "name": "Build prices file",
-                "type": "n8n-nodes-base.spreadsheetFile",
-                "typeVersion": 2,
-                "position": [3940, 250],
+                "name": "Webhook (analyze status)",
+                "type": "n8n-nodes-base.webhook",
+                "typeVersion": 1,
+                "position": [200, 300],
             },
             {
                 "parameters": {
-                    "fileName": PRICES_PATH,
-                    "dataPropertyName": "data",
+                    "command": status_command,
+                    "executeOnce": True,
                 },
-                "name": "Write prices file",
-                "type": "n8n-nodes-base.writeBinaryFile",
+                "name": "Read job status",
+                "type": "n8n-nodes-base.executeCommand",
                 "typeVersion": 1,
-                "position": [4160, 250],
+                "position": [420, 300],
             },
             {
                 "parameters": {
-                    "resource": "itemList",
-                    "operation": "summarize",
-                    "fieldsToSummarize": {
-                        "values": [
-                            {
-                                "aggregation": "max",
-                                "field": "date",
-                            }
-                        ]
-                    },
-                    "fieldsToSplitBy": "symbol",
-                    "options": {
-                        "outputFormat": "separateItems",
-                    },
+                    "respondWith": "json",
+                    "responseBody": "={{ (() => { try { return JSON.parse($json.stdout || '{}'); } catch (e) { return { status: 'error', error: ($json.stderr || $json.stdout || '').toString().slice(0, 500) }; } })() }}",
                 },
-                "name": "Summarize state",
-                "type": "n8n-nodes-base.itemLists",
-                "typeVersion": 3.1,
-                "position": [3720, 450],
+                "name": "Respond job status",
+                "type": "n8n-nodes-base.respondToWebhook",
+                "typeVersion": 1,
+                "position": [640, 300],
             },
-            {
-                "parameters": {
-                    "keepOnlySet": True,
-                    "values": {
-                        "string": [
-                            {
-                                "name": "symbol",
-                                "value": "={{ $json.symbol }}",
-                            },
-                            {
-                                "name": "last_date",
-                                "value": "={{ $json.max_date }}",
-                            },
-                        ]
-                    },
-                },
-                "name": "Set state row",
-                "type": "n8n-nodes-base.set",
-                "typeVersion": 2,
-                "position": [3940, 450],
+        ],
+        "connections": {
+            "Webhook (analyze status)": {
+                "main": [[{"node": "Read job status", "type": "main", "index": 0}]]
             },
+            "Read job status": {
+                "main": [[{"node": "Respond job status", "type": "main", "index": 0}]]
+            },
+        },
+        "settings": {"timezone": "Asia/Seoul", "errorWorkflow": error_workflow_id},
+    }
+
+
+def build_signals_export_workflow(error_workflow_id):
+    export_command = python_command("write_queue.py", literal("submit"), literal("signals-xlsx"))
+    return {
+        "name": WORKFLOW_F_NAME,
+        "nodes": [
             {
                 "parameters": {
-                    "operation": "toFile",
-                    "fileFormat": "xlsx",
-                    "binaryPropertyName": "data",
-                    "options": {
-                        "sheetName": "state",
-                        "headerRow": True,
-                        "fileName": "state.xlsx",
-                    },
+                    "rule": {
+                        "interval": [
+                            {"field": "minutes", "minutesInterval": SIGNALS_EXPORT_INTERVAL_MINUTES}
+                        ]
+                    }
                 },
-                "name": "Build state file",
-                "type": "n8n-nodes-base.spreadsheetFile",
-                "typeVersion": 2,
-                "position": [4160, 450],
+                "name": "Schedule Trigger",
+                "type": "n8n-nodes-base.scheduleTrigger",
+                "typeVersion": 1.2,
+                "position": [200, 300],
             },
             {
                 "parameters": {
-                    "fileName": STATE_PATH,
-                    "dataPropertyName": "data",
+                    "command": export_command,
+                    "executeOnce": True,
                 },
-                "name": "Write state file",
-                "type": "n8n-nodes-base.writeBinaryFile",
+                "name": "Export signals.xlsx",
+                "type": "n8n-nodes-base.executeCommand",
                 "typeVersion": 1,
-                "position": [4380, 450],
+                "position": [420, 300],
             },
         ],
         "connections": {
-            "Manual Trigger": {
-                "main": [
-                    [
-                        {"node": "Set manual config", "type": "main", "index": 0},
-                        {"node": "Lookup symbol", "type": "main", "index": 0},
-                        {"node": "Read State File", "type": "main", "index": 0},
-                        {"node": "Read Prices File", "type": "main", "index": 0},
-                    ]
-                ]
-            },
-            "Set manual config": {
-                "main": [[{"node": "Wait for symbol lookup", "type": "main", "index": 0}]]
-            },
-            "Lookup symbol": {
-                "main": [[{"node": "Wait for symbol lookup", "type": "main", "index": 1}]]
-            },
-            "Wait for symbol lookup": {
-                "main": [[{"node": "Set resolved config", "type": "main", "index": 0}]]
-            },
-            "Set resolved config": {
-                "main": [[{"node": "Merge Config/State", "type": "main", "index": 0}]]
-            },
-            "Read State File": {
-                "main": [[{"node": "Read State Sheet", "type": "main", "index": 0}]]
-            },
-            "Read Prices File": {
-                "main": [[{"node": "Read Prices Sheet", "type": "main", "index": 0}]]
-            },
-            "Read State Sheet": {
-                "main": [[{"node": "Merge Config/State", "type": "main", "index": 1}]]
-            },
-            "Merge Config/State": {
-                "main": [[{"node": "Set defaults", "type": "main", "index": 0}]]
-            },
-            "Set defaults": {
-                "main": [[{"node": "IF active", "type": "main", "index": 0}]]
-            },
-            "IF active": {
-                "main": [[{"node": "HTTP Request", "type": "main", "index": 0}], []]
-            },
-            "HTTP Request": {
-                "main": [[{"node": "Extract CSV", "type": "main", "index": 0}]]
-            },
-            "Extract CSV": {
-                "main": [[{"node": "IF has date", "type": "main", "index": 0}]]
-            },
-            "IF has date": {
-                "main": [[{"node": "IF new date", "type": "main", "index": 0}], []]
-            },
-            "IF new date": {
-                "main": [[{"node": "Set price row", "type": "main", "index": 0}], []]
-            },
-            "Set price row": {
-                "main": [[{"node": "Wait for prices data", "type": "main", "index": 0}]]
-            },
-            "Read Prices Sheet": {
-                "main": [[{"node": "Wait for prices data", "type": "main", "index": 1}]]
-            },
-            "Wait for prices data": {
-                "main": [[{"node": "Set combined prices", "type": "main", "index": 0}]]
-            },
-            "Set combined prices": {
-                "main": [[{"node": "Split combined prices", "type": "main", "index": 0}]]
-            },
-            "Split combined prices": {
-                "main": [
-                    [
-                        {"node": "Normalize price row", "type": "main", "index": 0},
-                    ]
-                ]
-            },
-            "Normalize price row": {
-                "main": [
-                    [
-                        {"node": "Remove duplicate prices", "type": "main", "index": 0},
-                        {"node": "Summarize state", "type": "main", "index": 0},
-                    ],
-                ]
-            },
-            "Remove duplicate prices": {
-                "main": [
-                    [
-                        {"node": "Sort prices", "type": "main", "index": 0},
-                    ]
-                ]
-            },
-            "Sort prices": {
-                "main": [[{"node": "Build prices file", "type": "main", "index": 0}]]
-            },
-            "Build prices file": {
-                "main": [[{"node": "Write prices file", "type": "main", "index": 0}]]
-            },
-            "Summarize state": {
-                "main": [[{"node": "Set state row", "type": "main", "index": 0}]]
-            },
-            "Set state row": {
-                "main": [[{"node": "Build state file", "type": "main", "index": 0}]]
-            },
-            "Build state file": {
-                "main": [[{"node": "Write state file", "type": "main", "index": 0}]]
+            "Schedule Trigger": {
+                "main": [[{"node": "Export signals.xlsx", "type": "main", "index": 0}]]
             },
         },
         "settings": {"timezone": "Asia/Seoul", "errorWorkflow": error_workflow_id},
     }
 
 
-def build_gemini_analyzer_workflow(error_workflow_id):
+def analyzer_name(shard=None):
+    return WORKFLOW_C_NAME if shard is None else f"{WORKFLOW_C_NAME} shard {shard}"
+
+
+def analyzer_webhook_path(shard=None):
+    return "analyze" if shard is None else f"analyze-{shard}"
+
+
+def build_gemini_analyzer_workflow(error_workflow_id, shard=None):
+    # A shard differs only in its name, webhook path and signals.db partition
+    resolve_command = python_command("symbol_cache.py", literal("resolve"), "$json.search_query || 'AAPL'")
+    params = "$items('Set analyzer params')[0].json"
+    window_command = python_command(
+        "price_store.py",
+        literal("window"),
+        "$json.symbol || ''",
+        "--rows",
+        "$json.lookback || 60",
+    )
+    # Smallest Yahoo range covering lookback; the bars are kept in the price store
+    fetch_command = python_command(
+        "yahoo_chart.py",
+        "$json.symbol || ''",
+        "--lookback",
+        "$json.lookback || 60",
+    )
+    prepare_command = python_command(
+        "prompt_compact.py",
+        "$json.symbol",
+        "--lookback",
+        "$json.lookback || 60",
+        "--mode",
+        f"{params}.prompt_mode || 'auto'",
+        "--budget",
+        f"{params}.prompt_budget || {PROMPT_TOKEN_BUDGET}",
+        "--indicators",
+    )
+    prompt = "$items('Build prompt')[0].json"
+    cache_key_args = (
+        "--as-of",
+        f"{prompt}.as_of || ''",
+        "--lookback",
+        f"{prompt}.lookback || 60",
+        "--model",
+        f"{params}.model",
+        "--prompt-mode",
+        f"{params}.prompt_mode || 'auto'",
+        "--prompt-budget",
+        f"{params}.prompt_budget || {PROMPT_TOKEN_BUDGET}",
+    )
+    cache_get_command = python_command(
+        "analysis_cache.py",
+        literal("get"),
+        f"{prompt}.symbol",
+        *cache_key_args,
+        "--bypass",
+        f"{params}.no_cache ? 'true' : 'false'",
+    )
+    submit_job_command = python_command(
+        "jobs.py",
+        literal("submit"),
+        "$execution.id",
+        "--request",
+        "JSON.stringify($json.body || {})",
+    )
+    # Stage boundaries: the Set nodes after each stage record marked_at (Date.now()); the job
+    # result carries the spans between them, and signals_write/total end when the job finishes
+    timings = (
+        "(() => { const mark = (node) => { try { return $items(node)[0].json.marked_at ?? null; } catch (e) { return null; } }; "
+        "const span = (a, b) => (a != null && b != null ? b - a : null); const now = Date.now(); "
+        "const start = mark('Set analyzer params'); const resolved = mark('Set analyzer params (resolved)'); "
+        "const read = mark('Build price window'); const fetched = mark('Set price window (fetched)'); "
+        "const prompt = mark('Build prompt'); const cached = mark('Set cached analysis'); "
+        "const checked = mark('Mark model call') ?? cached; const analyzed = mark('Parse analysis JSON') ?? cached; "
+        "return { symbol_lookup_ms: span(start, resolved), read_prices_ms: span(resolved, read), "
+        "yahoo_fetch_ms: span(read, fetched), prompt_ms: span(fetched ?? read, prompt), "
+        "cache_check_ms: span(prompt, checked), model_ms: span(checked, analyzed), "
+        "signals_write_ms: span(analyzed, now), total_ms: span(start, now) }; })()"
+    )
+    job_result = (
+        "Object.assign({}, $items('Set signal row (gemini)')[0].json, (() => { try { const c = JSON.parse($items('Check analysis cache')[0].json.stdout || '{}'); return { cache: c.cache, cache_hits: c.hits, cache_misses: c.misses }; } catch (e) { return {}; } })(), { timings: "
+        + timings
+        + " })"
+    )
+    # The row, the analysis and the job result carry model text (URL-encoding grows Korean
+    # ~9x), so they reach the scripts as payload files; argv keeps ids and flags only
+    finish_job_command = python_command(
+        "jobs.py",
+        literal("finish"),
+        "$execution.id",
+        "--result-file",
+        payload_path("result"),
+    )
+    upsert_signal_command = python_command(
+        "signal_store.py",
+        literal("upsert"),
+        "--row-file",
+        payload_path("row"),
+        "--history",
+        # Shards leave signals.xlsx to the scheduled "Signals export" workflow: a per-row export
+        # would rewrite the merged workbook once per symbol across all shards
+        *(["--export-xlsx"] if EXPORT_SIGNALS_XLSX and shard is None else []),
+        *(["--shard", literal(str(shard))] if shard is not None else []),
+    )
+    cache_put_command = python_command(
+        "analysis_cache.py",
+        literal("put"),
+        f"{prompt}.symbol",
+        *cache_key_args,
+        "--analysis-file",
+        payload_path("analysis"),
+    )
+    # Failed calls are reported by the Error Handler (error_log.py); successes restore the rate
+    gemini_acquire_command = python_command("rate_limit.py", literal("acquire"), f"'{GEMINI_RATE_HOST}'")
+    gemini_report_command = python_command("rate_limit.py", literal("report"), f"'{GEMINI_RATE_HOST}'", "--status", literal("200"))
     return {
-        "name": WORKFLOW_C_NAME,
+        "name": analyzer_name(shard),
         "nodes": [
             {
                 "parameters": {},
@@ -792,16 +880,38 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                                 "name": "query",
                                 "value": "={{ $json.body?.query ?? $json.query ?? '' }}",
                             },
+                            {
+                                "name": "symbol",
+                                "value": "={{ $json.body?.symbol ?? $json.symbol ?? '' }}",
+                            },
                             {
                                 "name": "model",
                                 "value": "={{ $json.body?.model ?? $json.model ?? 'models/gemini-2.5-flash' }}",
                             },
+                            {
+                                "name": "prompt_mode",
+                                "value": "={{ $json.body?.prompt_mode ?? $json.prompt_mode ?? 'auto' }}",
+                            },
                         ],
                         "number": [
                             {
                                 "name": "lookback",
                                 "value": "={{ Number($json.body?.lookback ?? $json.lookback ?? 60) }}",
-                            }
+                            },
+                            {
+                                "name": "prompt_budget",
+                                "value": "={{ Number($json.body?.prompt_budget ?? $json.prompt_budget ?? " + str(PROMPT_TOKEN_BUDGET) + ") }}",
+                            },
+                            {
+                                "name": "marked_at",
+                                "value": "={{ Date.now() }}",
+                            },
+                        ],
+                        "boolean": [
+                            {
+                                "name": "no_cache",
+                                "value": "={{ ['true', '1', 'yes'].includes(String($json.body?.no_cache ?? $json.no_cache ?? false).toLowerCase()) }}",
+                            },
                         ],
                     },
                 },
@@ -830,8 +940,8 @@ def build_gemini_analyzer_workflow(error_workflow_id):
             {
                 "parameters": {
                     "httpMethod": "POST",
-                    "path": "analyze",
-                    "webhookId": "analyze",
+                    "path": analyzer_webhook_path(shard),
+                    "webhookId": analyzer_webhook_path(shard),
                     "responseMode": "responseNode",
                     "options": {
                         "responseContentType": "application/json",
@@ -844,21 +954,54 @@ def build_gemini_analyzer_workflow(error_workflow_id):
             },
             {
                 "parameters": {
-                    "authentication": "none",
-                    "requestMethod": "GET",
-                    "url": "={{ 'https://query1.finance.yahoo.com/v1/finance/search?q=' + encodeURIComponent($json.search_query || 'AAPL') + '&quotesCount=3&newsCount=0&lang=ko-KR&region=KR' }}",
+                    "command": submit_job_command,
+                    "executeOnce": True,
+                },
+                "name": "Create analysis job",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [200, -60],
+            },
+            {
+                "parameters": {
+                    "respondWith": "json",
+                    "responseBody": "={{ { job_id: $execution.id, status: 'running', status_url: '/webhook/analyze-status?job_id=' + $execution.id } }}",
                     "options": {
-                        "headers": {
-                            "User-Agent": "Mozilla/5.0",
-                            "Accept-Language": "ko,en-US;q=0.7,en;q=0.5"
-                        },
-                        "ignoreResponseCode": True
+                        "responseCode": 202,
                     },
-                    "responseFormat": "json",
                 },
-                "name": "Lookup symbol (analyzer)",
-                "type": "n8n-nodes-base.httpRequest",
-                "typeVersion": 2,
+                "name": "Respond job accepted",
+                "type": "n8n-nodes-base.respondToWebhook",
+                "typeVersion": 1,
+                "position": [420, -60],
+            },
+            {
+                "parameters": {
+                    "mode": "manual",
+                    "fields": {
+                        "values": [
+                            {
+                                "name": "body",
+                                "type": "objectValue",
+                                "objectValue": "={{ $items('Webhook (analyze)')[0].json.body || {} }}",
+                            }
+                        ]
+                    },
+                    "include": "none",
+                },
+                "name": "Restore webhook request",
+                "type": "n8n-nodes-base.set",
+                "typeVersion": 3.2,
+                "position": [420, 60],
+            },
+            {
+                "parameters": {
+                    "command": resolve_command,
+                    "executeOnce": True,
+                },
+                "name": "Resolve symbol (analyzer)",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
                 "position": [640, 120],
             },
             {
@@ -884,7 +1027,7 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                             },
                             {
                                 "name": "symbol",
-                                "value": "={{ (() => { const rawSym = ($node['Set analyzer params'].json.symbol || '').toString().trim(); const query = ($node['Set analyzer params'].json.query || '').toString().trim(); const company = ($node['Set analyzer params'].json.company || query).toString().trim(); const res = $node['Lookup symbol (analyzer)'].json || {}; const quotes = res.quotes || res.finance?.result || []; const eq = quotes.find(q => (String(q.quoteType || '').toLowerCase() === 'equity') && q.symbol) || quotes[0]; const fallbackMap = { '삼성전자': '005930.KS', '카카오': '035720.KS', '네이버': '035420.KS', '엔씨소프트': '036570.KS', '엔씨': '036570.KS', '현대차': '005380.KS', '기아': '000270.KS', 'lg에너지솔루션': '373220.KS', 'lg화학': '051910.KS', 'sk하이닉스': '000660.KS', 'posco': '005490.KS', '포스코': '005490.KS' }; const lowerQ = query.toLowerCase(); const mapHit = Object.keys(fallbackMap).find(k => lowerQ.includes(k)); if (rawSym) return rawSym.toUpperCase(); if (mapHit) return fallbackMap[mapHit]; let sym = (eq && eq.symbol ? String(eq.symbol) : (company || query)).toUpperCase(); if (!sym) return ''; if (sym.includes('.')) return sym; const exchange = (eq && eq.exchange ? String(eq.exchange) : '').toUpperCase(); const mapEx = { NMS: 'US', NYQ: 'US', NCM: 'US', NGM: 'US', NIM: 'US', ASE: 'US', BATS: 'US', PCX: 'US', NGQ: 'US', KSC: 'KS', KSE: 'KS', KOE: 'KS', KOS: 'KQ', KOSDAQ: 'KQ' }; const suffix = mapEx[exchange] || 'US'; return sym + '.' + suffix; })() }}",
+                                "value": "={{ (() => { const rawSym = ($node['Set analyzer params'].json.symbol || '').toString().trim(); const query = ($node['Set analyzer params'].json.query || '').toString().trim(); if (rawSym && !query) return rawSym.toUpperCase(); let res = {}; try { res = JSON.parse($node['Resolve symbol (analyzer)'].json.stdout || '{}'); } catch (e) { res = {}; } return (res.symbol || rawSym || query).toString().toUpperCase(); })() }}",
                             },
                             {
                                 "name": "model",
@@ -895,7 +1038,11 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                             {
                                 "name": "lookback",
                                 "value": "={{ Number($node['Set analyzer params'].json.lookback || 60) }}",
-                            }
+                            },
+                            {
+                                "name": "marked_at",
+                                "value": "={{ Date.now() }}",
+                            },
                         ],
                     },
                 },
@@ -906,39 +1053,12 @@ def build_gemini_analyzer_workflow(error_workflow_id):
             },
             {
                 "parameters": {
-                    "filePath": PRICES_PATH,
-                    "dataPropertyName": "data",
+                    "command": window_command,
+                    "executeOnce": True,
                 },
-                "name": "Read Prices File",
-                "type": "n8n-nodes-base.readBinaryFile",
+                "name": "Read price window",
+                "type": "n8n-nodes-base.executeCommand",
                 "typeVersion": 1,
-                "position": [420, 320],
-            },
-            {
-                "parameters": {
-                    "operation": "fromFile",
-                    "binaryPropertyName": "data",
-                    "fileFormat": "xlsx",
-                    "options": {
-                        "sheetName": "prices",
-                        "headerRow": True,
-                    },
-                },
-                "name": "Read Prices Sheet",
-                "type": "n8n-nodes-base.spreadsheetFile",
-                "typeVersion": 2,
-                "position": [640, 320],
-            },
-            {
-                "parameters": {
-                    "mode": "chooseBranch",
-                    "numberInputs": 2,
-                    "chooseBranchMode": "waitForAll",
-                    "output": "empty",
-                },
-                "name": "Wait for price window data",
-                "type": "n8n-nodes-base.merge",
-                "typeVersion": 3.2,
                 "position": [760, 320],
             },
             {
@@ -949,7 +1069,7 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                             {
                                 "name": "symbol",
                                 "type": "stringValue",
-                                "stringValue": "={{ (() => { const resolved = ($items('Set analyzer params (resolved)')[0].json.symbol || '').toString().trim(); if (resolved) return resolved; const prices = $items('Read Prices Sheet').map(i => i.json).filter(r => (r && (r.symbol || '').toString().trim())); prices.sort((a,b) => (b.date || '').toString().localeCompare((a.date || '').toString())); return (prices[0]?.symbol || '').toString().trim(); })() }}",
+                                "stringValue": "={{ (() => { const resolved = ($items('Set analyzer params (resolved)')[0].json.symbol || '').toString().trim(); try { return JSON.parse($json.stdout || '{}').symbol || resolved; } catch (e) { return resolved; } })() }}",
                             },
                             {
                                 "name": "model",
@@ -964,12 +1084,17 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                             {
                                 "name": "rows",
                                 "type": "arrayValue",
-                                "arrayValue": "={{ (() => { const resolved = ($items('Set analyzer params (resolved)')[0].json.symbol || '').toString().trim(); const lookback = Number($items('Set analyzer params (resolved)')[0].json.lookback || 60); const items = $items('Read Prices Sheet').map(i => i.json).filter(r => r && (r.date || '').toString().trim() !== '' && (r.symbol || '').toString().trim() !== ''); items.sort((a,b) => (b.date || '').toString().localeCompare((a.date || '').toString())); const autoSymbol = (items[0]?.symbol || '').toString().trim(); const symbol = resolved || autoSymbol; const rows = items.filter(r => (r.symbol || '').toString().trim() === symbol); return rows.slice(0, lookback); })() }}",
+                                "arrayValue": "={{ (() => { try { return JSON.parse($json.stdout || '{}').rows || []; } catch (e) { return []; } })() }}",
                             },
                             {
                                 "name": "as_of",
                                 "type": "stringValue",
-                                "stringValue": "={{ (() => { const rows = $json.rows || []; return rows.length ? (rows[0].date || '').toString() : ''; })() }}",
+                                "stringValue": "={{ (() => { try { return JSON.parse($json.stdout || '{}').as_of || ''; } catch (e) { return ''; } })() }}",
+                            },
+                            {
+                                "name": "marked_at",
+                                "type": "numberValue",
+                                "numberValue": "={{ Date.now() }}",
                             },
                         ]
                     },
@@ -1000,20 +1125,12 @@ def build_gemini_analyzer_workflow(error_workflow_id):
             },
             {
                 "parameters": {
-                    "authentication": "none",
-                    "requestMethod": "GET",
-                    "url": "={{ 'https://query1.finance.yahoo.com/v8/finance/chart/' + ($items('Set analyzer params (resolved)')[0].json.symbol || 'AAPL.US') + '?range=3mo&interval=1d&events=history' }}",
-                    "responseFormat": "json",
-                    "options": {
-                        "headers": {
-                            "User-Agent": "Mozilla/5.0"
-                        },
-                        "ignoreResponseCode": True
-                    },
+                    "command": fetch_command,
+                    "executeOnce": True,
                 },
                 "name": "Fetch prices (on-demand)",
-                "type": "n8n-nodes-base.httpRequest",
-                "typeVersion": 2,
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
                 "position": [1300, 280],
             },
             {
@@ -1034,12 +1151,17 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                             {
                                 "name": "rows",
                                 "type": "arrayValue",
-                                "arrayValue": "={{ (() => { const symbol = ($items('Set analyzer params (resolved)')[0].json.symbol || '').toString().trim(); const lookback = Number($items('Set analyzer params (resolved)')[0].json.lookback || 60); const res = $node['Fetch prices (on-demand)'].json?.chart?.result?.[0] || {}; const ts = res.timestamp || []; const quote = (res.indicators && res.indicators.quote && res.indicators.quote[0]) || {}; const rows = ts.map((t, idx) => ({ date: new Date(Number(t) * 1000).toISOString().slice(0,10), open: quote.open?.[idx], high: quote.high?.[idx], low: quote.low?.[idx], close: quote.close?.[idx], volume: quote.volume?.[idx], symbol })).filter(r => r.date); rows.sort((a,b) => b.date.localeCompare(a.date)); return rows.slice(0, lookback); })() }}",
+                                "arrayValue": "={{ (() => { try { return JSON.parse($json.stdout || '{}').rows || []; } catch (e) { return []; } })() }}",
                             },
                             {
                                 "name": "as_of",
                                 "type": "stringValue",
-                                "stringValue": "={{ (() => { const rows = $json.rows || []; return rows.length ? (rows[0].date || '').toString() : ''; })() }}",
+                                "stringValue": "={{ (() => { try { return JSON.parse($json.stdout || '{}').as_of || ''; } catch (e) { return ''; } })() }}",
+                            },
+                            {
+                                "name": "marked_at",
+                                "type": "numberValue",
+                                "numberValue": "={{ Date.now() }}",
                             },
                         ]
                     },
@@ -1050,6 +1172,26 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                 "typeVersion": 3.2,
                 "position": [1740, 280],
             },
+            {
+                "parameters": {
+                    "command": prepare_command,
+                    "executeOnce": True,
+                },
+                "name": "Prepare prompt data",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [1300, 560],
+            },
+            {
+                "parameters": {
+                    "mode": "combine",
+                    "combineBy": "combineByPosition",
+                },
+                "name": "Merge prompt data",
+                "type": "n8n-nodes-base.merge",
+                "typeVersion": 3.2,
+                "position": [1520, 560],
+            },
             {
                 "parameters": {
                     "mode": "manual",
@@ -1058,8 +1200,23 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                             {
                                 "name": "prompt",
                                 "type": "stringValue",
-                                "stringValue": "={{ (() => { const symbol = $json.symbol; const asOf = $json.as_of; const rows = $json.rows || []; const csv = rows.map(r => [r.date, r.open, r.high, r.low, r.close, r.volume].join(',')).join('\\n'); return [\n'You are a trading assistant. Analyze daily OHLCV history for one symbol and return ONLY valid JSON (no markdown, no extra text).',\n'Compute SMA20 and SMA60 using the close price over the available rows (if insufficient data, return null for that SMA).',\n'Return fields: symbol, as_of, signal (BUY|SELL|HOLD), confidence (0..1), sma20, sma60, trend (up|down|sideways), summary (Korean, 1-2 sentences).',\n'',\n`symbol: ${symbol}`,\n`as_of: ${asOf}`,\n'',\n'data_csv_header: date,open,high,low,close,volume',\n'data_csv:',\ncsv,\n].join('\\n'); })() }}",
-                            }
+                                "stringValue": "={{ (() => { const symbol = $json.symbol; const asOf = $json.as_of; const rows = $json.rows || []; let data = {}; try { data = JSON.parse($json.stdout || '{}'); } catch (e) { data = {}; } const ind = data.indicators || {}; const win = data.window || {}; const pick = ['close', 'sma20', 'sma60', 'ema12', 'ema26', 'rsi14', 'macd', 'macd_signal', 'macd_hist', 'atr14', 'trend']; const indicators = pick.map(k => `${k}: ${ind[k] ?? 'null'}`).join(', '); const header = win.text ? win.header : 'date,open,high,low,close,volume'; const body = win.text ? win.text : rows.slice().reverse().map(r => [r.date, r.open, r.high, r.low, r.close, r.volume].join(',')).join('\\n'); return [\n'You are a trading assistant. Interpret the precomputed indicators and daily OHLCV history for one symbol and return ONLY valid JSON (no markdown, no extra text).',\n'Indicators are already computed exactly from the close prices; do not recompute them (null means not enough data).',\n'Return fields: symbol, as_of, signal (BUY|SELL|HOLD), confidence (0..1), summary (Korean, 1-2 sentences).',\n'',\n`symbol: ${symbol}`,\n`as_of: ${asOf}`,\n`indicators: ${indicators}`,\n'',\n`data_header: ${header}`,\n'data (oldest first):',\nbody,\n].join('\\n'); })() }}",
+                            },
+                            {
+                                "name": "indicators",
+                                "type": "objectValue",
+                                "objectValue": "={{ (() => { try { return JSON.parse($json.stdout || '{}').indicators || {}; } catch (e) { return {}; } })() }}",
+                            },
+                            {
+                                "name": "prompt_encoding",
+                                "type": "stringValue",
+                                "stringValue": "={{ (() => { try { const win = JSON.parse($json.stdout || '{}').window || {}; return win.text ? `${win.mode} (~${win.est_tokens} tokens)` : 'csv (fallback)'; } catch (e) { return 'csv (fallback)'; } })() }}",
+                            },
+                            {
+                                "name": "marked_at",
+                                "type": "numberValue",
+                                "numberValue": "={{ Date.now() }}",
+                            },
                         ]
                     },
                     "include": "all",
@@ -1069,6 +1226,86 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                 "typeVersion": 3.2,
                 "position": [1300, 440],
             },
+            {
+                "parameters": {
+                    "command": cache_get_command,
+                    "executeOnce": True,
+                },
+                "name": "Check analysis cache",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [1410, 440],
+            },
+            {
+                "parameters": {
+                    "conditions": {
+                        "string": [
+                            {
+                                "value1": "={{ (() => { try { return JSON.parse($json.stdout || '{}').cache || 'miss'; } catch (e) { return 'miss'; } })() }}",
+                                "value2": "hit",
+                            }
+                        ]
+                    },
+                    "combineOperation": "all",
+                },
+                "name": "IF cache hit",
+                "type": "n8n-nodes-base.if",
+                "typeVersion": 1,
+                "position": [1520, 320],
+            },
+            {
+                "parameters": {
+                    "mode": "manual",
+                    "fields": {
+                        "values": [
+                            {
+                                "name": "analysis",
+                                "type": "objectValue",
+                                "objectValue": "={{ JSON.parse($json.stdout).analysis }}",
+                            },
+                            {
+                                "name": "marked_at",
+                                "type": "numberValue",
+                                "numberValue": "={{ Date.now() }}",
+                            },
+                        ]
+                    },
+                    "include": "none",
+                },
+                "name": "Set cached analysis",
+                "type": "n8n-nodes-base.set",
+                "typeVersion": 3.2,
+                "position": [1740, 320],
+            },
+            {
+                "parameters": {
+                    "mode": "manual",
+                    "fields": {
+                        "values": [
+                            {
+                                "name": "marked_at",
+                                "type": "numberValue",
+                                "numberValue": "={{ Date.now() }}",
+                            },
+                        ]
+                    },
+                    "include": "none",
+                },
+                "name": "Mark model call",
+                "type": "n8n-nodes-base.set",
+                "typeVersion": 3.2,
+                "position": [1520, 560],
+            },
+            {
+                "parameters": {
+                    "command": gemini_acquire_command,
+                    "executeOnce": True,
+                },
+                "name": "Wait for Gemini slot",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [1520, 680],
+            },
             {
                 "parameters": {
                     "resource": "text",
@@ -1080,7 +1317,7 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                     "messages": {
                         "values": [
                             {
-                                "content": "={{ $json.prompt }}",
+                                "content": "={{ $items('Build prompt')[0].json.prompt }}",
                                 "role": "user",
                             }
                         ]
@@ -1096,6 +1333,9 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                 "type": "@n8n/n8n-nodes-langchain.googleGemini",
                 "typeVersion": 1.1,
                 "position": [1520, 440],
+                "retryOnFail": True,
+                "maxTries": 3,
+                "waitBetweenTries": 5000,
                 "credentials": {
                     "googlePalmApi": {
                         "id": "pkuXkUjfGLbb68rB",
@@ -1111,8 +1351,13 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                             {
                                 "name": "analysis",
                                 "type": "objectValue",
-                                "objectValue": "={{ (() => { const text = $json.mergedResponse || $json.content?.parts?.[0]?.text || ''; const clean = text.replace(/```json/g, '').replace(/```/g, '').trim(); let data = {}; try { data = JSON.parse(clean); } catch (e) { data = {}; } return { symbol: data.symbol || $items('Build price window')[0].json.symbol, as_of: data.as_of || $items('Build price window')[0].json.as_of, signal: data.signal || 'HOLD', confidence: data.confidence || 0, summary: data.summary || clean.slice(0, 500), sma20: data.sma20, sma60: data.sma60, trend: data.trend || '' }; })() }}",
-                            }
+                                "objectValue": "={{ (() => { const text = $json.mergedResponse || $json.content?.parts?.[0]?.text || ''; const clean = text.replace(/```json/g, '').replace(/```/g, '').trim(); let data = {}; try { data = JSON.parse(clean); } catch (e) { data = {}; } const ind = $items('Build prompt')[0].json.indicators || {}; return { symbol: data.symbol || $items('Build price window')[0].json.symbol, as_of: data.as_of || $items('Build price window')[0].json.as_of, signal: data.signal || 'HOLD', confidence: data.confidence || 0, summary: data.summary || clean.slice(0, 500), sma20: ind.sma20 ?? data.sma20 ?? null, sma60: ind.sma60 ?? data.sma60 ?? null, rsi14: ind.rsi14 ?? null, macd_hist: ind.macd_hist ?? null, atr14: ind.atr14 ?? null, trend: ind.trend || data.trend || '' }; })() }}",
+                            },
+                            {
+                                "name": "marked_at",
+                                "type": "numberValue",
+                                "numberValue": "={{ Date.now() }}",
+                            },
                         ]
                     },
                     "include": "all",
@@ -1122,6 +1367,27 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                 "typeVersion": 3.2,
                 "position": [1740, 440],
             },
+            *payload_file_nodes("analysis", "analysis", [1960, 600], source_key="analysis"),
+            {
+                "parameters": {
+                    "command": cache_put_command,
+                    "executeOnce": True,
+                },
+                "name": "Store analysis cache",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [2400, 600],
+            },
+            {
+                "parameters": {
+                    "command": gemini_report_command,
+                    "executeOnce": True,
+                },
+                "name": "Report Gemini call",
+                "type": "n8n-nodes-base.executeCommand",
+                "typeVersion": 1,
+                "position": [2620, 720],
+            },
             {
                 "parameters": {
                     "keepOnlySet": True,
@@ -1134,6 +1400,12 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                             {"name": "value", "value": "={{ ($json.analysis.signal || 'HOLD').toString() }}"},
                             {"name": "threshold", "value": "={{ $json.analysis?.confidence ?? '' }}"},
                             {"name": "message", "value": "={{ ($json.analysis.summary || '').toString() }}"},
+                            {"name": "sma20", "value": "={{ $json.analysis?.sma20 ?? '' }}"},
+                            {"name": "sma60", "value": "={{ $json.analysis?.sma60 ?? '' }}"},
+                            {"name": "rsi14", "value": "={{ $json.analysis?.rsi14 ?? '' }}"},
+                            {"name": "macd_hist", "value": "={{ $json.analysis?.macd_hist ?? '' }}"},
+                            {"name": "atr14", "value": "={{ $json.analysis?.atr14 ?? '' }}"},
+                            {"name": "trend", "value": "={{ $json.analysis?.trend ?? '' }}"},
                             {"name": "created_at", "value": "={{ new Date().toISOString() }}"},
                         ]
                     },
@@ -1143,51 +1415,15 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                 "typeVersion": 2,
                 "position": [1960, 440],
             },
+            *payload_file_nodes("signal row", "row", [2180, 440]),
             {
                 "parameters": {
-                    "respondWith": "json",
-                    "responseBody": "={{ $json }}",
-                },
-                "name": "Respond to Webhook",
-                "type": "n8n-nodes-base.respondToWebhook",
-                "typeVersion": 1,
-                "position": [2180, 350],
-            },
-            {
-                "parameters": {
-                    "filePath": SIGNALS_PATH,
-                    "dataPropertyName": "data",
+                    "command": upsert_signal_command,
+                    "executeOnce": True,
                 },
-                "name": "Read Signals File",
-                "type": "n8n-nodes-base.readBinaryFile",
+                "name": "Upsert signal",
+                "type": "n8n-nodes-base.executeCommand",
                 "typeVersion": 1,
-                "position": [2180, 560],
-            },
-            {
-                "parameters": {
-                    "operation": "fromFile",
-                    "binaryPropertyName": "data",
-                    "fileFormat": "xlsx",
-                    "options": {
-                        "sheetName": "signals",
-                        "headerRow": True,
-                    },
-                },
-                "name": "Read Signals Sheet",
-                "type": "n8n-nodes-base.spreadsheetFile",
-                "typeVersion": 2,
-                "position": [2400, 560],
-            },
-            {
-                "parameters": {
-                    "mode": "chooseBranch",
-                    "numberInputs": 2,
-                    "chooseBranchMode": "waitForAll",
-                    "output": "empty",
-                },
-                "name": "Wait for signals data",
-                "type": "n8n-nodes-base.merge",
-                "typeVersion": 3.2,
                 "position": [2620, 440],
             },
             {
@@ -1196,119 +1432,46 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                     "fields": {
                         "values": [
                             {
-                                "name": "rows",
-                                "type": "arrayValue",
-                                "arrayValue": "={{ $items('Set signal row (gemini)').map(i => i.json).concat($items('Read Signals Sheet').map(i => i.json)) }}",
-                            }
+                                "name": "result",
+                                "type": "objectValue",
+                                "objectValue": "={{ " + job_result + " }}",
+                            },
                         ]
                     },
                     "include": "none",
                 },
-                "name": "Set combined signals",
+                "name": "Set job result",
                 "type": "n8n-nodes-base.set",
                 "typeVersion": 3.2,
                 "position": [2840, 440],
             },
+            *payload_file_nodes("job result", "result", [3060, 440], source_key="result"),
             {
                 "parameters": {
-                    "resource": "itemList",
-                    "operation": "splitOutItems",
-                    "fieldToSplitOut": "rows",
-                    "include": "noOtherFields",
-                },
-                "name": "Split combined signals",
-                "type": "n8n-nodes-base.itemLists",
-                "typeVersion": 3.1,
-                "position": [3060, 440],
-            },
-            {
-                "parameters": {
-                    "resource": "itemList",
-                    "operation": "sort",
-                    "type": "simple",
-                    "sortFieldsUi": {
-                        "sortField": [
-                            {"fieldName": "created_at", "order": "descending"},
-                        ]
-                    },
-                },
-                "name": "Sort signals (new first)",
-                "type": "n8n-nodes-base.itemLists",
-                "typeVersion": 3.1,
-                "position": [3280, 440],
-            },
-            {
-                "parameters": {
-                    "resource": "itemList",
-                    "operation": "removeDuplicates",
-                    "compare": "selectedFields",
-                    "fieldsToCompare": "key",
-                },
-                "name": "Remove duplicate signals",
-                "type": "n8n-nodes-base.itemLists",
-                "typeVersion": 3.1,
-                "position": [3500, 440],
-            },
-            {
-                "parameters": {
-                    "resource": "itemList",
-                    "operation": "sort",
-                    "type": "simple",
-                    "sortFieldsUi": {
-                        "sortField": [
-                            {"fieldName": "symbol", "order": "ascending"},
-                            {"fieldName": "type", "order": "ascending"},
-                        ]
-                    },
-                },
-                "name": "Sort signals",
-                "type": "n8n-nodes-base.itemLists",
-                "typeVersion": 3.1,
-                "position": [3720, 440],
-            },
-            {
-                "parameters": {
-                    "operation": "toFile",
-                    "fileFormat": "xlsx",
-                    "binaryPropertyName": "data",
-                    "options": {
-                        "sheetName": "signals",
-                        "headerRow": True,
-                        "fileName": "signals.xlsx",
-                    },
-                },
-                "name": "Build signals file",
-                "type": "n8n-nodes-base.spreadsheetFile",
-                "typeVersion": 2,
-                "position": [3940, 440],
-            },
-            {
-                "parameters": {
-                    "fileName": SIGNALS_PATH,
-                    "dataPropertyName": "data",
+                    "command": finish_job_command,
+                    "executeOnce": True,
                 },
-                "name": "Write signals file",
-                "type": "n8n-nodes-base.writeBinaryFile",
+                "name": "Finish analysis job",
+                "type": "n8n-nodes-base.executeCommand",
                 "typeVersion": 1,
-                "position": [4160, 440],
+                "position": [3500, 440],
             },
         ],
         "connections": {
             "Manual Trigger": {
-                "main": [
-                    [
-                        {"node": "Set analyzer params", "type": "main", "index": 0},
-                        {"node": "Read Prices File", "type": "main", "index": 0},
-                    ]
-                ]
+                "main": [[{"node": "Set analyzer params", "type": "main", "index": 0}]]
             },
             "Webhook (analyze)": {
-                "main": [
-                    [
-                        {"node": "Set analyzer params", "type": "main", "index": 0},
-                        {"node": "Read Prices File", "type": "main", "index": 0},
-                    ]
-                ]
+                "main": [[{"node": "Create analysis job", "type": "main", "index": 0}]]
+            },
+            "Create analysis job": {
+                "main": [[{"node": "Respond job accepted", "type": "main", "index": 0}]]
+            },
+            "Respond job accepted": {
+                "main": [[{"node": "Restore webhook request", "type": "main", "index": 0}]]
+            },
+            "Restore webhook request": {
+                "main": [[{"node": "Set analyzer params", "type": "main", "index": 0}]]
             },
             "Set analyzer params": {
                 "main": [
@@ -1320,27 +1483,21 @@ def build_gemini_analyzer_workflow(error_workflow_id):
             "Set search query (analyzer)": {
                 "main": [
                     [
-                        {"node": "Lookup symbol (analyzer)", "type": "main", "index": 0},
+                        {"node": "Resolve symbol (analyzer)", "type": "main", "index": 0},
                         {"node": "Wait for symbol (analyzer)", "type": "main", "index": 0},
                     ]
                 ]
             },
-            "Read Prices File": {
-                "main": [[{"node": "Read Prices Sheet", "type": "main", "index": 0}]]
-            },
-            "Read Prices Sheet": {
-                "main": [[{"node": "Wait for price window data", "type": "main", "index": 0}]]
-            },
-            "Lookup symbol (analyzer)": {
+            "Resolve symbol (analyzer)": {
                 "main": [[{"node": "Wait for symbol (analyzer)", "type": "main", "index": 1}]]
             },
             "Wait for symbol (analyzer)": {
                 "main": [[{"node": "Set analyzer params (resolved)", "type": "main", "index": 0}]]
             },
             "Set analyzer params (resolved)": {
-                "main": [[{"node": "Wait for price window data", "type": "main", "index": 1}]]
+                "main": [[{"node": "Read price window", "type": "main", "index": 0}]]
             },
-            "Wait for price window data": {
+            "Read price window": {
                 "main": [[{"node": "Build price window", "type": "main", "index": 0}]]
             },
             "Build price window": {
@@ -1348,7 +1505,10 @@ def build_gemini_analyzer_workflow(error_workflow_id):
             },
             "IF has rows": {
                 "main": [
-                    [{"node": "Build prompt", "type": "main", "index": 0}],
+                    [
+                        {"node": "Prepare prompt data", "type": "main", "index": 0},
+                        {"node": "Merge prompt data", "type": "main", "index": 0},
+                    ],
                     [{"node": "Fetch prices (on-demand)", "type": "main", "index": 0}],
                 ]
             },
@@ -1356,79 +1516,145 @@ def build_gemini_analyzer_workflow(error_workflow_id):
                 "main": [[{"node": "Set price window (fetched)", "type": "main", "index": 0}]]
             },
             "Set price window (fetched)": {
-                "main": [[{"node": "Build prompt", "type": "main", "index": 0}]]
+                "main": [
+                    [
+                        {"node": "Prepare prompt data", "type": "main", "index": 0},
+                        {"node": "Merge prompt data", "type": "main", "index": 0},
+                    ]
+                ]
             },
-            "Build prompt": {
-                "main": [[{"node": "Message a model", "type": "main", "index": 0}]]
+            "Prepare prompt data": {
+                "main": [[{"node": "Merge prompt data", "type": "main", "index": 1}]]
             },
-            "Message a model": {
-                "main": [[{"node": "Parse analysis JSON", "type": "main", "index": 0}]]
+            "Merge prompt data": {
+                "main": [[{"node": "Build prompt", "type": "main", "index": 0}]]
             },
-            "Parse analysis JSON": {
-                "main": [[{"node": "Set signal row (gemini)", "type": "main", "index": 0}]]
+            "Build prompt": {
+                "main": [[{"node": "Check analysis cache", "type": "main", "index": 0}]]
             },
-            "Read Signals File": {
-                "main": [[{"node": "Read Signals Sheet", "type": "main", "index": 0}]]
+            "Check analysis cache": {
+                "main": [[{"node": "IF cache hit", "type": "main", "index": 0}]]
             },
-            "Read Signals Sheet": {
-                "main": [[{"node": "Wait for signals data", "type": "main", "index": 1}]]
+            "IF cache hit": {
+                "main": [
+                    [{"node": "Set cached analysis", "type": "main", "index": 0}],
+                    [{"node": "Mark model call", "type": "main", "index": 0}],
+                ]
             },
-            "Wait for signals data": {
-                "main": [[{"node": "Set combined signals", "type": "main", "index": 0}]]
+            "Mark model call": {
+                "main": [[{"node": "Wait for Gemini slot", "type": "main", "index": 0}]]
             },
-            "Set combined signals": {
-                "main": [[{"node": "Split combined signals", "type": "main", "index": 0}]]
+            "Wait for Gemini slot": {
+                "main": [[{"node": "Message a model", "type": "main", "index": 0}]]
             },
-            "Split combined signals": {
-                "main": [[{"node": "Sort signals (new first)", "type": "main", "index": 0}]]
+            "Analysis to file": {
+                "main": [[{"node": "Write analysis file", "type": "main", "index": 0}]]
             },
-            "Sort signals (new first)": {
-                "main": [[{"node": "Remove duplicate signals", "type": "main", "index": 0}]]
+            "Write analysis file": {
+                "main": [[{"node": "Store analysis cache", "type": "main", "index": 0}]]
             },
-            "Remove duplicate signals": {
-                "main": [[{"node": "Sort signals", "type": "main", "index": 0}]]
+            "Store analysis cache": {
+                "main": [[{"node": "Report Gemini call", "type": "main", "index": 0}]]
             },
-            "Sort signals": {
-                "main": [[{"node": "Build signals file", "type": "main", "index": 0}]]
+            "Set cached analysis": {
+                "main": [[{"node": "Set signal row (gemini)", "type": "main", "index": 0}]]
             },
-            "Build signals file": {
-                "main": [[{"node": "Write signals file", "type": "main", "index": 0}]]
+            "Message a model": {
+                "main": [[{"node": "Parse analysis JSON", "type": "main", "index": 0}]]
             },
-            "Set signal row (gemini)": {
+            "Parse analysis JSON": {
                 "main": [
                     [
-                        {"node": "Read Signals File", "type": "main", "index": 0},
-                        {"node": "Wait for signals data", "type": "main", "index": 0},
-                        {"node": "Respond to Webhook", "type": "main", "index": 0},
+                        {"node": "Set signal row (gemini)", "type": "main", "index": 0},
+                        {"node": "Analysis to file", "type": "main", "index": 0},
                     ]
                 ]
             },
+            "Set signal row (gemini)": {
+                "main": [[{"node": "Signal row to file", "type": "main", "index": 0}]]
+            },
+            "Signal row to file": {
+                "main": [[{"node": "Write signal row file", "type": "main", "index": 0}]]
+            },
+            "Write signal row file": {
+                "main": [[{"node": "Upsert signal", "type": "main", "index": 0}]]
+            },
+            "Upsert signal": {
+                "main": [[{"node": "Set job result", "type": "main", "index": 0}]]
+            },
+            "Set job result": {
+                "main": [[{"node": "Job result to file", "type": "main", "index": 0}]]
+            },
+            "Job result to file": {
+                "main": [[{"node": "Write job result file", "type": "main", "index": 0}]]
+            },
+            "Write job result file": {
+                "main": [[{"node": "Finish analysis job", "type": "main", "index": 0}]]
+            },
         },
         "settings": {"timezone": "Asia/Seoul", "errorWorkflow": error_workflow_id},
     }
 
 
-def main():
-    api_key = load_api_key()
+def deploy(api_key, dry_run=False, force=False, workers=DEPLOY_WORKERS, shards=ANALYZER_SHARDS):
+    """Deploy every workflow against one listing of the instance. Returns the results in order."""
+    deployed = {}
+    for workflow in list_workflows(api_key):
+        deployed.setdefault(workflow.get("name"), workflow)
 
-    error_workflow = upsert_workflow(api_key, WORKFLOW_B_NAME, build_error_workflow())
-    error_workflow_id = error_workflow["id"]
+    def run(plan):
+        name, workflow, activate = plan
+        return deploy_workflow(api_key, name, workflow, deployed.get(name), activate, force, dry_run)
+
+    if not dry_run:
+        # Write Binary File does not create directories
+        Path(PAYLOAD_DIR).mkdir(parents=True, exist_ok=True)
+    error_result = run((WORKFLOW_B_NAME, build_error_workflow(), False))
+    # A dry run against an instance without the Error Handler has no id to reference yet
+    error_workflow_id = error_result["id"] or "(new error workflow)"
+    plans = [
+        (WORKFLOW_A_NAME, build_collector_workflow(error_workflow_id), False),
+        # Active so the Schedule Trigger fires; the Manual Trigger still runs a full batch on demand
+        (WORKFLOW_D_NAME, build_batch_collector_workflow(error_workflow_id), True),
+        (WORKFLOW_C_NAME, build_gemini_analyzer_workflow(error_workflow_id), True),
+        (WORKFLOW_E_NAME, build_job_status_workflow(error_workflow_id), True),
+    ]
+    plans += [
+        (analyzer_name(shard), build_gemini_analyzer_workflow(error_workflow_id, shard), True)
+        for shard in range(max(shards, 0))
+    ]
+    if shards > 0 and EXPORT_SIGNALS_XLSX:
+        plans.append((WORKFLOW_F_NAME, build_signals_export_workflow(error_workflow_id), True))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        return [error_result] + list(pool.map(run, plans))
 
-    collector_workflow = upsert_workflow(
-        api_key, WORKFLOW_A_NAME, build_collector_workflow(error_workflow_id)
-    )
 
-    analyzer_workflow = upsert_workflow(
-        api_key,
-        WORKFLOW_C_NAME,
-        build_gemini_analyzer_workflow(error_workflow_id),
-        activate=True,
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create or update the n8n workflows, skipping unchanged ones",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
     )
+    parser.add_argument("--dry-run", action="store_true", help="Print what would change (unified diff) and deploy nothing")
+    parser.add_argument("--force", action="store_true", help="PUT every workflow even if unchanged")
+    parser.add_argument("--workers", type=int, default=DEPLOY_WORKERS, help="Workflows deployed at once")
+    parser.add_argument("--shards", type=int, default=ANALYZER_SHARDS, help="Also deploy N Analyzer shards (dispatcher.py)")
+    args = parser.parse_args()
+
+    api_key = load_api_key()
+    started = time.perf_counter()
+    results = deploy(api_key, dry_run=args.dry_run, force=args.force, workers=args.workers, shards=args.shards)
 
-    print("Created/updated workflows:")
-    print(f"- {WORKFLOW_B_NAME}: {error_workflow['id']}")
-    print(f"- {WORKFLOW_A_NAME}: {collector_workflow['id']}")
-    print(f"- {WORKFLOW_C_NAME}: {analyzer_workflow['id']}")
+    print("Planned workflow changes:" if args.dry_run else "Created/updated workflows:")
+    for result in results:
+        print(f"- {result['name']}: {result['id'] or '(new)'} [{result['action']}] {result['hash']}")
+        for line in result["diff"]:
+            print(f"    {line}")
+    changed = sum(1 for r in results if r["action"] != "unchanged")
+    print(
+        f"[info] {changed} of {len(results)} workflows {'would change' if args.dry_run else 'changed'} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
 
 
 if __name__ == "__main__":
@@ -14,6 +14,8 @@ $allowedPaths = @(
   "$env:USERPROFILE\.n8n-files"
 ) -join ";"
 [Environment]::SetEnvironmentVariable("N8N_RESTRICT_FILE_ACCESS_TO", $allowedPaths, "Process")
+# Execute Command nodes run the repo's Python scripts (price store etc.)
+[Environment]::SetEnvironmentVariable("NODES_EXCLUDE", "[]", "Process")
 # Allow env access inside expressions (comma-separated list)
 [Environment]::SetEnvironmentVariable(
   "N8N_ENVIRONMENT_VARIABLES_ALLOWLIST",
@@ -62,6 +64,16 @@ if ($envMap.ContainsKey("GEMINI_API_KEY")) {
 }
 
 Write-Host "Loaded environment variables from .env"
+
+# Single writer for state/prices/signals files (write_queue.py); scripts fall back to a lockfile without it
+$python = if ($envMap.ContainsKey("PYTHON_BIN")) { $envMap["PYTHON_BIN"] } else { "python" }
+$writer = Start-Process -FilePath $python -ArgumentList "`"$(Join-Path $repoRoot 'write_queue.py')`" serve" -WorkingDirectory $repoRoot -NoNewWindow -PassThru
+Write-Host "Started write queue writer (pid $($writer.Id))"
+
 Write-Host "Starting n8n..."
 
-npx n8n
+try {
+  npx n8n
+} finally {
+  Stop-Process -Id $writer.Id -ErrorAction SilentlyContinue
+}
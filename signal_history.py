@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Signal History - append-only signal log partitioned by symbol and month
+
+signals.db keeps only the latest row per key; every analysis is also appended here so
+the model can be evaluated later (backtest.py):
+    data/store/signals/<SYMBOL>/<YYYY-MM>.csv   one partition per bar month
+
+Appends write one line to the current partition, and queries only open the partitions
+they need. Appends and `maintain` rewrites of a partition take its lockfile
+(<YYYY-MM>.csv.lock), so a rewrite never drops a line appended meanwhile. `maintain` applies the retention policy: partitions older than
+--daily-after-months keep the last signal per day, older than --weekly-after-months the
+last per week, and partitions older than --retain-months are deleted.
+
+Usage:
+    python signal_history.py latest AAPL.US
+    python signal_history.py as-of AAPL.US 2026-01-02
+    python signal_history.py range AAPL.US --start 2025-01-01 --end 2025-12-31
+    python signal_history.py maintain --daily-after-months 3 --weekly-after-months 24 --retain-months 60
+    python signal_history.py import-db
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import unquote
+
+import pandas as pd
+
+import signal_store
+
+BASE_DIR = Path(__file__).resolve().parent
+HISTORY_DIR = BASE_DIR / "data" / "store" / "signals"
+HISTORY_COLUMNS = signal_store.SIGNAL_COLUMNS
+
+DAILY_AFTER_MONTHS = int(os.getenv("SIGNAL_HISTORY_DAILY_AFTER_MONTHS", "3"))
+WEEKLY_AFTER_MONTHS = int(os.getenv("SIGNAL_HISTORY_WEEKLY_AFTER_MONTHS", "24"))
+# 0 keeps every partition
+RETAIN_MONTHS = int(os.getenv("SIGNAL_HISTORY_RETAIN_MONTHS", "0"))
+
+# A partition lock is held for one append or one rewrite; older ones were left by a dead process
+LOCK_STALE = 30
+LOCK_TIMEOUT = 30
+
+
+def symbol_dir(symbol, history_dir=HISTORY_DIR):
+    safe = re.sub(r"[^A-Z0-9._-]", "_", (symbol or "").strip().upper())
+    if not safe:
+        raise ValueError("A symbol is required.")
+    return Path(history_dir) / safe
+
+
+def _month(row):
+    day = str(row.get("date") or "")[:10] or str(row.get("created_at") or "")[:10]
+    if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", day):
+        raise ValueError(f"Signal {row.get('key')!r} has no valid date")
+    return day[:7]
+
+
+def _tmp_path(path):
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+@contextmanager
+def _partition_lock(path):
+    """Hold <partition>.lock while appending to or rewriting one partition."""
+    lock_path = path.with_name(f"{path.name}.lock")
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                stale = time.time() - lock_path.stat().st_mtime > LOCK_STALE
+            except FileNotFoundError:
+                continue
+            if stale:
+                try:
+                    lock_path.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{lock_path} is still held")
+            time.sleep(0.005)
+    try:
+        yield
+    finally:
+        try:
+            lock_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _create_partition(path):
+    """Create a partition holding just the header; a no-op when it already exists."""
+    if path.exists():
+        return
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8", newline="") as fh:
+        csv.writer(fh, lineterminator="\n").writerow(HISTORY_COLUMNS)
+    try:
+        # link() fails when the partition exists, so exactly one header is ever written
+        os.link(tmp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        tmp_path.unlink()
+
+
+def append(rows, history_dir=HISTORY_DIR):
+    """Append signal rows to their symbol/month partitions. Returns the number of rows written."""
+    written = 0
+    for row in rows:
+        row = signal_store.clean_row(row)
+        path = symbol_dir(row["symbol"] or row["key"].split("|")[0], history_dir) / f"{_month(row)}.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(["" if row[col] is None else row[col] for col in HISTORY_COLUMNS])
+        # One write per row under the partition lock, so a maintain rewrite never drops it
+        with _partition_lock(path):
+            _create_partition(path)
+            with open(path, "a", encoding="utf-8", newline="") as fh:
+                fh.write(buffer.getvalue())
+        written += 1
+    return written
+
+
+def partitions(symbol, history_dir=HISTORY_DIR):
+    """Sorted month strings (YYYY-MM) stored for a symbol."""
+    directory = symbol_dir(symbol, history_dir)
+    if not directory.exists():
+        return []
+    return sorted(p.stem for p in directory.glob("*.csv") if re.fullmatch(r"\d{4}-\d{2}", p.stem))
+
+
+def _read_partition(symbol, month, history_dir=HISTORY_DIR):
+    frame = pd.read_csv(symbol_dir(symbol, history_dir) / f"{month}.csv", dtype=str, keep_default_na=False)
+    # Partitions written before headers were created atomically may repeat the header line
+    frame = frame[frame["date"] != "date"]
+    return frame.reindex(columns=HISTORY_COLUMNS, fill_value="").reset_index(drop=True)
+
+
+def _sorted(frame):
+    return frame.sort_values(["date", "created_at"], kind="stable").reset_index(drop=True)
+
+
+def read_range(symbol, start=None, end=None, history_dir=HISTORY_DIR):
+    """Signals with start <= date <= end (inclusive, YYYY-MM-DD), oldest first."""
+    months = [
+        m
+        for m in partitions(symbol, history_dir)
+        if (not start or m >= start[:7]) and (not end or m <= end[:7])
+    ]
+    if not months:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    frame = pd.concat([_read_partition(symbol, m, history_dir) for m in months], ignore_index=True)
+    if start:
+        frame = frame[frame["date"] >= start]
+    if end:
+        frame = frame[frame["date"] <= end]
+    return _sorted(frame)
+
+
+def as_of(symbol, date, history_dir=HISTORY_DIR):
+    """The most recent signal whose bar date is on or before `date` (None when there is none)."""
+    for month in reversed([m for m in partitions(symbol, history_dir) if m <= date[:7]]):
+        frame = _read_partition(symbol, month, history_dir)
+        frame = frame[frame["date"] <= date]
+        if not frame.empty:
+            return _sorted(frame).iloc[-1].to_dict()
+    return None
+
+
+def latest(symbol, history_dir=HISTORY_DIR):
+    months = partitions(symbol, history_dir)
+    if not months:
+        return None
+    return _sorted(_read_partition(symbol, months[-1], history_dir)).iloc[-1].to_dict()
+
+
+def list_symbols(history_dir=HISTORY_DIR):
+    history_dir = Path(history_dir)
+    if not history_dir.exists():
+        return []
+    return sorted(p.name for p in history_dir.iterdir() if p.is_dir())
+
+
+def read_all(symbols=None, start=None, end=None, history_dir=HISTORY_DIR):
+    """
+    Signals for many symbols in one frame (backtests). Partitions are parsed with the csv
+    module and turned into a single frame, since per-file read_csv overhead dominates
+    thousands of small monthly files.
+    """
+    records = []
+    for symbol in symbols or list_symbols(history_dir):
+        directory = symbol_dir(symbol, history_dir)
+        for month in partitions(symbol, history_dir):
+            if (start and month < start[:7]) or (end and month > end[:7]):
+                continue
+            with open(directory / f"{month}.csv", encoding="utf-8", newline="") as fh:
+                records.extend(r for r in csv.DictReader(fh) if r.get("date") != "date")
+    frame = pd.DataFrame.from_records(records, columns=HISTORY_COLUMNS).fillna("")
+    if start:
+        frame = frame[frame["date"] >= start]
+    if end:
+        frame = frame[frame["date"] <= end]
+    return _sorted(frame)
+
+
+def _months_between(month, today):
+    return (today.year - int(month[:4])) * 12 + today.month - int(month[5:7])
+
+
+def downsample(frame, rule):
+    """Keep the last signal per day ("daily") or per ISO week ("weekly")."""
+    frame = _sorted(frame)
+    if rule == "daily":
+        bucket = frame["date"]
+    else:
+        bucket = pd.to_datetime(frame["date"]).dt.strftime("%G-%V")
+    return frame[~bucket.duplicated(keep="last")]
+
+
+def maintain(
+    history_dir=HISTORY_DIR,
+    daily_after_months=DAILY_AFTER_MONTHS,
+    weekly_after_months=WEEKLY_AFTER_MONTHS,
+    retain_months=RETAIN_MONTHS,
+    today=None,
+):
+    """Apply retention and downsampling to every closed partition. Returns counters."""
+    today = pd.Timestamp(today or pd.Timestamp.today())
+    stats = {"partitions": 0, "deleted": 0, "rewritten": 0, "rows_removed": 0}
+    for symbol in list_symbols(history_dir):
+        for month in partitions(symbol, history_dir):
+            stats["partitions"] += 1
+            age = _months_between(month, today)
+            path = symbol_dir(symbol, history_dir) / f"{month}.csv"
+            if retain_months and age >= retain_months:
+                with _partition_lock(path):
+                    path.unlink()
+                stats["deleted"] += 1
+                continue
+            if weekly_after_months and age >= weekly_after_months:
+                rule = "weekly"
+            elif daily_after_months and age >= daily_after_months:
+                rule = "daily"
+            else:
+                continue
+            with _partition_lock(path):
+                frame = _read_partition(symbol, month, history_dir)
+                kept = downsample(frame, rule)
+                if len(kept) == len(frame):
+                    continue
+                tmp_path = _tmp_path(path)
+                kept.to_csv(tmp_path, index=False)
+                os.replace(tmp_path, path)
+            stats["rewritten"] += 1
+            stats["rows_removed"] += len(frame) - len(kept)
+    return stats
+
+
+def _print_row(row):
+    print(json.dumps(row, ensure_ascii=False) if row else "null")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Append-only signal history partitioned by symbol and month",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    app = sub.add_parser("append", help="Append one signal row (JSON, may be URL-encoded)")
+    app.add_argument("--row", required=True)
+
+    lat = sub.add_parser("latest", help="Print the newest signal for a symbol")
+    lat.add_argument("symbol")
+
+    asof = sub.add_parser("as-of", help="Print the signal in effect on a date")
+    asof.add_argument("symbol")
+    asof.add_argument("date", help="YYYY-MM-DD")
+
+    rng = sub.add_parser("range", help="Print signals between two dates as JSON")
+    rng.add_argument("symbol")
+    rng.add_argument("--start", default="")
+    rng.add_argument("--end", default="")
+
+    mnt = sub.add_parser("maintain", help="Apply retention and downsampling")
+    mnt.add_argument("--daily-after-months", type=int, default=DAILY_AFTER_MONTHS)
+    mnt.add_argument("--weekly-after-months", type=int, default=WEEKLY_AFTER_MONTHS)
+    mnt.add_argument("--retain-months", type=int, default=RETAIN_MONTHS, help="0 keeps everything")
+
+    sub.add_parser("import-db", help="Seed the history with the rows in data/signals.db")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "append":
+            print(json.dumps({"written": append([json.loads(unquote(args.row))])}))
+        elif args.command == "latest":
+            _print_row(latest(unquote(args.symbol)))
+        elif args.command == "as-of":
+            _print_row(as_of(unquote(args.symbol), unquote(args.date)))
+        elif args.command == "range":
+            frame = read_range(unquote(args.symbol), unquote(args.start), unquote(args.end))
+            print(frame.to_json(orient="records", force_ascii=False))
+        elif args.command == "maintain":
+            stats = maintain(
+                daily_after_months=args.daily_after_months,
+                weekly_after_months=args.weekly_after_months,
+                retain_months=args.retain_months,
+            )
+            print(f"[ok] {json.dumps(stats)}")
+        elif args.command == "import-db":
+            rows = signal_store.read_signals().fillna("").to_dict("records")
+            print(f"[ok] Appended {append(rows)} rows to {HISTORY_DIR}")
+    except ValueError as exc:
+        print(f"[err] {exc}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
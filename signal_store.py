@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Signal Store - keyed SQLite store for Analyzer signals (data/signals.db)
+
+Each Analyzer run upserts one row by key (e.g. AAPL.US|gemini) instead of reloading,
+re-sorting and de-duplicating the whole signals.xlsx. A row only replaces the stored
+one when its created_at is not older. data/signals.xlsx is produced as an export.
+
+Sharded Analyzers (create_n8n_workflows.py --shards N) write to data/shards/<shard>/signals.db
+so they never wait on one database lock; show and export-xlsx read every store, the
+newest row per key winning (a symbol moves shard when the shard count changes).
+
+Usage:
+    python signal_store.py upsert --row '{"key": "AAPL.US|gemini", "symbol": "AAPL.US", ...}'
+    python signal_store.py upsert --row '...' --export-xlsx --history
+    python signal_store.py upsert --row '...' --shard 2
+    python signal_store.py upsert --row-file data/payloads/1234-row.json --history
+    python signal_store.py show AAPL.US
+    python signal_store.py export-xlsx
+    python signal_store.py import-xlsx
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import unquote
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+DB_PATH = BASE_DIR / "data" / "signals.db"
+SIGNALS_XLSX_PATH = BASE_DIR / "data" / "signals.xlsx"
+SHARDS_DIR = BASE_DIR / "data" / "shards"
+
+SIGNAL_COLUMNS = [
+    "key",
+    "symbol",
+    "date",
+    "type",
+    "value",
+    "threshold",
+    "message",
+    "sma20",
+    "sma60",
+    "rsi14",
+    "macd_hist",
+    "atr14",
+    "trend",
+    "created_at",
+]
+NUMERIC_COLUMNS = ["threshold", "sma20", "sma60", "rsi14", "macd_hist", "atr14"]
+
+
+def shard_db_path(shard=None):
+    """signals.db of Analyzer shard `shard` (DB_PATH for the unsharded Analyzer)."""
+    if shard is None or str(shard).strip() == "":
+        return DB_PATH
+    return SHARDS_DIR / str(int(shard)) / "signals.db"
+
+
+def db_paths():
+    """The main store plus every shard store that exists."""
+    return [DB_PATH] + sorted(SHARDS_DIR.glob("*/signals.db"))
+
+
+def connect(db_path=DB_PATH):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    columns = ", ".join(
+        f"{col} {'REAL' if col in NUMERIC_COLUMNS else 'TEXT'}" + (" PRIMARY KEY" if col == "key" else "")
+        for col in SIGNAL_COLUMNS
+    )
+    conn.execute(f"CREATE TABLE IF NOT EXISTS signals ({columns})")
+    conn.execute("CREATE INDEX IF NOT EXISTS signals_symbol ON signals (symbol)")
+    return conn
+
+
+def clean_row(row):
+    row = {col: row.get(col) for col in SIGNAL_COLUMNS}
+    if not row["key"]:
+        raise ValueError("A signal row needs a key (e.g. AAPL.US|gemini).")
+    for col in NUMERIC_COLUMNS:
+        if row[col] == "":
+            row[col] = None
+    row["created_at"] = row["created_at"] or datetime.now(timezone.utc).isoformat()
+    return row
+
+
+def upsert(rows, db_path=DB_PATH):
+    """Insert or replace rows by key (newer created_at wins). Returns the number of rows written."""
+    rows = [clean_row(row) for row in rows]
+    if not rows:
+        return 0
+    placeholders = ", ".join(f":{col}" for col in SIGNAL_COLUMNS)
+    updates = ", ".join(f"{col} = excluded.{col}" for col in SIGNAL_COLUMNS if col != "key")
+    sql = (
+        f"INSERT INTO signals ({', '.join(SIGNAL_COLUMNS)}) VALUES ({placeholders}) "
+        f"ON CONFLICT(key) DO UPDATE SET {updates} "
+        "WHERE excluded.created_at >= COALESCE(signals.created_at, '')"
+    )
+    conn = connect(db_path)
+    try:
+        with conn:
+            written = conn.executemany(sql, rows).rowcount
+    finally:
+        conn.close()
+    return written
+
+
+def _read_db(db_path, symbol=None):
+    conn = connect(db_path)
+    try:
+        query = f"SELECT {', '.join(SIGNAL_COLUMNS)} FROM signals"
+        params = ()
+        if symbol:
+            query += " WHERE symbol = ?"
+            params = ((symbol or "").strip().upper(),)
+        return pd.read_sql_query(query + " ORDER BY symbol, type", conn, params=params)
+    finally:
+        conn.close()
+
+
+def read_signals(symbol=None, db_path=None):
+    """
+    All signals (or one symbol's) sorted by symbol and type, like the legacy sheet.
+    Without db_path the main store and every shard store are merged (newest row per key).
+    """
+    paths = [db_path] if db_path else db_paths()
+    frames = [_read_db(path, symbol) for path in paths]
+    if len(frames) == 1:
+        return frames[0]
+    merged = pd.concat(frames, ignore_index=True).sort_values("created_at", kind="stable")
+    merged = merged.drop_duplicates("key", keep="last")
+    return merged.sort_values(["symbol", "type"], kind="stable").reset_index(drop=True)
+
+
+def export_xlsx(xlsx_path=SIGNALS_XLSX_PATH, db_path=None):
+    """Write the whole store to signals.xlsx (atomic replace). Returns the number of rows."""
+    frame = read_signals(db_path=db_path)
+    xlsx_path = Path(xlsx_path)
+    xlsx_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = xlsx_path.with_name(f"~{os.getpid()}-{threading.get_ident()}-{xlsx_path.name}")
+    frame.to_excel(tmp_path, sheet_name="signals", index=False)
+    os.replace(tmp_path, xlsx_path)
+    return len(frame)
+
+
+def import_xlsx(xlsx_path=SIGNALS_XLSX_PATH, db_path=DB_PATH):
+    """Seed the store from an existing signals.xlsx written by the old workflow tail."""
+    frame = pd.read_excel(xlsx_path, sheet_name="signals", dtype=str).fillna("")
+    frame = frame.rename(columns={c: str(c).strip().lower() for c in frame.columns})
+    rows = [row for row in frame.to_dict("records") if row.get("key")]
+    return upsert(rows, db_path)
+
+
+def reset(db_path=DB_PATH):
+    """Delete every stored signal. Returns the number of rows removed."""
+    conn = connect(db_path)
+    try:
+        with conn:
+            return conn.execute("DELETE FROM signals").rowcount
+    finally:
+        conn.close()
+
+
+def _read_payload(path):
+    """Text of a payload file the workflow wrote (URL-encoded path); the file is removed once read."""
+    path = Path(unquote(path))
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError as exc:
+        raise ValueError(f"Cannot read {path}: {exc}") from exc
+    path.unlink(missing_ok=True)
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keyed SQLite store for Analyzer signals",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    up = sub.add_parser("upsert", help="Upsert one signal row by key")
+    row_group = up.add_mutually_exclusive_group(required=True)
+    row_group.add_argument("--row", help="Signal row JSON (may be URL-encoded)")
+    row_group.add_argument("--row-file", help="File holding the row JSON (removed once read)")
+    up.add_argument("--export-xlsx", action="store_true", help="Also refresh data/signals.xlsx")
+    up.add_argument("--history", action="store_true", help="Also append the row to signal_history.py")
+    up.add_argument("--shard", default="", help="Analyzer shard number (writes data/shards/<shard>/signals.db)")
+
+    show = sub.add_parser("show", help="Print stored signals as JSON")
+    show.add_argument("symbol", nargs="?", default="")
+
+    sub.add_parser("export-xlsx", help="Write the store to data/signals.xlsx")
+    sub.add_parser("import-xlsx", help="Seed the store from data/signals.xlsx")
+
+    args = parser.parse_args()
+
+    if args.command == "upsert":
+        try:
+            row = json.loads(_read_payload(args.row_file) if args.row_file else unquote(args.row))
+            written = upsert([row], shard_db_path(unquote(args.shard)))
+        except ValueError as exc:
+            print(json.dumps({"key": "", "error": str(exc)}))
+            sys.exit(1)
+        result = {"key": row.get("key"), "written": written}
+        if args.history:
+            import signal_history
+
+            try:
+                result["history"] = signal_history.append([row])
+            except Exception as exc:  # noqa: BLE001
+                # The signal itself is stored; a failed history append must not fail the upsert
+                print(f"[warn] History append failed: {exc}", file=sys.stderr)
+                result["history"] = {"error": str(exc)}
+        if args.export_xlsx:
+            # Lazy imports: write_queue and signal_history import this module
+            import write_queue
+
+            write = write_queue.submit([("signals-xlsx", None)])
+            result["export"] = write["mode"]
+            if write.get("error"):
+                result["export_error"] = write["error"]
+        print(json.dumps(result))
+    elif args.command == "show":
+        print(read_signals(unquote(args.symbol) or None).to_json(orient="records", force_ascii=False))
+    elif args.command == "export-xlsx":
+        rows = export_xlsx()
+        print(f"[ok] Wrote {rows} rows to {SIGNALS_XLSX_PATH}")
+    elif args.command == "import-xlsx":
+        rows = import_xlsx()
+        print(f"[ok] Imported {rows} rows into {DB_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Stooq Fetch - incremental daily price download driven by state.xlsx last_date
+
+Instead of downloading a symbol's entire history on every Collector run, only the
+window after last_date is requested (Stooq d1/d2 parameters). Symbols without state
+fall back to a full download, which is merged into the store (over any on-demand Yahoo
+bars) instead of being appended after the last stored date. Each run reports how many
+bytes the window saved compared with a full-history download.
+
+Usage:
+    python stooq_fetch.py AAPL.US
+    python stooq_fetch.py AAPL.US --last-date 2026-01-02
+    python stooq_fetch.py AAPL.US --full
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from urllib.parse import unquote
+
+import pandas as pd
+import requests
+
+import price_store
+import rate_limit
+import write_queue
+
+STOOQ_BASE_URL = os.getenv("STOOQ_BASE_URL", "https://stooq.com")
+EMPTY_LAST_DATE = "1900-01-01"
+
+
+def read_state(state_path=price_store.STATE_XLSX_PATH):
+    """Return {symbol: last_date} from state.xlsx (empty when the file is missing)."""
+    state_path = Path(state_path)
+    if not state_path.exists():
+        return {}
+    state = pd.read_excel(state_path, sheet_name="state", dtype=str).dropna(subset=["symbol"])
+    return {
+        str(row.symbol).strip().upper(): str(row.last_date or "").strip()[:10]
+        for row in state.itertuples()
+        if str(row.last_date or "").strip() not in ("", "nan")
+    }
+
+
+def build_url(symbol, interval="d", start=None, end=None):
+    url = f"{STOOQ_BASE_URL}/q/d/l/?s={symbol.lower()}&i={interval}"
+    if start:
+        url += f"&d1={start.strftime('%Y%m%d')}"
+    if end:
+        url += f"&d2={end.strftime('%Y%m%d')}"
+    return url
+
+
+def fetch_window(symbol, last_date=None, interval="d", session=None, today=None):
+    """
+    Download rows after last_date (or the full history when last_date is empty).
+    Returns (frame, report) where report carries byte counts for the run.
+    """
+    symbol = price_store.normalize_symbol(symbol)
+    last_date = (last_date or "").strip()[:10]
+    if last_date == EMPTY_LAST_DATE:
+        last_date = ""
+    today = today or date.today()
+
+    report = {"symbol": symbol, "mode": "window" if last_date else "full", "last_date": last_date}
+    start = None
+    if last_date:
+        start = datetime.strptime(last_date, "%Y-%m-%d").date() + timedelta(days=1)
+        if start > today:
+            report.update({"mode": "skip", "bytes_fetched": 0, "rows": 0})
+            return pd.DataFrame(columns=price_store.PRICE_COLUMNS), _with_savings(report)
+
+    url = build_url(symbol, interval, start=start, end=today if start else None)
+    resp = rate_limit.request(session, "GET", url, timeout=30)
+    resp.raise_for_status()
+    body = resp.content
+
+    try:
+        raw = pd.read_csv(io.BytesIO(body))
+    except pd.errors.EmptyDataError:
+        raw = pd.DataFrame()
+    frame = price_store.normalize_rows(raw)
+    if last_date:
+        frame = frame[frame["date"] > last_date]
+
+    report.update({"url": url, "bytes_fetched": len(body), "rows": len(frame)})
+    return frame, _with_savings(report)
+
+
+def _with_savings(report):
+    """
+    Estimate what a full-history download would have cost from the bytes per row seen in
+    the stored history (Stooq rows are ~50 bytes), then record the difference.
+    """
+    stored = price_store.row_count(report["symbol"]) if report["mode"] != "full" else 0
+    rows = report.get("rows", 0)
+    fetched = report.get("bytes_fetched", 0)
+    per_row = fetched / rows if rows else 50
+    full_estimate = int(per_row * (stored + rows)) if report["mode"] != "full" else fetched
+    report["bytes_full_estimate"] = max(full_estimate, fetched)
+    report["bytes_saved"] = report["bytes_full_estimate"] - fetched
+    return report
+
+
+def collect(symbol, last_date=None, interval="d", session=None, state_path=price_store.STATE_XLSX_PATH, export_xlsx=False):
+    """
+    Fetch the missing window and hand it to the single writer (write_queue.py) together with
+    the state.xlsx row and the optional prices.xlsx export. A full download is merged, so rows
+    stored before the symbol had state are not cut off.
+    """
+    symbol = price_store.normalize_symbol(symbol)
+    if last_date is None:
+        last_date = read_state(state_path).get(symbol, "")
+    frame, report = fetch_window(symbol, last_date, interval=interval, session=session)
+    full = report["mode"] == "full"
+    appended = price_store.pending_rows(symbol, frame, after=last_date, full=full)
+    report["appended"] = len(appended)
+    report["last_date"] = price_store.last_date(symbol) or report["last_date"]
+    # A full download records state even when it only replaced stored dates, or the next
+    # run would download the full history again
+    if len(appended) or (full and not frame.empty):
+        rows = frame if full else appended
+        # The rows only land once the writer applies them; state is what the store will hold
+        report["last_date"] = max(report["last_date"], rows["date"].max())
+        writes = [write_queue.rows_request(symbol, rows, full=full, after=last_date)]
+        if state_path:
+            writes.append(("state", {"path": str(state_path), "last_dates": {symbol: report["last_date"]}}))
+        if export_xlsx:
+            writes.append(("prices-xlsx", None))
+        report["write"] = write_queue.submit(writes)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download only the missing Stooq window for a symbol and append it to the price store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("symbol", help="Stooq ticker (e.g., AAPL.US)")
+    parser.add_argument("--interval", default="d", help="Stooq interval (default: d)")
+    parser.add_argument(
+        "--last-date",
+        default=None,
+        help="Override last_date instead of reading data/state.xlsx",
+    )
+    parser.add_argument("--full", action="store_true", help="Ignore state and download the full history")
+    parser.add_argument("--export-xlsx", action="store_true", help="Also refresh data/prices.xlsx")
+    args = parser.parse_args()
+
+    last_date = "" if args.full else (unquote(args.last_date) if args.last_date is not None else None)
+    try:
+        report = collect(
+            unquote(args.symbol),
+            last_date=last_date,
+            interval=unquote(args.interval),
+            export_xlsx=args.export_xlsx,
+        )
+    except requests.exceptions.RequestException as exc:
+        print(json.dumps({"symbol": unquote(args.symbol), "error": str(exc)}))
+        sys.exit(1)
+
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
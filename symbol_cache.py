@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Symbol Cache - persistent ticker resolution shared by analyze.py and the n8n workflows
+
+Resolves a ticker or company name to a Stooq-style symbol (e.g. AAPL.US, 005930.KS):
+    1) inputs that already carry a market suffix are returned as-is (no lookup)
+    2) the pre-seeded table (Korean names Yahoo search handles poorly)
+    3) data/symbol_cache.json, keyed by the normalized query, with a TTL
+    4) Yahoo Finance search; failed lookups are cached negatively for a shorter TTL
+
+Usage:
+    python symbol_cache.py resolve "Apple"
+    python symbol_cache.py resolve 삼성전자
+    python symbol_cache.py stats
+    python symbol_cache.py clear
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import unquote
+
+import rate_limit
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_PATH = BASE_DIR / "data" / "symbol_cache.json"
+YAHOO_SEARCH_URL = os.getenv("YAHOO_SEARCH_URL", "https://query1.finance.yahoo.com/v1/finance/search")
+
+POSITIVE_TTL = int(os.getenv("SYMBOL_CACHE_TTL", str(30 * 24 * 3600)))
+NEGATIVE_TTL = int(os.getenv("SYMBOL_CACHE_NEGATIVE_TTL", str(24 * 3600)))
+
+# Matched as substrings of the normalized query (e.g. "삼성전자 주가" -> 005930.KS)
+SEED_SYMBOLS = {
+    "삼성전자": "005930.KS",
+    "카카오": "035720.KS",
+    "네이버": "035420.KS",
+    "엔씨소프트": "036570.KS",
+    "엔씨": "036570.KS",
+    "현대차": "005380.KS",
+    "기아": "000270.KS",
+    "lg에너지솔루션": "373220.KS",
+    "lg화학": "051910.KS",
+    "sk하이닉스": "000660.KS",
+    "posco": "005490.KS",
+    "포스코": "005490.KS",
+}
+
+# Yahoo exchange code -> Stooq market suffix
+EXCHANGE_SUFFIX = {
+    "NMS": "US",
+    "NYQ": "US",
+    "NCM": "US",
+    "NGM": "US",
+    "NIM": "US",
+    "ASE": "US",
+    "BATS": "US",
+    "PCX": "US",
+    "NGQ": "US",
+    "KSC": "KS",
+    "KSE": "KS",
+    "KOE": "KS",
+    "KOS": "KQ",
+    "KOSDAQ": "KQ",
+}
+
+# Serializes the read-modify-write of the cache file between threads of one process
+_cache_lock = threading.Lock()
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", (query or "").strip()).casefold()
+
+
+def load_cache(path=CACHE_PATH):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    """Write atomically so concurrent CLI/n8n runs never see a half-written file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One temp file per writer (process and thread), so concurrent saves never share it
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(cache, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def seed_lookup(key):
+    hit = next((name for name in SEED_SYMBOLS if name in key), None)
+    return SEED_SYMBOLS[hit] if hit else ""
+
+
+def search_yahoo(name, *, count=5, session=None):
+    """
+    Look a company name up with Yahoo Finance's public search API.
+    Returns (symbol, exchange) for the best equity match, ("", "") when nothing matched.
+    """
+    params = {"q": name, "quotesCount": count, "newsCount": 0}
+    resp = rate_limit.request(
+        session,
+        "GET",
+        YAHOO_SEARCH_URL,
+        params=params,
+        headers={"User-Agent": "Mozilla/5.0"},
+        timeout=10,
+    )
+    resp.raise_for_status()
+    data = resp.json() or {}
+    quotes = data.get("quotes") or []
+    candidate = next(
+        (q for q in quotes if (q.get("quoteType") or "").lower() == "equity" and q.get("symbol")),
+        None,
+    )
+    if not candidate and quotes:
+        candidate = quotes[0]
+    if not candidate:
+        return "", ""
+    return (candidate.get("symbol") or "").strip().upper(), (candidate.get("exchange") or "").strip().upper()
+
+
+def with_suffix(symbol, exchange="", default_market_suffix="US"):
+    symbol = (symbol or "").strip().upper()
+    if not symbol or "." in symbol:
+        return symbol
+    suffix = EXCHANGE_SUFFIX.get(exchange) or (default_market_suffix or "").upper()
+    return f"{symbol}.{suffix}" if suffix else symbol
+
+
+def resolve(query, default_market_suffix="US", session=None, cache_path=CACHE_PATH, now=None):
+    """
+    Resolve a ticker or company name. Returns {"query", "symbol", "source"} where source is
+    one of ticker, seed, cache, lookup, miss (negative cache hit), fallback (Yahoo had no match)
+    or error (lookup failed after retries; not cached).
+    """
+    value = (query or "").strip()
+    if not value:
+        raise ValueError("A symbol or company name is required.")
+    if "." in value:
+        return {"query": value, "symbol": value.upper(), "source": "ticker"}
+
+    key = normalize_query(value)
+    seeded = seed_lookup(key)
+    if seeded:
+        return {"query": value, "symbol": seeded, "source": "seed"}
+
+    now = now or time.time()
+    cache = load_cache(cache_path)
+    entry = cache.get(key)
+    if entry:
+        ttl = POSITIVE_TTL if entry.get("symbol") else NEGATIVE_TTL
+        if now - entry.get("resolved_at", 0) < ttl:
+            if entry.get("symbol"):
+                symbol = with_suffix(entry["symbol"], entry.get("exchange", ""), default_market_suffix)
+                return {"query": value, "symbol": symbol, "source": "cache"}
+            return {"query": value, "symbol": with_suffix(value, "", default_market_suffix), "source": "miss"}
+
+    try:
+        symbol, exchange = search_yahoo(value, session=session)
+        source = "lookup" if symbol else "fallback"
+    except Exception as exc:  # noqa: BLE001
+        # Retries and backoff already ran in rate_limit; a throttled or failed lookup is not
+        # cached as a miss, so the next call asks Yahoo again
+        print(f"[warn] Symbol lookup failed for '{value}': {exc}", file=sys.stderr)
+        symbol, exchange, source = "", "", "error"
+
+    if source != "error":
+        with _cache_lock:
+            cache = load_cache(cache_path)
+            cache[key] = {"symbol": symbol, "exchange": exchange, "resolved_at": now}
+            save_cache(cache, cache_path)
+
+    return {
+        "query": value,
+        "symbol": with_suffix(symbol or value, exchange, default_market_suffix),
+        "source": source,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Resolve tickers/company names through the shared on-disk symbol cache",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    res = sub.add_parser("resolve", help="Resolve a ticker or company name and print JSON")
+    res.add_argument("query")
+    res.add_argument("--market", default="US", help="Suffix when the exchange is unknown (default: US)")
+
+    sub.add_parser("stats", help="Show cache entry counts")
+    sub.add_parser("clear", help="Delete the cache file")
+
+    args = parser.parse_args()
+
+    if args.command == "resolve":
+        try:
+            result = resolve(unquote(args.query), default_market_suffix=unquote(args.market))
+        except ValueError as exc:
+            print(json.dumps({"query": "", "symbol": "", "error": str(exc)}))
+            sys.exit(1)
+        print(json.dumps(result, ensure_ascii=False))
+    elif args.command == "stats":
+        cache = load_cache()
+        now = time.time()
+        resolved = sum(1 for e in cache.values() if e.get("symbol"))
+        expired = sum(
+            1
+            for e in cache.values()
+            if now - e.get("resolved_at", 0) >= (POSITIVE_TTL if e.get("symbol") else NEGATIVE_TTL)
+        )
+        print(f"[info] Cache: {CACHE_PATH}")
+        print(f"    Entries: {len(cache)} ({resolved} resolved, {len(cache) - resolved} negative)")
+        print(f"    Expired: {expired}")
+        print(f"    Seeded names: {len(SEED_SYMBOLS)}")
+    elif args.command == "clear":
+        if CACHE_PATH.exists():
+            CACHE_PATH.unlink()
+        print(f"[ok] Cleared {CACHE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import importlib
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+MODULES = sorted(path.stem for path in BASE_DIR.glob("*.py"))
+WRITERS = 16
+
+sys.path.insert(0, str(BASE_DIR))
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """
+    Fresh imports of the repo modules from a temp copy with an empty data/ directory, so
+    the module-level paths (data/store, data/queue, ...) never touch the real data/.
+    """
+    for path in BASE_DIR.glob("*.py"):
+        shutil.copy2(path, tmp_path / path.name)
+    (tmp_path / "data").mkdir()
+    monkeypatch.syspath_prepend(str(tmp_path))
+    saved = {name: sys.modules.pop(name) for name in MODULES if name in sys.modules}
+    yield importlib.import_module
+    for name in MODULES:
+        sys.modules.pop(name, None)
+    sys.modules.update(saved)
+
+
+def _hammer(write, writers=WRITERS, rounds=25):
+    """Run write(writer, round) from `writers` threads released at once; returns the errors raised."""
+    errors = []
+    start = threading.Barrier(writers)
+
+    def run(writer):
+        start.wait()
+        try:
+            for i in range(rounds):
+                write(writer, i)
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(writer,)) for writer in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+@pytest.fixture
+def hammer():
+    return _hammer
@@ -0,0 +1,11 @@
+import json
+
+import analysis_cache
+
+
+def test_concurrent_writes(tmp_path, hammer):
+    path = tmp_path / "ab" / "entry.json"
+    errors = hammer(lambda writer, i: analysis_cache._atomic_write(path, json.dumps({"writer": writer, "round": i})))
+    assert errors == []
+    assert json.loads(path.read_text(encoding="utf-8"))["round"] == 24
+    assert list(path.parent.glob("*.tmp")) == []
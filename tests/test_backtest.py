@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+
+INDEX = pd.to_datetime(["2026-01-02", "2026-01-05", "2026-01-06", "2026-01-07"])
+COLUMNS = pd.Index(["AAPL.US", "MSFT.US"])
+
+
+def signals(*rows):
+    return pd.DataFrame(rows, columns=["symbol", "date", "value", "created_at"])
+
+
+def test_signal_matrix_places_the_latest_signal_on_its_bar():
+    events = backtest.signal_matrix(
+        signals(
+            ["AAPL.US", "2026-01-02", "BUY", "2026-01-02T09:00"],
+            ["AAPL.US", "2026-01-02", "SELL", "2026-01-02T15:00"],
+            # A Sunday signal belongs to Friday's bar
+            ["MSFT.US", "2026-01-04", "buy", "2026-01-04T09:00"],
+            ["MSFT.US", "2026-01-06", "HOLD", "2026-01-06T09:00"],
+            ["AAPL.US", "2025-12-31", "BUY", "2025-12-31T09:00"],
+            ["TSLA.US", "2026-01-05", "BUY", "2026-01-05T09:00"],
+            ["AAPL.US", "2026-01-07", "WAIT", "2026-01-07T09:00"],
+        ),
+        INDEX,
+        COLUMNS,
+    )
+
+    expected = pd.DataFrame([[-1.0, 1.0], [np.nan, np.nan], [np.nan, 0.0], [np.nan, np.nan]], index=INDEX, columns=COLUMNS)
+    pd.testing.assert_frame_equal(events, expected)
+
+
+def test_hit_rates_score_buy_and_sell_against_forward_returns():
+    closes = pd.DataFrame({"AAPL.US": [100.0, 110.0, 99.0, 99.0], "MSFT.US": [50.0, 45.0, 45.0, 60.0]}, index=INDEX)
+    events = pd.DataFrame({"AAPL.US": [1.0, -1.0, 1.0, np.nan], "MSFT.US": [1.0, 0.0, np.nan, -1.0]}, index=INDEX)
+
+    rates = backtest.hit_rates(events, closes, [1])
+
+    # +10%, +10% and 0% for AAPL, -10% for MSFT; HOLD and the last bar are not scored
+    assert rates["1"]["signals"] == 4
+    assert rates["1"]["hit_rate"] == 0.5
+    assert rates["1"]["mean_return"] == pytest.approx(0.025)
+
+
+def test_equity_curve_trades_from_the_next_bar():
+    closes = pd.DataFrame({"AAPL.US": [100.0, 110.0, 99.0, 99.0], "MSFT.US": [50.0, 55.0, 55.0, 66.0]}, index=INDEX)
+    positions = pd.DataFrame({"AAPL.US": [1.0, -1.0, -1.0, -1.0], "MSFT.US": [np.nan, np.nan, 1.0, 1.0]}, index=INDEX)
+
+    returns, equity = backtest.equity_curve(positions, closes)
+    assert returns.tolist() == pytest.approx([0.0, 0.10, 0.10, (0.0 + 0.20) / 2])
+    assert equity.iloc[-1] == pytest.approx(1.1 * 1.1 * 1.1)
+
+    long_only, _ = backtest.equity_curve(positions, closes, long_only=True)
+    assert long_only.tolist() == pytest.approx([0.0, 0.10, 0.0, 0.10])
+
+
+def test_run_backtests_stored_signals(sandbox):
+    price_store = sandbox("price_store")
+    signal_history = sandbox("signal_history")
+    backtest = sandbox("backtest")
+    dates = pd.bdate_range("2025-01-01", periods=80).strftime("%Y-%m-%d")
+    close = np.linspace(100.0, 179.0, 80)
+    price_store.merge_rows("AAPL.US", pd.DataFrame({"date": dates, "open": close, "high": close, "low": close, "close": close, "volume": 1}))
+    signal_history.append([
+        {"key": "AAPL.US|gemini", "symbol": "AAPL.US", "date": dates[10], "value": "BUY", "created_at": f"{dates[10]}T00:00:00"},
+        {"key": "AAPL.US|gemini", "symbol": "AAPL.US", "date": dates[40], "value": "SELL", "created_at": f"{dates[40]}T00:00:00"},
+    ])
+
+    report, curves = backtest.run(horizons=[1], baselines=["sma"], long_only=True)
+
+    signals_report = report["strategies"]["signals"]
+    assert report["bars"] == 80 and signals_report["events"] == 2
+    assert signals_report["hit_rate"]["1"] == {"signals": 2, "hit_rate": 0.5, "mean_return": round((1 / 110 - 1 / 140) / 2, 4)}
+    # Long on bars 11..40 only: a steady +1 per bar from 110 to 140
+    assert curves["signals"].iloc[-1] == pytest.approx(close[40] / close[10])
+    # SMA20 > SMA60 from bar 59 on: the baseline holds the rest of the rise
+    assert curves["sma"].iloc[-1] == pytest.approx(close[-1] / close[59])
@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture
+def dispatcher(sandbox, monkeypatch):
+    module = sandbox("dispatcher")
+    lookups = {"apple": ("AAPL", "NMS"), "aapl": ("AAPL", "NMS")}
+    monkeypatch.setattr(module.symbol_cache, "search_yahoo", lambda name, session=None: lookups[name.lower()])
+    return module
+
+
+@pytest.mark.parametrize("request_body", [
+    {"symbol": "AAPL"},
+    {"symbol": "aapl.us"},
+    {"symbol": " AAPL.US "},
+    {"query": "Apple"},
+    {"company": "apple"},
+])
+def test_routing_key_normalizes_symbols(dispatcher, request_body):
+    assert dispatcher.routing_key(request_body) == "AAPL.US"
+
+
+def test_normalized_symbols_share_a_shard(dispatcher):
+    shards = {dispatcher.shard_for(dispatcher.routing_key({"symbol": s}), 4) for s in ("AAPL", "aapl.us", "AAPL.US")}
+    assert len(shards) == 1
+
+
+def test_routing_key_keeps_market_suffixes(dispatcher):
+    assert dispatcher.routing_key({"symbol": "005930.ks"}) == "005930.KS"
+    assert dispatcher.routing_key({"symbol": "AAPL", "market": "KS"}) == "AAPL.US"
+    assert dispatcher.routing_key({}) == ""
+
+
+def test_route_reports_one_assignment_per_symbol(dispatcher):
+    out = dispatcher.route(["AAPL", "AAPL.US", "005930.KS"], 4)
+    assert sorted(out["assignments"]) == ["005930.KS", "AAPL.US"]
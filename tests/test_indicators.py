@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+
+
+def ewm(values, alpha):
+    """Recursive EMA seeded with the first value (adjust=False), skipping leading NaNs."""
+    out, avg = [], None
+    for value in values:
+        if not math.isnan(value):
+            avg = value if avg is None else avg + alpha * (value - avg)
+        out.append(avg)
+    return out
+
+
+def wilder_rsi(close, window=14):
+    deltas = [math.nan] + [b - a for a, b in zip(close, close[1:])]
+    gains = ewm([d if math.isnan(d) else max(d, 0.0) for d in deltas], 1 / window)
+    losses = ewm([d if math.isnan(d) else max(-d, 0.0) for d in deltas], 1 / window)
+    return [
+        math.nan if i < window else (100.0 if loss == 0 else 100 - 100 / (1 + gain / loss))
+        for i, (gain, loss) in enumerate(zip(gains, losses))
+    ]
+
+
+@pytest.fixture
+def close():
+    rng = np.random.default_rng(7)
+    return pd.Series(100 + rng.normal(0, 1.5, 120).cumsum())
+
+
+def bars(close):
+    dates = pd.bdate_range("2025-01-01", periods=len(close)).strftime("%Y-%m-%d")
+    return pd.DataFrame({"date": dates, "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1000})
+
+
+def test_rsi_matches_wilder_smoothing(close):
+    expected = wilder_rsi(close.tolist())
+    actual = indicators.rsi(close)
+
+    assert actual[:14].isna().all()
+    assert actual[14:].tolist() == pytest.approx(expected[14:])
+
+
+def test_rsi_bounds_on_one_way_moves():
+    rising = pd.Series(np.arange(1.0, 31.0))
+    assert indicators.rsi(rising).dropna().eq(100.0).all()
+    assert indicators.rsi(rising[::-1].reset_index(drop=True)).dropna().eq(0.0).all()
+
+
+def test_macd_matches_recursive_emas(close):
+    values = close.tolist()
+    fast, slow = ewm(values, 2 / 13), ewm(values, 2 / 27)
+    line = [f - s if i >= 25 else math.nan for i, (f, s) in enumerate(zip(fast, slow))]
+    signal = ewm(line, 2 / 10)
+
+    macd_line, signal_line, hist = indicators.macd(close)
+
+    assert macd_line[:25].isna().all() and signal_line[:33].isna().all()
+    assert macd_line[25:].tolist() == pytest.approx(line[25:])
+    assert signal_line[33:].tolist() == pytest.approx(signal[33:])
+    assert hist[33:].tolist() == pytest.approx([m - s for m, s in zip(line[33:], signal[33:])])
+
+
+def test_latest_indicators_on_a_steady_uptrend():
+    result = indicators.latest_indicators(bars(pd.Series(np.linspace(100.0, 159.5, 120))))
+
+    assert result["rows"] == 120 and result["as_of"] == "2025-06-17"
+    assert result["sma20"] == pytest.approx(159.5 - 9.5 * 0.5)
+    assert result["rsi14"] == 100.0
+    assert result["macd_hist"] == pytest.approx(0.0, abs=1e-3)
+    # A flat +0.5 step: the true range is the 2.0 high-low span on every bar
+    assert result["atr14"] == pytest.approx(2.0)
+    assert result["trend"] == "up"
+
+
+def test_latest_indicators_without_enough_rows():
+    assert indicators.latest_indicators(pd.DataFrame()) == {"as_of": "", "rows": 0}
+    result = indicators.latest_indicators(bars(pd.Series([10.0, 11.0, 12.0])))
+    assert result["sma20"] is None and result["rsi14"] is None and result["trend"] is None
@@ -0,0 +1,27 @@
+import json
+
+import jobs
+
+
+def test_concurrent_writes(tmp_path, hammer):
+    path = tmp_path / "1234.json"
+    errors = hammer(lambda writer, i: jobs._write(path, {"job_id": "1234", "status": "running", "writer": writer}))
+    assert errors == []
+    assert json.loads(path.read_text(encoding="utf-8"))["job_id"] == "1234"
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_finish_reads_the_result_from_a_payload_file(sandbox, tmp_path, monkeypatch, capsys):
+    jobs = sandbox("jobs")
+    # URL-encoded, this summary alone is past cmd.exe's 8191-character command line
+    result = {"key": "005930.KS|gemini", "message": "반도체 업황 회복 " * 200}
+    payload = tmp_path / "data" / "payloads" / "1234-result.json"
+    payload.parent.mkdir()
+    payload.write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["jobs.py", "finish", "1234", "--result-file", str(payload)])
+
+    jobs.main()
+
+    assert json.loads(capsys.readouterr().out)["status"] == "done"
+    assert jobs.read_job("1234")["result"] == result
+    assert not payload.exists()
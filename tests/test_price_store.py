@@ -0,0 +1,106 @@
+import pandas as pd
+
+SYMBOL = "AAPL.US"
+
+
+def history(rows=300, bump=0.0):
+    dates = pd.bdate_range("2025-01-01", periods=rows).strftime("%Y-%m-%d")
+    closes = [100.0 + i + bump for i in range(rows)]
+    return pd.DataFrame({"date": dates, "open": closes, "high": closes, "low": closes, "close": closes, "volume": 1000})
+
+
+def seed_from_yahoo(sandbox, rows=60):
+    """Store the latest `rows` bars the way an on-demand Analyzer fetch does."""
+    price_store = sandbox("price_store")
+    yahoo_chart = sandbox("yahoo_chart")
+    yahoo = price_store.normalize_rows(history(bump=0.5).tail(rows))
+    stored, write = yahoo_chart.store_rows(SYMBOL, yahoo)
+    assert stored == rows
+    assert write["mode"] == "direct"
+    assert price_store.row_count(SYMBOL) == rows
+    return price_store
+
+
+def test_full_collect_after_yahoo_seed_keeps_history(sandbox, tmp_path, monkeypatch):
+    price_store = seed_from_yahoo(sandbox)
+    stooq_fetch = sandbox("stooq_fetch")
+    full = history()
+    monkeypatch.setattr(
+        stooq_fetch,
+        "fetch_window",
+        lambda symbol, last_date, interval="d", session=None: (
+            price_store.normalize_rows(full),
+            {"symbol": symbol, "mode": "full", "last_date": "", "rows": len(full)},
+        ),
+    )
+
+    report = stooq_fetch.collect(SYMBOL, last_date="", state_path=tmp_path / "state.xlsx")
+
+    stored = price_store.read_symbol(SYMBOL)
+    assert len(stored) == len(full)
+    assert stored["date"].iloc[0] == full["date"].iloc[0]
+    # Stooq rows replace the Yahoo bars of the same dates
+    assert stored["close"].tolist() == full["close"].tolist()
+    # Only the dates the Yahoo seed did not cover count as appended
+    assert report["appended"] == len(full) - 60
+    assert report["last_date"] == full["date"].iloc[-1]
+    assert price_store.read_index()[SYMBOL]["rows"] == len(full)
+    assert stooq_fetch.read_state(tmp_path / "state.xlsx") == {SYMBOL: full["date"].iloc[-1]}
+
+
+def test_full_collect_over_the_same_dates_still_records_state(sandbox, tmp_path, monkeypatch):
+    price_store = seed_from_yahoo(sandbox)
+    stooq_fetch = sandbox("stooq_fetch")
+    recent = price_store.normalize_rows(history().tail(60))
+    monkeypatch.setattr(
+        stooq_fetch,
+        "fetch_window",
+        lambda symbol, last_date, interval="d", session=None: (recent, {"symbol": symbol, "mode": "full", "last_date": ""}),
+    )
+
+    report = stooq_fetch.collect(SYMBOL, last_date="", state_path=tmp_path / "state.xlsx")
+
+    assert report["appended"] == 0
+    assert price_store.read_symbol(SYMBOL)["close"].tolist() == recent["close"].tolist()
+    assert stooq_fetch.read_state(tmp_path / "state.xlsx") == {SYMBOL: recent["date"].iloc[-1]}
+
+
+def test_full_ingest_csv_after_yahoo_seed_keeps_history(sandbox, tmp_path):
+    price_store = seed_from_yahoo(sandbox)
+    csv_path = tmp_path / "AAPL.US.csv"
+    history().to_csv(csv_path, index=False)
+
+    result = price_store.ingest_csv(SYMBOL, csv_path, after="", state_path=None)
+
+    assert price_store.row_count(SYMBOL) == 300
+    assert result["appended"] == 240
+    assert result["last_date"] == history()["date"].iloc[-1]
+
+
+def test_incremental_collect_still_appends_only_new_rows(sandbox, tmp_path):
+    price_store = seed_from_yahoo(sandbox)
+    csv_path = tmp_path / "AAPL.US.csv"
+    history().to_csv(csv_path, index=False)
+
+    result = price_store.ingest_csv(SYMBOL, csv_path, after=history()["date"].iloc[-2], state_path=None)
+
+    assert result["appended"] == 0
+    assert price_store.row_count(SYMBOL) == 60
+
+
+def test_batch_collect_takes_state_from_the_store(sandbox, tmp_path, monkeypatch):
+    price_store = seed_from_yahoo(sandbox)
+    stooq_fetch = sandbox("stooq_fetch")
+    collect_batch = sandbox("collect_batch")
+    full = price_store.normalize_rows(history().head(200))
+    monkeypatch.setattr(
+        stooq_fetch,
+        "fetch_window",
+        lambda symbol, last_date, interval="d", session=None: (full, {"symbol": symbol, "mode": "full", "last_date": ""}),
+    )
+
+    summary = collect_batch.collect_batch([{"symbol": SYMBOL, "interval": "d"}], workers=1, state_path=tmp_path / "state.xlsx")
+
+    assert summary["appended"] == 200
+    # The Yahoo bars are newer than the download, so state follows the store, not the frame
+    assert stooq_fetch.read_state(tmp_path / "state.xlsx") == {SYMBOL: history()["date"].iloc[-1]}
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import prompt_compact
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["date", "open", "high", "low", "close", "volume"])
+
+
+def decode_delta(text):
+    """Rebuild (date, close) pairs from an encode_delta body."""
+    lines = text.splitlines()
+    first = lines[0].split(",")
+    date, close = pd.Timestamp(first[0]), float(first[4])
+    out = [(first[0], close)]
+    for line in lines[1:]:
+        fields = line.split(",")
+        date += pd.Timedelta(days=int(fields[0]))
+        if fields[4]:
+            close += float(fields[4])
+        out.append((date.strftime("%Y-%m-%d"), close))
+    return out
+
+
+def test_delta_encodes_changes_against_the_previous_close():
+    _, text = prompt_compact.encode_delta(frame([
+        ["2026-01-02", 100.0, 101.5, 99.25, 100.5, 1_200_000],
+        ["2026-01-05", 100.75, 102.0, 100.0, 101.0, 950_000],
+        ["2026-01-06", 101.0, 101.0, 99.5, 99.75, 2_000],
+    ]))
+
+    assert text.splitlines() == [
+        "2026-01-02,100.0,101.5,99.25,100.5,1.2M",
+        # Changes carry the first close's absolute precision (one decimal around 100)
+        "+3,0.2,1.5,-0.5,0.5,950.0K",
+        "+1,0.0,0.0,-1.5,-1.2,2.0K",
+    ]
+
+
+def test_delta_changes_stay_within_the_rounding():
+    rng = np.random.default_rng(3)
+    close = 50 + rng.normal(0, 0.8, 60).cumsum()
+    dates = pd.bdate_range("2025-03-03", periods=60).strftime("%Y-%m-%d")
+    window = frame({"date": dates, "open": close, "high": close + 0.5, "low": close - 0.5, "close": close, "volume": 1e6})
+
+    decoded = decode_delta(prompt_compact.encode_delta(window)[1])
+
+    assert [d for d, _ in decoded] == list(dates)
+    # Two decimals around 50: every step is off by at most half a cent
+    closes = [c for _, c in decoded]
+    assert np.diff(closes).tolist() == pytest.approx(np.diff(close).tolist(), abs=0.0051)
+    assert closes[0] == pytest.approx(close[0], abs=0.0051)
+
+
+def test_delta_keeps_the_last_close_across_a_missing_one():
+    _, text = prompt_compact.encode_delta(frame([
+        ["2026-01-02", 10.0, 10.0, 10.0, 10.0, 1],
+        ["2026-01-05", 10.5, 10.5, 10.5, None, 1],
+        ["2026-01-06", 11.0, 11.0, 11.0, 11.0, 1],
+    ]))
+
+    assert text.splitlines()[1:] == ["+3,0.50,0.50,0.50,,1", "+1,1.00,1.00,1.00,1.00,1"]
+
+
+@pytest.mark.parametrize("value, expected", [(1234.5678, "1235"), (0.012345, "0.01235"), (-2.5, "-2.500"), (0, "0"), (None, "")])
+def test_num_keeps_four_significant_digits(value, expected):
+    assert prompt_compact._num(value) == expected
+
+
+def test_auto_mode_picks_the_most_detailed_encoding_under_budget():
+    dates = pd.bdate_range("2025-01-01", periods=250).strftime("%Y-%m-%d")
+    close = np.linspace(100, 150, 250)
+    window = frame({"date": dates, "open": close, "high": close, "low": close, "close": close, "volume": 1e6})
+
+    sizes = {mode: prompt_compact.compact_window(window, mode=mode)["est_tokens"] for mode in prompt_compact.MODES}
+    budget = sizes["delta"]
+    result = prompt_compact.compact_window(window, budget=budget)
+
+    assert sizes["csv"] > sizes["rounded"] > budget
+    assert result["mode"] == "delta" and result["est_tokens"] <= budget
+    assert prompt_compact.compact_window(window, budget=1)["mode"] == "summary-short"
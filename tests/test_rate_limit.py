@@ -0,0 +1,98 @@
+import pytest
+import requests
+
+import rate_limit
+
+HOST = "generativelanguage.googleapis.com"
+
+
+def fail(state_dir, now, times=1, status=503):
+    for _ in range(times):
+        state = rate_limit.record(HOST, status, now=now, state_dir=state_dir)
+    return state
+
+
+def test_breaker_opens_after_threshold_failures(tmp_path):
+    assert fail(tmp_path, 1000.0, rate_limit.BREAKER_THRESHOLD - 1)["circuit"] == "closed"
+    state = fail(tmp_path, 1000.0)
+
+    assert state["circuit"] == "open"
+    assert state["open_until"] == 1000.0 + rate_limit.BREAKER_COOLDOWN
+    with pytest.raises(rate_limit.CircuitOpenError):
+        rate_limit.reserve(HOST, now=1000.0 + rate_limit.BREAKER_COOLDOWN - 1, state_dir=tmp_path)
+
+
+def test_breaker_lets_one_trial_through_and_closes_on_success(tmp_path):
+    fail(tmp_path, 1000.0, rate_limit.BREAKER_THRESHOLD)
+    after = 1000.0 + rate_limit.BREAKER_COOLDOWN
+
+    rate_limit.reserve(HOST, now=after, state_dir=tmp_path)
+    assert rate_limit.status(tmp_path)[HOST]["circuit"] == "half_open"
+    # Only the trial goes out while it is in flight
+    with pytest.raises(rate_limit.CircuitOpenError):
+        rate_limit.reserve(HOST, now=after + 1, state_dir=tmp_path)
+
+    state = rate_limit.record(HOST, 200, now=after + 2, state_dir=tmp_path)
+    assert state["circuit"] == "closed" and state["failures"] == 0
+    assert rate_limit.reserve(HOST, now=after + 3, state_dir=tmp_path) >= 0
+
+
+def test_failed_trial_reopens_the_circuit(tmp_path):
+    fail(tmp_path, 1000.0, rate_limit.BREAKER_THRESHOLD)
+    after = 1000.0 + rate_limit.BREAKER_COOLDOWN
+    rate_limit.reserve(HOST, now=after, state_dir=tmp_path)
+
+    state = fail(tmp_path, after + 1)
+
+    assert state["circuit"] == "open"
+    assert state["open_until"] == after + 1 + rate_limit.BREAKER_COOLDOWN
+
+
+def test_throttling_halves_the_rate_and_honours_retry_after(tmp_path):
+    limits = rate_limit.limits_for(HOST)
+    state = rate_limit.record(HOST, 429, retry_after=30, now=1000.0, state_dir=tmp_path)
+
+    assert state["rate"] == limits["rate"] / 2
+    assert rate_limit.reserve(HOST, now=1010.0, state_dir=tmp_path) == pytest.approx(20.0)
+    # A Retry-After beyond the cap blocks the host for BACKOFF_CAP only
+    state = rate_limit.record(HOST, 429, retry_after=10_000, now=1000.0, state_dir=tmp_path)
+    assert state["blocked_until"] == 1000.0 + rate_limit.BACKOFF_CAP
+
+
+def test_bucket_waits_once_the_burst_is_spent(tmp_path):
+    limits = rate_limit.limits_for(HOST)
+    waits = [rate_limit.reserve(HOST, now=1000.0, state_dir=tmp_path) for _ in range(int(limits["burst"]) + 1)]
+
+    assert waits[:-1] == [0.0] * int(limits["burst"])
+    assert waits[-1] == pytest.approx(1 / limits["rate"])
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = self.statuses.pop(0)
+        return response
+
+
+def test_request_retries_until_success_and_resets_failures(sandbox, monkeypatch):
+    limiter = sandbox("rate_limit")
+    monkeypatch.setattr(limiter.time, "sleep", lambda seconds: None)
+
+    response = limiter.request(FakeSession([503, 502, 200]), "GET", f"https://{HOST}/v1/models")
+
+    assert response.status_code == 200
+    state = limiter.status()[HOST]
+    assert state["failures"] == 0 and state["circuit"] == "closed"
+
+
+def test_request_fails_fast_while_the_circuit_is_open(sandbox, monkeypatch):
+    limiter = sandbox("rate_limit")
+    monkeypatch.setattr(limiter.time, "sleep", lambda seconds: None)
+    session = FakeSession([503] * limiter.BREAKER_THRESHOLD)
+
+    assert limiter.request(session, "GET", f"https://{HOST}/", max_attempts=limiter.BREAKER_THRESHOLD).status_code == 503
+    with pytest.raises(limiter.CircuitOpenError):
+        limiter.request(FakeSession([200]), "GET", f"https://{HOST}/")
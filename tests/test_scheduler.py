@@ -0,0 +1,94 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+import scheduler
+
+CALENDAR_CSV = """\
+# test calendar
+market,date,close,name
+US,2026-04-03,,Good Friday
+US,2026-11-27,13:00,Day after Thanksgiving
+KR,2026-02-16,,Seollal
+KR,2026-02-17,,Seollal
+KR,2026-02-18,,Seollal
+"""
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    path = tmp_path / "market_calendar.csv"
+    path.write_text(CALENDAR_CSV, encoding="utf-8")
+    return scheduler.load_calendar(path)
+
+
+def utc(text):
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc)
+
+
+def test_session_close_skips_weekends_and_holidays(calendar):
+    assert scheduler.session_close("US", date(2026, 4, 4), calendar) is None
+    assert scheduler.session_close("US", date(2026, 4, 3), calendar) is None
+    assert scheduler.session_close("US", date(2026, 11, 27), calendar).isoformat() == "2026-11-27T13:00:00-05:00"
+    assert scheduler.session_close("KR", date(2026, 4, 3), calendar).isoformat() == "2026-04-03T15:30:00+09:00"
+
+
+@pytest.mark.parametrize("market, now, session", [
+    # Monday before the close: the last bar is Thursday's, since Good Friday was closed
+    ("US", "2026-04-06T15:00:00", "2026-04-02"),
+    # 16:44 New York (EDT) is still inside the 45 minute publishing delay; 16:45 is not
+    ("US", "2026-04-07T20:44:00", "2026-04-06"),
+    ("US", "2026-04-07T20:45:00", "2026-04-07"),
+    # Seollal plus the weekend before it: Friday the 13th is the latest session
+    ("KR", "2026-02-18T12:00:00", "2026-02-13"),
+])
+def test_latest_session_respects_calendar_and_delay(calendar, market, now, session):
+    day, ready = scheduler.latest_session(market, utc(now), calendar)
+    assert day.isoformat() == session
+    assert ready <= utc(now)
+
+
+def test_next_session_after_a_holiday_run(calendar):
+    day, ready = scheduler.next_session("KR", utc("2026-02-14T00:00:00"), calendar)
+    assert day.isoformat() == "2026-02-19"
+    assert ready.isoformat() == "2026-02-19T16:15:00+09:00"
+
+
+def test_due_markets_retries_failed_sessions_up_to_max_attempts(calendar):
+    now = utc("2026-04-07T21:00:00")
+    groups = {"US": [{"symbol": "AAPL.US"}]}
+    session = "2026-04-07"
+
+    def due(state, force=False):
+        return [item["market"] for item in scheduler.due_markets(now, groups, state, calendar, force=force)]
+
+    assert due({}) == ["US"]
+    assert due({"US": {"session": "2026-04-06", "ok": True}}) == ["US"]
+    assert due({"US": {"session": session, "ok": True}}) == []
+    assert due({"US": {"session": session, "ok": False, "attempts": scheduler.MAX_ATTEMPTS - 1}}) == ["US"]
+    assert due({"US": {"session": session, "ok": False, "attempts": scheduler.MAX_ATTEMPTS}}) == []
+    assert due({"US": {"session": session, "ok": True}}, force=True) == ["US"]
+
+
+def test_run_collects_each_session_once(tmp_path, monkeypatch):
+    (tmp_path / "cal.csv").write_text(CALENDAR_CSV, encoding="utf-8")
+    entries = [{"symbol": "AAPL.US", "interval": "d"}, {"symbol": "005930.KS", "interval": "d"}, {"symbol": "BTC.V", "interval": "d"}]
+    batches = []
+    monkeypatch.setattr(scheduler.collect_batch, "read_config", lambda path: entries)
+    monkeypatch.setattr(
+        scheduler.collect_batch,
+        "collect_batch",
+        lambda items, workers, stagger: batches.append([e["symbol"] for e in items]) or {"ok": len(items), "failed": [], "appended": 1, "total_seconds": 0.1},
+    )
+    options = {"state_path": tmp_path / "state.json", "calendar_path": tmp_path / "cal.csv", "config_path": "config.xlsx"}
+
+    # 21:00 UTC: the US close has published, and Seoul (06:00 the next day) is past Tuesday's close
+    first = scheduler.run(now=utc("2026-04-07T21:00:00"), **options)
+    second = scheduler.run(now=utc("2026-04-07T21:15:00"), **options)
+
+    assert sorted(item["market"] for item in first["due"]) == ["KR", "US"]
+    assert first["unscheduled"] == ["BTC.V"]
+    assert second["due"] == []
+    assert sorted(batches) == [["005930.KS"], ["AAPL.US"]]
+    state = scheduler.load_state(options["state_path"])
+    assert {k: state["US"][k] for k in ("session", "ok", "attempts")} == {"session": "2026-04-07", "ok": True, "attempts": 1}
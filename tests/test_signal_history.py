@@ -0,0 +1,80 @@
+import pytest
+
+
+def signal(date, created_at=None, value=1.0, symbol="AAPL.US"):
+    return {
+        "key": f"{symbol}|gemini",
+        "symbol": symbol,
+        "date": date,
+        "type": "rsi",
+        "value": value,
+        "created_at": created_at or f"{date}T00:00:00+00:00",
+    }
+
+
+@pytest.fixture
+def history(sandbox):
+    module = sandbox("signal_history")
+    module.HISTORY_DIR.mkdir(parents=True)
+    return module
+
+
+def test_concurrent_first_appends_write_one_header(history, hammer):
+    # Every round opens a new month, so all writers race to create the same partition
+    def write(writer, i):
+        history.append([signal(f"{2000 + i}-01-{writer + 1:02d}")])
+
+    assert hammer(write, rounds=10) == []
+    for month in history.partitions("AAPL.US"):
+        lines = (history.symbol_dir("AAPL.US") / f"{month}.csv").read_text(encoding="utf-8").splitlines()
+        assert lines[0].startswith("key,")
+        assert sum(line.startswith("key,") for line in lines) == 1
+    assert len(history.read_all()) == 16 * 10
+
+
+def test_repeated_header_rows_are_ignored(history):
+    history.append([signal("2026-01-05")])
+    path = history.symbol_dir("AAPL.US") / "2026-01.csv"
+    path.write_text(path.read_text(encoding="utf-8") * 2, encoding="utf-8")
+
+    assert history.latest("AAPL.US")["date"] == "2026-01-05"
+    assert history.read_all()["date"].tolist() == ["2026-01-05", "2026-01-05"]
+    assert history.maintain(weekly_after_months=1, today="2026-06-01")["rows_removed"] == 1
+
+
+def test_as_of_returns_the_signal_in_effect(history):
+    history.append([signal("2025-12-30", value=1), signal("2026-01-05", value=2), signal("2026-02-02", value=3)])
+    history.append([signal("2026-01-05", created_at="2026-01-06T00:00:00+00:00", value=4)])
+
+    assert history.as_of("AAPL.US", "2025-12-01") is None
+    assert history.as_of("AAPL.US", "2026-01-31")["value"] == "4"
+    assert history.as_of("AAPL.US", "2026-01-04")["value"] == "1"
+    assert history.latest("AAPL.US")["value"] == "3"
+    assert history.latest("MSFT.US") is None
+
+
+def test_maintain_downsamples_and_retains_by_age(history):
+    today = "2026-06-15"
+    # Two signals a day for a week, in a month due for daily, weekly and retention rules
+    for month in ("2026-01", "2024-01", "2020-01"):
+        history.append(signal(f"{month}-{day:02d}", f"{month}-{day:02d}T{hour:02d}:00:00+00:00") for day in range(5, 10) for hour in (9, 15))
+
+    stats = history.maintain(daily_after_months=3, weekly_after_months=24, retain_months=72, today=today)
+
+    assert stats == {"partitions": 3, "deleted": 1, "rewritten": 2, "rows_removed": 5 + 8}
+    assert history.partitions("AAPL.US") == ["2024-01", "2026-01"]
+    daily = history.read_range("AAPL.US", "2026-01-01", "2026-01-31")
+    assert daily["created_at"].str[11:13].tolist() == ["15"] * 5
+    weekly = history.read_range("AAPL.US", "2024-01-01", "2024-01-31")
+    assert weekly["created_at"].tolist() == ["2024-01-07T15:00:00+00:00", "2024-01-09T15:00:00+00:00"]
+
+
+def test_maintain_waits_for_a_held_partition_lock(history, monkeypatch):
+    history.append([signal("2024-01-05"), signal("2024-01-05")])
+    path = history.symbol_dir("AAPL.US") / "2024-01.csv"
+    path.with_name(f"{path.name}.lock").touch()
+    monkeypatch.setattr(history, "LOCK_TIMEOUT", 0.2)
+
+    with pytest.raises(TimeoutError):
+        history.maintain(daily_after_months=1, today="2026-06-01")
+    assert len(history.read_range("AAPL.US")) == 2
@@ -0,0 +1,30 @@
+import json
+
+import symbol_cache
+
+
+def test_concurrent_saves(tmp_path, hammer):
+    path = tmp_path / "symbol_cache.json"
+    errors = hammer(lambda writer, i: symbol_cache.save_cache({f"w{writer}": i}, path))
+    assert errors == []
+    assert len(json.loads(path.read_text(encoding="utf-8"))) == 1
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_concurrent_resolves_keep_every_entry(tmp_path, monkeypatch, hammer):
+    path = tmp_path / "symbol_cache.json"
+    monkeypatch.setattr(symbol_cache, "search_yahoo", lambda name, session=None: (name.upper(), "NMS"))
+    names = [f"company {n}" for n in range(16)]
+    errors = hammer(lambda writer, i: symbol_cache.resolve(names[writer], cache_path=path), writers=len(names))
+    assert errors == []
+    assert sorted(json.loads(path.read_text(encoding="utf-8"))) == sorted(names)
+
+
+def test_resolve_uses_the_cache_within_ttl(tmp_path, monkeypatch):
+    path = tmp_path / "symbol_cache.json"
+    calls = []
+    monkeypatch.setattr(symbol_cache, "search_yahoo", lambda name, session=None: calls.append(name) or ("AAPL", "NMS"))
+    assert symbol_cache.resolve("Apple", cache_path=path, now=1000)["source"] == "lookup"
+    assert symbol_cache.resolve("  apple ", cache_path=path, now=2000) == {"query": "apple", "symbol": "AAPL.US", "source": "cache"}
+    assert calls == ["Apple"]
+    assert symbol_cache.resolve("aapl.us", cache_path=path)["source"] == "ticker"
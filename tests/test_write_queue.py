@@ -0,0 +1,71 @@
+import json
+import os
+import time
+
+import pandas as pd
+
+
+def hold_lock(write_queue, mode="daemon", age=0.0):
+    """Write a lockfile for another process, refreshed `age` seconds ago."""
+    path = write_queue.QUEUE_DIR / write_queue.LOCK_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"pid": os.getpid() + 1, "mode": mode}), encoding="utf-8")
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_stuck_writer_leaves_request_queued(sandbox):
+    write_queue = sandbox("write_queue")
+    hold_lock(write_queue)
+
+    started = time.monotonic()
+    result = write_queue.submit([("index", ["AAPL.US"])], timeout=0.5)
+
+    assert result["mode"] == "queued"
+    assert "did not flush" in result["error"]
+    # One wait for the writer, not a second one for its lock
+    assert time.monotonic() - started < 2
+    assert len(write_queue.pending()) == 1
+
+
+def test_stale_writer_lock_is_taken_over(sandbox):
+    write_queue = sandbox("write_queue")
+    hold_lock(write_queue, age=write_queue.DAEMON_STALE + 1)
+
+    result = write_queue.submit([("index", ["AAPL.US"])], timeout=0.5)
+
+    assert result["mode"] == "direct"
+    assert write_queue.pending() == []
+
+
+def test_flush_sets_bad_requests_aside(sandbox):
+    write_queue = sandbox("write_queue")
+    write_queue.enqueue([("index", ["AAPL.US"])])
+    write_queue.enqueue([("bogus", None)])
+    (write_queue.QUEUE_DIR / "0-unreadable.json").write_text("{not json", encoding="utf-8")
+
+    summary = write_queue.flush()
+
+    assert summary["files"] == 3
+    assert summary["failed"] == 1
+    assert summary["indexed"] == 1
+    assert write_queue.pending() == []
+    assert len(write_queue.failed()) == 2
+
+
+def test_concurrent_price_writes_to_one_symbol_lose_nothing(sandbox, hammer):
+    write_queue = sandbox("write_queue")
+    price_store = sandbox("price_store")
+    # Each merge reads the store, rewrites the Parquet file and drops the delta log: run
+    # unserialized, they drop each other's rows
+    dates = pd.bdate_range("2020-01-01", periods=8 * 10 * 3).strftime("%Y-%m-%d")
+
+    def write(writer, i):
+        start = (writer * 10 + i) * 3
+        frame = pd.DataFrame({"date": dates[start:start + 3], "open": 1.0, "high": 1.0, "low": 1.0, "close": float(writer), "volume": 1})
+        write_queue.submit([write_queue.rows_request("AAPL.US", frame, full=True)])
+
+    assert hammer(write, writers=8, rounds=10) == []
+    assert price_store.read_symbol("AAPL.US")["date"].tolist() == list(dates)
+    assert price_store.read_index()["AAPL.US"]["rows"] == len(dates)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Timings - per-stage timings of analyze requests (printing, JSON lines, Prometheus text)
+
+The Analyzer returns `timings` with every job result (milliseconds per workflow stage,
+measured between marks the workflow records as it runs); analyze.py adds its own
+client-side stages. One record per request can be appended to a JSON lines file and
+turned into Prometheus text or a summary of where the time goes.
+
+Workflow stages: symbol_lookup, read_prices, yahoo_fetch (on-demand fetch only), prompt,
+cache_check, model (0 on a cache hit), signals_write, total
+Client stages: resolve (analyze.py symbol lookup), submit (webhook POST), wait (job polling), elapsed
+
+Usage:
+    python timings.py summary data/timings.jsonl
+    python timings.py prom data/timings.jsonl --output data/analyze_timings.prom
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from urllib.parse import unquote
+
+import numpy as np
+
+WORKFLOW_STAGES = [
+    "symbol_lookup_ms",
+    "read_prices_ms",
+    "yahoo_fetch_ms",
+    "prompt_ms",
+    "cache_check_ms",
+    "model_ms",
+    "signals_write_ms",
+    "total_ms",
+]
+CLIENT_STAGES = ["resolve_ms", "submit_ms", "wait_ms", "elapsed_ms"]
+PROM_METRIC = "analyze_stage_seconds"
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def record(outcome, now=None):
+    """Flatten an analyze.py outcome into one JSON-serializable timing record."""
+    result = outcome.get("result") if isinstance(outcome.get("result"), dict) else {}
+    workflow = result.get("timings") or {}
+    client = outcome.get("timings") or {}
+    out = {
+        "ts": round(now or time.time(), 3),
+        "symbol": outcome.get("symbol"),
+        "job_id": outcome.get("job_id"),
+        "ok": bool(outcome.get("ok")),
+        "cache": result.get("cache") or "",
+    }
+    out.update({stage: workflow.get(stage) for stage in WORKFLOW_STAGES})
+    out.update({f"client_{stage}": client.get(stage) for stage in CLIENT_STAGES})
+    return out
+
+
+def _ms(value):
+    return "-" if value is None else f"{float(value):.0f}ms"
+
+
+def format_timings(rec):
+    """Two indented lines: workflow stages and client stages."""
+    workflow = ", ".join(f"{stage[:-3]} {_ms(rec.get(stage))}" for stage in WORKFLOW_STAGES)
+    client = ", ".join(f"{stage[:-3]} {_ms(rec.get(f'client_{stage}'))}" for stage in CLIENT_STAGES)
+    return [f"    Workflow: {workflow}", f"    Client: {client}"]
+
+
+def append_jsonl(records, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as fh:
+        for rec in records:
+            fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+def read_jsonl(path):
+    records = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def _samples(records):
+    """{stage name: [seconds, ...]} for every stage (client stages prefixed client_)."""
+    stages = {}
+    for rec in records:
+        for stage in WORKFLOW_STAGES + [f"client_{s}" for s in CLIENT_STAGES]:
+            if rec.get(stage) is not None:
+                stages.setdefault(stage[:-3], []).append(float(rec[stage]) / 1000)
+    return stages
+
+
+def to_prometheus(records):
+    """Prometheus text exposition: one summary per stage plus request counters."""
+    lines = [
+        f"# HELP {PROM_METRIC} Time spent per stage of an analyze request",
+        f"# TYPE {PROM_METRIC} summary",
+    ]
+    for stage, values in _samples(records).items():
+        for q in QUANTILES:
+            lines.append(f'{PROM_METRIC}{{stage="{stage}",quantile="{q}"}} {np.quantile(values, q):.6f}')
+        lines.append(f'{PROM_METRIC}_sum{{stage="{stage}"}} {sum(values):.6f}')
+        lines.append(f'{PROM_METRIC}_count{{stage="{stage}"}} {len(values)}')
+    lines.append("# HELP analyze_requests_total Analyze requests by outcome and cache result")
+    lines.append("# TYPE analyze_requests_total counter")
+    counts = {}
+    for rec in records:
+        key = ("ok" if rec.get("ok") else "failed", rec.get("cache") or "none")
+        counts[key] = counts.get(key, 0) + 1
+    for (status, cache), count in sorted(counts.items()):
+        lines.append(f'analyze_requests_total{{status="{status}",cache="{cache}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def summarize(records):
+    """Per stage: count, p50/p99 and mean in ms, and the share of the workflow total."""
+    stages = _samples(records)
+    total = sum(stages.get("total", [])) or None
+    summary = {}
+    for stage, values in stages.items():
+        summary[stage] = {
+            "count": len(values),
+            "p50_ms": round(float(np.quantile(values, 0.5)) * 1000, 1),
+            "p99_ms": round(float(np.quantile(values, 0.99)) * 1000, 1),
+            "mean_ms": round(float(np.mean(values)) * 1000, 1),
+        }
+        if total and stage in [s[:-3] for s in WORKFLOW_STAGES] and stage != "total":
+            summary[stage]["share"] = round(sum(values) / total, 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize or export per-stage analyze timings",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary_parser = sub.add_parser("summary", help="Print p50/p99/mean and share per stage as JSON")
+    summary_parser.add_argument("path", help="JSON lines written by analyze.py --timings-jsonl")
+    prom_parser = sub.add_parser("prom", help="Convert JSON lines to Prometheus text")
+    prom_parser.add_argument("path")
+    prom_parser.add_argument("--output", default="", help="Write here instead of stdout")
+    args = parser.parse_args()
+
+    path = unquote(args.path)
+    if not Path(path).exists():
+        print(f"[err] {path} not found")
+        sys.exit(1)
+    records = read_jsonl(path)
+    if args.command == "summary":
+        print(json.dumps(summarize(records), indent=2))
+    else:
+        text = to_prometheus(records)
+        if args.output:
+            Path(unquote(args.output)).write_text(text, encoding="utf-8")
+            print(f"[ok] Wrote {len(records)} requests to {args.output}")
+        else:
+            sys.stdout.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Write Queue - single-writer coordinator for the shared data/ files
+
+Concurrent workflow runs used to read, merge and rewrite state.xlsx, prices.xlsx,
+signals.xlsx and the price store (rows and index) themselves, so the last writer silently won.
+Writers now submit requests instead:
+    - with `python write_queue.py serve` running, requests are dropped into data/queue/
+      (written to a temp name, then renamed) and the writer applies everything that
+      arrived together in one flush: state updates are merged into one state.xlsx write,
+      index refreshes are unioned, and repeated exports collapse into one
+    - without a writer, the submitter applies its own request while holding
+      data/queue/writer.lock
+
+Every operation is idempotent, so a request whose writer stopped before flushing it is
+simply applied directly. A writer that is alive but not flushing (e.g. retrying a workbook
+open in Excel) keeps the request queued instead. Request files that cannot be read or
+applied are moved to data/queue/failed/ so they do not block the queue. Files are always
+written to a temp name and renamed into place.
+
+Operations:
+    state         {"path": state.xlsx, "last_dates": {symbol: last_date}}
+    rows          {"symbol": symbol, "rows": [{date, open, high, low, close, volume}, ...], "after": date}
+                  (appended to the price store after `after` and the last stored date, then indexed)
+    merge         same fields without "after": a full-history download merged into the store
+                  (price_store.merge_rows), then indexed
+    index         [symbol, ...] (price store sidecar index)
+    prices-xlsx   export the price store to data/prices.xlsx
+    signals-xlsx  export data/signals.db to data/signals.xlsx
+
+Usage:
+    python write_queue.py serve
+    python write_queue.py flush
+    python write_queue.py submit signals-xlsx
+    python write_queue.py status
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+import price_store
+import signal_store
+
+BASE_DIR = Path(__file__).resolve().parent
+QUEUE_DIR = BASE_DIR / "data" / "queue"
+LOCK_NAME = "writer.lock"
+FAILED_NAME = "failed"
+
+FLUSH_INTERVAL = float(os.getenv("WRITE_QUEUE_INTERVAL", "0.25"))
+# A serving writer refreshes its lock every loop; a direct writer holds it for one flush
+DAEMON_STALE = 5
+DIRECT_STALE = 120
+SUBMIT_TIMEOUT = 30
+
+
+def _lock_path(queue_dir=QUEUE_DIR):
+    return Path(queue_dir) / LOCK_NAME
+
+
+def _read_lock(queue_dir=QUEUE_DIR):
+    path = _lock_path(queue_dir)
+    try:
+        info = json.loads(path.read_text(encoding="utf-8"))
+        info["age"] = time.time() - path.stat().st_mtime
+        return info
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _is_stale(info):
+    return info["age"] > (DAEMON_STALE if info.get("mode") == "daemon" else DIRECT_STALE)
+
+
+def writer_alive(queue_dir=QUEUE_DIR):
+    info = _read_lock(queue_dir)
+    return bool(info and info.get("mode") == "daemon" and not _is_stale(info))
+
+
+def acquire_lock(mode="direct", queue_dir=QUEUE_DIR, timeout=SUBMIT_TIMEOUT):
+    """Create the lockfile exclusively, removing it first when its owner stopped refreshing it."""
+    path = _lock_path(queue_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            info = _read_lock(queue_dir)
+            if info is not None and _is_stale(info):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{path} is held by pid {info and info.get('pid')}")
+            time.sleep(0.1)
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump({"pid": os.getpid(), "mode": mode}, fh)
+        return path
+
+
+def release_lock(queue_dir=QUEUE_DIR):
+    info = _read_lock(queue_dir)
+    if info and info.get("pid") == os.getpid():
+        _lock_path(queue_dir).unlink()
+
+
+def apply_batch(requests):
+    """Apply queued (op, data) requests with one write per target file. Returns a summary."""
+    states = {}
+    symbols = set()
+    exports = set()
+    appended = 0
+    for op, data in requests:
+        if op in ("rows", "merge"):
+            # Price rows are applied in arrival order, before the state rows that point at them
+            symbol = price_store.normalize_symbol(data.get("symbol"))
+            frame = pd.DataFrame(data.get("rows") or [], columns=price_store.PRICE_COLUMNS)
+            if op == "merge":
+                appended += len(price_store.merge_rows(symbol, frame, reindex=False))
+            else:
+                appended += len(price_store.append_rows(symbol, frame, after=data.get("after"), reindex=False))
+            symbols.add(symbol)
+        elif op == "state":
+            path = str(data.get("path") or price_store.STATE_XLSX_PATH)
+            states.setdefault(path, {}).update(data.get("last_dates") or {})
+        elif op == "index":
+            symbols.update(data or [])
+        elif op in ("prices-xlsx", "signals-xlsx"):
+            exports.add(op)
+        else:
+            raise ValueError(f"Unknown write operation: {op}")
+
+    summary = {"requests": len(requests)}
+    if appended:
+        summary["appended_rows"] = appended
+    for path, last_dates in states.items():
+        price_store.update_states(last_dates, path)
+        summary["state_rows"] = summary.get("state_rows", 0) + len(last_dates)
+    if symbols:
+        price_store.update_index(sorted(symbols))
+        summary["indexed"] = len(symbols)
+    if "prices-xlsx" in exports:
+        summary["prices_rows"] = price_store.export_xlsx()
+    if "signals-xlsx" in exports:
+        summary["signals_rows"] = signal_store.export_xlsx()
+    return summary
+
+
+def rows_request(symbol, frame, full=False, after=None):
+    """("rows"|"merge", data) request carrying a price frame (NaN sent as null)."""
+    frame = frame[price_store.PRICE_COLUMNS].astype(object)
+    data = {"symbol": price_store.normalize_symbol(symbol), "rows": frame.where(frame.notna(), None).to_dict("records")}
+    if full:
+        return "merge", data
+    data["after"] = after or ""
+    return "rows", data
+
+
+def enqueue(requests, queue_dir=QUEUE_DIR):
+    queue_dir = Path(queue_dir)
+    queue_dir.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+    tmp_path = queue_dir / f"{name}.tmp"
+    tmp_path.write_text(json.dumps([list(r) for r in requests], ensure_ascii=False), encoding="utf-8")
+    path = queue_dir / name
+    os.replace(tmp_path, path)
+    return path
+
+
+def submit(requests, wait=True, queue_dir=QUEUE_DIR, timeout=SUBMIT_TIMEOUT):
+    """
+    Route (op, data) requests through the writer when one is serving, otherwise apply them
+    under the lockfile. Returns {"mode": queued|flushed|direct, ...}; "queued" after a wait
+    also carries an "error" saying why the request is still pending.
+    """
+    requests = [(op, data) for op, data in requests]
+    if not requests:
+        return {"mode": "direct", "requests": 0}
+    path = None
+    if writer_alive(queue_dir):
+        path = enqueue(requests, queue_dir)
+        if not wait:
+            return {"mode": "queued", "requests": len(requests)}
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not path.exists():
+                return {"mode": "flushed", "requests": len(requests)}
+            time.sleep(0.05)
+        if writer_alive(queue_dir):
+            # Its lock would time the direct write out too; the writer applies the file later
+            error = f"Writer did not flush {path.name} within {timeout}s; left queued"
+            print(f"[warn] {error}", file=sys.stderr)
+            return {"mode": "queued", "requests": len(requests), "error": error}
+        print(f"[warn] Writer stopped before flushing {path.name}, writing directly", file=sys.stderr)
+    try:
+        acquire_lock("direct", queue_dir, timeout=timeout)
+    except TimeoutError as exc:
+        # Another direct writer is stuck; keep the request for the next flush
+        if path is None:
+            path = enqueue(requests, queue_dir)
+        error = f"Could not write directly ({exc}); left queued as {path.name}"
+        print(f"[warn] {error}", file=sys.stderr)
+        return {"mode": "queued", "requests": len(requests), "error": error}
+    try:
+        summary = apply_batch(requests)
+    finally:
+        release_lock(queue_dir)
+    summary["mode"] = "direct"
+    return summary
+
+
+def pending(queue_dir=QUEUE_DIR):
+    queue_dir = Path(queue_dir)
+    return sorted(queue_dir.glob("*.json")) if queue_dir.exists() else []
+
+
+def failed(queue_dir=QUEUE_DIR):
+    failed_dir = Path(queue_dir) / FAILED_NAME
+    return sorted(failed_dir.glob("*.json")) if failed_dir.exists() else []
+
+
+def _set_aside(path, reason, queue_dir=QUEUE_DIR):
+    failed_dir = Path(queue_dir) / FAILED_NAME
+    failed_dir.mkdir(parents=True, exist_ok=True)
+    os.replace(path, failed_dir / path.name)
+    print(f"[warn] Moved {path.name} to {FAILED_NAME}/: {reason}", file=sys.stderr)
+
+
+def flush(queue_dir=QUEUE_DIR):
+    """
+    Apply every pending request file in one batch; files stay queued if a write fails
+    (OSError), while files that cannot be read or applied are moved to failed/.
+    """
+    paths = pending(queue_dir)
+    if not paths:
+        return None
+    batches = {}
+    for path in paths:
+        try:
+            batches[path] = [(op, data) for op, data in json.loads(path.read_text(encoding="utf-8"))]
+        except (ValueError, TypeError) as exc:
+            _set_aside(path, f"unreadable request: {exc}", queue_dir)
+    try:
+        summary = apply_batch([request for requests in batches.values() for request in requests])
+    except OSError:
+        raise
+    except Exception:  # noqa: BLE001
+        # A bad request (unknown op, malformed data) must not block the others: apply the
+        # files one by one and set aside the ones that fail
+        summary = {"requests": 0}
+        for path, requests in batches.items():
+            try:
+                result = apply_batch(requests)
+            except OSError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                _set_aside(path, exc, queue_dir)
+                summary["failed"] = summary.get("failed", 0) + 1
+                continue
+            path.unlink()
+            for key, value in result.items():
+                summary[key] = summary.get(key, 0) + value
+    else:
+        for path in batches:
+            path.unlink()
+    summary["files"] = len(paths)
+    return summary
+
+
+def serve(queue_dir=QUEUE_DIR, interval=FLUSH_INTERVAL):
+    # Wait out a crashed writer's lock, but not a live one
+    acquire_lock("daemon", queue_dir, timeout=DAEMON_STALE + 1)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"[ok] Writing {queue_dir} (pid {os.getpid()}, every {interval}s)")
+    sys.stdout.flush()
+    try:
+        while True:
+            os.utime(_lock_path(queue_dir))
+            try:
+                summary = flush(queue_dir)
+            except OSError as exc:
+                # e.g. a workbook open in Excel on Windows; keep the requests and retry
+                print(f"[warn] Flush failed, retrying: {exc}", file=sys.stderr)
+                summary = None
+            except Exception as exc:  # noqa: BLE001
+                # flush() already sets bad request files aside; keep serving the others
+                print(f"[warn] Flush failed: {exc}", file=sys.stderr)
+                summary = None
+            if summary:
+                print(f"[info] {json.dumps(summary)}")
+                sys.stdout.flush()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        release_lock(queue_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Single-writer coordinator for data/*.xlsx and the price store index",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="Run the writer (one per data/ directory)")
+    serve_parser.add_argument("--interval", type=float, default=FLUSH_INTERVAL, help="Seconds between flushes")
+    sub.add_parser("flush", help="Apply pending requests once (no writer running)")
+    submit_parser = sub.add_parser("submit", help="Request exports through the writer and print the result")
+    submit_parser.add_argument("ops", nargs="+", choices=["prices-xlsx", "signals-xlsx"])
+    sub.add_parser("status", help="Show the writer and queue state")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            serve(interval=args.interval)
+        except TimeoutError as exc:
+            print(f"[err] Another writer is running: {exc}")
+            sys.exit(1)
+    elif args.command == "flush":
+        acquire_lock("direct")
+        try:
+            summary = flush()
+        finally:
+            release_lock()
+        print(json.dumps(summary or {"files": 0}))
+    elif args.command == "submit":
+        print(json.dumps(submit([(op, None) for op in dict.fromkeys(args.ops)])))
+    elif args.command == "status":
+        info = _read_lock()
+        print(f"[info] Queue: {QUEUE_DIR}")
+        if info:
+            print(f"    Lock: pid {info.get('pid')} ({info.get('mode')}), refreshed {info['age']:.1f}s ago")
+        print(f"    Writer: {'running' if writer_alive() else 'not running (submitters write directly)'}")
+        print(f"    Pending: {len(pending())}")
+        print(f"    Failed: {len(failed())} (in {QUEUE_DIR / FAILED_NAME})")
+
+
+if __name__ == "__main__":
+    main()
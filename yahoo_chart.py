@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Yahoo Chart - on-demand price fallback for symbols missing from the local price store
+
+The Analyzer calls this when the store has no rows for a symbol. The chart request uses
+the smallest Yahoo range that covers `lookback` trading days (instead of always 3mo),
+and the fetched bars are appended to the price store through the single writer
+(write_queue.py) so the next analysis of the symbol is served locally. Prints the Analyzer's price window: {symbol, lookback, rows (newest
+first), as_of} plus source (store|yahoo), range and bytes fetched.
+
+Store symbols use Stooq suffixes (AAPL.US, 7203.JP); they are mapped to Yahoo tickers
+(AAPL, 7203.T) for the request. state.xlsx is not touched, so once the symbol is added
+to the Collector it downloads the full Stooq history, which is merged over these bars
+(price_store.merge_rows) instead of being cut off at their last date.
+
+Usage:
+    python yahoo_chart.py AAPL.US --lookback 60
+    python yahoo_chart.py 005930.KS --lookback 250
+    python yahoo_chart.py AAPL.US --lookback 60 --no-store
+    python yahoo_chart.py --range-for 120
+"""
+
+import argparse
+import json
+import os
+import sys
+from urllib.parse import unquote
+
+import pandas as pd
+import requests
+
+import price_store
+import rate_limit
+import write_queue
+
+YAHOO_CHART_URL = os.getenv("YAHOO_CHART_URL", "https://query1.finance.yahoo.com/v8/finance/chart").rstrip("/")
+# Trading days each range is guaranteed to hold (calendar length less weekends and holidays)
+RANGES = [
+    ("5d", 4),
+    ("1mo", 19),
+    ("3mo", 58),
+    ("6mo", 120),
+    ("1y", 245),
+    ("2y", 495),
+    ("5y", 1240),
+    ("10y", 2480),
+]
+# Stooq suffix -> Yahoo suffix ("" drops the suffix)
+YAHOO_SUFFIX = {"US": "", "JP": "T", "UK": "L", "DE": "DE"}
+
+
+def pick_range(lookback):
+    """Smallest Yahoo range that covers `lookback` daily bars ("max" beyond 10y)."""
+    lookback = max(int(lookback), 1)
+    return next((name for name, days in RANGES if days >= lookback), "max")
+
+
+def yahoo_ticker(symbol):
+    symbol = price_store.normalize_symbol(symbol)
+    base, dot, suffix = symbol.rpartition(".")
+    if not dot or suffix not in YAHOO_SUFFIX:
+        return symbol
+    return f"{base}.{YAHOO_SUFFIX[suffix]}" if YAHOO_SUFFIX[suffix] else base
+
+
+def parse_chart(payload):
+    """Yahoo chart JSON -> PRICE_COLUMNS frame (dates in the exchange's local time)."""
+    result = (((payload or {}).get("chart") or {}).get("result") or [None])[0] or {}
+    timestamps = result.get("timestamp") or []
+    if not timestamps:
+        return pd.DataFrame(columns=price_store.PRICE_COLUMNS)
+    quote = ((result.get("indicators") or {}).get("quote") or [{}])[0]
+    offset = int((result.get("meta") or {}).get("gmtoffset") or 0)
+    frame = pd.DataFrame({col: quote.get(col) or [None] * len(timestamps) for col in price_store.PRICE_COLUMNS[1:]})
+    frame.insert(0, "date", pd.to_datetime([int(t) + offset for t in timestamps], unit="s"))
+    # Yahoo returns null bars for halted days; they carry no prices
+    return price_store.normalize_rows(frame.dropna(subset=["close"]))
+
+
+def fetch_chart(symbol, lookback, session=None):
+    """Download the smallest range covering `lookback`. Returns (frame, report)."""
+    span = pick_range(lookback)
+    url = f"{YAHOO_CHART_URL}/{yahoo_ticker(symbol)}"
+    resp = rate_limit.request(
+        session,
+        "GET",
+        url,
+        params={"range": span, "interval": "1d", "events": "history"},
+        headers={"User-Agent": "Mozilla/5.0"},
+        timeout=30,
+    )
+    resp.raise_for_status()
+    frame = parse_chart(resp.json())
+    return frame, {"url": resp.url, "range": span, "bytes_fetched": len(resp.content), "fetched": len(frame)}
+
+
+def store_rows(symbol, frame):
+    """
+    Hand the bars newer than the stored history to the single writer.
+    Returns (rows handed over, write_queue.submit result or None).
+    """
+    new = price_store.pending_rows(symbol, frame)
+    if new.empty:
+        return 0, None
+    write = write_queue.submit([write_queue.rows_request(symbol, new)])
+    return len(new), write
+
+
+def window(symbol, lookback=60, store=True, session=None):
+    """
+    The Analyzer's price window for `symbol`, read from the store when it already holds
+    `lookback` rows and fetched from Yahoo (then stored) otherwise.
+    """
+    symbol = price_store.normalize_symbol(symbol)
+    if not symbol:
+        raise ValueError("A symbol is required.")
+    lookback = max(int(lookback), 1)
+    local = price_store.price_window(symbol, lookback)
+    if len(local["rows"]) >= lookback:
+        return dict(local, source="store", range="", bytes_fetched=0, stored=0)
+
+    frame, report = fetch_chart(symbol, lookback, session=session)
+    report["stored"], write = store_rows(symbol, frame) if store else (0, None)
+    if write:
+        # "queued" with an error means the bars reach the store once the writer catches up
+        report["write"] = write
+    recent = frame.tail(lookback).iloc[::-1]
+    recent = recent.astype(object).where(recent.notna(), None)
+    rows = [dict(row, symbol=symbol) for row in recent.to_dict("records")]
+    if len(rows) < len(local["rows"]):
+        # A short Yahoo answer never replaces what the store already had
+        rows = local["rows"]
+    out = {"symbol": symbol, "lookback": lookback, "rows": rows, "as_of": rows[0]["date"] if rows else ""}
+    out.update(report, source="yahoo")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fetch a missing price window from Yahoo and keep it in the price store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("Usage:", 1)[1],
+    )
+    parser.add_argument("symbol", nargs="?", default="", help="Store ticker (e.g., AAPL.US)")
+    parser.add_argument("--lookback", type=int, default=60, help="Rows the window needs (default: 60)")
+    parser.add_argument("--no-store", action="store_true", help="Do not append fetched bars to the price store")
+    parser.add_argument("--range-for", type=int, default=None, help="Only print the range chosen for N rows")
+    args = parser.parse_args()
+
+    if args.range_for is not None:
+        print(pick_range(args.range_for))
+        return
+    symbol = unquote(args.symbol)
+    try:
+        result = window(symbol, args.lookback, store=not args.no_store)
+    except ValueError as exc:
+        print(f"[err] {exc}")
+        sys.exit(2)
+    except requests.exceptions.RequestException as exc:
+        # Non-zero exit fails the node, so the Error Handler logs it under service "yahoo"
+        print(json.dumps({"symbol": symbol, "rows": [], "error": f"yahoo chart: {exc}"}))
+        sys.exit(1)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()